@@ -45,9 +45,13 @@ import wtforms_json
 import persistence
 
 from forms.forms import *
+from forms.record import Record
 
-from utils import display_vocabularies
-from utils.solr_handler import Solr
+from utils import solr_handler
+from utils import stored_fields
+from utils.id_index import id_index
+from utils.solr_handler import Solr, VersionConflict
+from utils.solr_trace import SolrTrace
 
 try:
     import local_api_secrets as secrets
@@ -86,6 +90,8 @@ app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = False
 
 csrf = CSRFProtect(app)
 
+solr_trace = SolrTrace(app)
+
 wtforms_json.init()
 
 log_formatter = logging.Formatter("[%(asctime)s] {%(pathname)s:%(lineno)d} %(levelname)s - %(message)s")
@@ -261,6 +267,9 @@ def dependencies_health():
         'external': False
     })
 
+    # health of the Solr nodes (SOLR_NODES)
+    dependencies.extend(solr_handler.cluster_health())
+
     # health of Redis
     try:
         storage = app.extensions['redis']['REDIS_CONSOLIDATE_PERSONS']
@@ -366,7 +375,7 @@ def work_get(work_id=''):
     result = persistence.get_work(work_id)
 
     if result:
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
         resp = make_response(json.dumps(thedata, indent=4), 200)
         resp.headers['Content-Type'] = 'application/json'
         return resp
@@ -392,9 +401,9 @@ def work_post():
 
             if is_token_valid(request.headers.get('Authorization')):
 
-                thedata = request.data.decode("utf-8")
+                thedata = json.loads(request.data.decode("utf-8"))
 
-                result = persistence.get_work(json.loads(thedata).get('id'))
+                result = persistence.get_work(thedata.get('id'))
 
                 rel = str2bool(request.args.get('rel', 'true'))
 
@@ -404,26 +413,26 @@ def work_post():
                     force = str2bool(request.args.get('force', 'false'))
                     rewrite = str2bool(request.args.get('rewrite', 'false'))
 
-                    if (force and json.loads(thedata).get('id') != json.loads(result.get('wtf_json')).get('id')) or rewrite:
-                        form = display_vocabularies.PUBTYPE2FORM.get(json.loads(thedata).get('pubtype')).from_json(json.loads(thedata))
+                    if (force and thedata.get('id') != stored_fields.load(result).get('id')) or rewrite:
+                        form = Record.work(thedata)
                         form.created.data = timestamp()
                         form.changed.data = timestamp()
                         new_id, message = persistence.record2solr(form, action='create', relitems=rel)
-                        message.append('record forced: %s' % json.loads(thedata).get('id'))
+                        message.append('record forced: %s' % thedata.get('id'))
 
                         result = persistence.get_work(new_id)
 
                         if result:
-                            response_json = {"message": message, "work": json.loads(result.get('wtf_json'))}
+                            response_json = {"message": message, "work": stored_fields.load(result)}
                             return make_response(json.dumps(response_json, indent=4), 201)
                         else:
-                            response_json = {"message": "failed! record not indexed!", "work": json.loads(thedata)}
+                            response_json = {"message": "failed! record not indexed!", "work": thedata}
                             return make_response(json.dumps(response_json, indent=4), 500)
                     else:
                         return make_response('Bad request: work already exist!', 400)
 
                 else:
-                    form = display_vocabularies.PUBTYPE2FORM.get(json.loads(thedata).get('pubtype')).from_json(json.loads(thedata))
+                    form = Record.work(thedata)
                     form.created.data = timestamp()
                     form.changed.data = timestamp()
                     new_id, message = persistence.record2solr(form, action='create', relitems=rel)
@@ -431,10 +440,10 @@ def work_post():
                     result = persistence.get_work(new_id)
 
                     if result:
-                        response_json = {"message": message, "work": json.loads(result.get('wtf_json'))}
+                        response_json = {"message": message, "work": stored_fields.load(result)}
                         return make_response(json.dumps(response_json, indent=4), 201)
                     else:
-                        response_json = {"message": "failed! record not indexed!", "work": json.loads(thedata)}
+                        response_json = {"message": "failed! record not indexed!", "work": thedata}
                         return make_response(json.dumps(response_json, indent=4), 500)
             else:
                 return make_response('Unauthorized', 401)
@@ -462,7 +471,7 @@ def work_put(work_id=''):
 
             if result:
 
-                original_work = json.loads(result.get('wtf_json'))
+                original_work = stored_fields.load(result)
 
                 addition_work = ''
                 try:
@@ -488,24 +497,32 @@ def work_put(work_id=''):
                         # print(json.dumps(merged_work, indent=4))
 
                         # load it!
-                        form = display_vocabularies.PUBTYPE2FORM.get(merged_work.get('pubtype')).from_json(merged_work)
+                        form = Record.work(merged_work)
                         form.changed.data = timestamp()
 
                         # store it
                         rel = str2bool(request.args.get('rel', 'true'))
-                        new_id, message = persistence.record2solr(form, action='update', relitems=rel)
+                        try:
+                            new_id, message = persistence.record2solr(form, action='update', relitems=rel,
+                                                                      version=result.get('_version_'))
+                        except VersionConflict:
+                            return make_response('Conflict: the work has been modified in the meantime! Please retry.', 409)
 
                         response_json = {"message": message, "work": merged_work}
 
                         return make_response(json.dumps(response_json, indent=4), 200)
                 else:
                     # load it!
-                    form = display_vocabularies.PUBTYPE2FORM.get(original_work.get('pubtype')).from_json(original_work)
+                    form = Record.work(original_work)
                     form.changed.data = timestamp()
 
                     # store it
                     rel = str2bool(request.args.get('rel', 'true'))
-                    new_id, message = persistence.record2solr(form, action='update', relitems=rel)
+                    try:
+                        new_id, message = persistence.record2solr(form, action='update', relitems=rel,
+                                                                  version=result.get('_version_'))
+                    except VersionConflict:
+                        return make_response('Conflict: the work has been modified in the meantime! Please retry.', 409)
 
                     response_json = {"message": message, "work": original_work}
 
@@ -536,8 +553,8 @@ def work_delete(work_id=''):
         delete_work_solr.request()
 
         if delete_work_solr.results:
-            thedata = json.loads(delete_work_solr.results[0].get('wtf_json'))
-            form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
+            thedata = stored_fields.load(delete_work_solr.results[0])
+            form = Record.work(thedata)
             # modify status to 'deleted'
             form.editorial_status.data = 'deleted'
             form.changed.data = timestamp()
@@ -564,7 +581,7 @@ def person_get(person_id=''):
     result = persistence.get_person(person_id=person_id)
     if result:
 
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
 
         # if not valid access_token then limit the data fields!
         if request.headers.get('Authorization'):
@@ -628,8 +645,8 @@ def person_post():
                     force = str2bool(request.args.get('force', 'false'))
                     rewrite = str2bool(request.args.get('rewrite', 'false'))
 
-                    if (force and json.loads(thedata).get('id') != json.loads(result.get('wtf_json')).get('id')) or rewrite:
-                        form = PersonAdminForm.from_json(json.loads(thedata))
+                    if (force and json.loads(thedata).get('id') != stored_fields.load(result).get('id')) or rewrite:
+                        form = Record(PersonAdminForm, json.loads(thedata))
                         form.created.data = timestamp()
                         form.changed.data = timestamp()
                         doit, new_id, message = persistence.person2solr(form, action='create')
@@ -637,7 +654,7 @@ def person_post():
 
                         result = persistence.get_person(new_id)
                         if result:
-                            response_json = {"message": message, "person": json.loads(result.get('wtf_json'))}
+                            response_json = {"message": message, "person": stored_fields.load(result)}
                             return make_response(json.dumps(response_json, indent=4), 201)
                         else:
                             response_json = {"message": "failed! record not indexed!", "person": json.loads(thedata)}
@@ -645,14 +662,14 @@ def person_post():
                     else:
                         return make_response('Bad request: person already exist!', 400)
                 else:
-                    form = PersonAdminForm.from_json(json.loads(thedata))
+                    form = Record(PersonAdminForm, json.loads(thedata))
                     form.created.data = timestamp()
                     form.changed.data = timestamp()
                     doit, new_id, message = persistence.person2solr(form, action='create')
 
                     result = persistence.get_person(new_id)
                     if result:
-                        response_json = {"message": message, "person": json.loads(result.get('wtf_json'))}
+                        response_json = {"message": message, "person": stored_fields.load(result)}
                         return make_response(json.dumps(response_json, indent=4), 201)
                     else:
                         response_json = {"message": "failed! record not indexed!", "person": json.loads(thedata)}
@@ -684,7 +701,7 @@ def person_put(person_id=''):
 
             if result:
 
-                original_person = json.loads(result.get('wtf_json'))
+                original_person = stored_fields.load(result)
 
                 if addition_person.get('id') and addition_person.get('id') != original_person.get('id'):
 
@@ -701,9 +718,13 @@ def person_put(person_id=''):
                     merged_person = merger.merge(original_person, addition_person)
 
                     # load it!
-                    form = PersonAdminForm.from_json(merged_person)
+                    form = Record(PersonAdminForm, merged_person)
                     form.changed.data = timestamp()
-                    doit, new_id, message = persistence.person2solr(form, action='update')
+                    try:
+                        doit, new_id, message = persistence.person2solr(form, action='update',
+                                                                        version=result.get('_version_'))
+                    except VersionConflict:
+                        return make_response('Conflict: the person has been modified in the meantime! Please retry.', 409)
 
                     response_json = {"message": message, "person": merged_person}
 
@@ -734,8 +755,8 @@ def person_delete(person_id=''):
         delete_person_solr.request()
 
         if delete_person_solr.results:
-            thedata = json.loads(delete_person_solr.results[0].get('wtf_json'))
-            form = PersonAdminForm.from_json(thedata)
+            thedata = stored_fields.load(delete_person_solr.results[0])
+            form = Record(PersonAdminForm, thedata)
             # modify status to 'deleted'
             form.editorial_status.data = 'deleted'
             form.changed.data = timestamp()
@@ -763,7 +784,7 @@ def orga_get(orga_id=''):
 
     if result:
 
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
 
         # if not valid access_token then limit the data fields!
         if request.headers.get('Authorization'):
@@ -819,8 +840,8 @@ def orga_post():
                     force = str2bool(request.args.get('force', 'false'))
                     rewrite = str2bool(request.args.get('rewrite', 'false'))
 
-                    if (force and json.loads(thedata).get('id') != json.loads(result.get('wtf_json')).get('id')) or rewrite:
-                        form = OrgaAdminForm.from_json(json.loads(thedata))
+                    if (force and json.loads(thedata).get('id') != stored_fields.load(result).get('id')) or rewrite:
+                        form = Record(OrgaAdminForm, json.loads(thedata))
                         form.created.data = timestamp()
                         form.changed.data = timestamp()
                         new_id, message = persistence.orga2solr(form, action='create', relitems=rel)
@@ -828,7 +849,7 @@ def orga_post():
 
                         result = persistence.get_orga(new_id)
                         if result:
-                            response_json = {"message": message, "orga": json.loads(result.get('wtf_json'))}
+                            response_json = {"message": message, "orga": stored_fields.load(result)}
                             return make_response(json.dumps(response_json, indent=4), 201)
                         else:
                             response_json = {"message": "failed! record not indexed!", "orga": json.loads(thedata)}
@@ -836,14 +857,14 @@ def orga_post():
                     else:
                         return make_response('Bad request: organisation already exist!', 400)
                 else:
-                    form = OrgaAdminForm.from_json(json.loads(thedata))
+                    form = Record(OrgaAdminForm, json.loads(thedata))
                     form.created.data = timestamp()
                     form.changed.data = timestamp()
                     new_id, message = persistence.orga2solr(form, action='create', relitems=rel)
 
                     result = persistence.get_orga(new_id)
                     if result:
-                        response_json = {"message": message, "orga": json.loads(result.get('wtf_json'))}
+                        response_json = {"message": message, "orga": stored_fields.load(result)}
                         return make_response(json.dumps(response_json, indent=4), 201)
                     else:
                         response_json = {"message": "failed! record not indexed!", "orga": json.loads(thedata)}
@@ -875,7 +896,7 @@ def orga_put(orga_id=''):
 
             if result:
 
-                original_orga = json.loads(result.get('wtf_json'))
+                original_orga = stored_fields.load(result)
 
                 if addition_orga.get('id') and addition_orga.get('id') != original_orga.get('id'):
 
@@ -892,10 +913,13 @@ def orga_put(orga_id=''):
                     merged_orga = merger.merge(original_orga, addition_orga)
 
                     # load it!
-                    form = OrgaAdminForm.from_json(merged_orga)
+                    form = Record(OrgaAdminForm, merged_orga)
                     form.changed.data = timestamp()
                     logging.info(form.data)
-                    new_id, message = persistence.orga2solr(form, action='update')
+                    try:
+                        new_id, message = persistence.orga2solr(form, action='update', version=result.get('_version_'))
+                    except VersionConflict:
+                        return make_response('Conflict: the organisation has been modified in the meantime! Please retry.', 409)
 
                     response_json = {"message": message, "organisation": merged_orga}
 
@@ -926,8 +950,8 @@ def orga_delete(orga_id=''):
         delete_orga_solr.request()
 
         if delete_orga_solr.results:
-            thedata = json.loads(delete_orga_solr.results[0].get('wtf_json'))
-            form = OrgaAdminForm.from_json(thedata)
+            thedata = stored_fields.load(delete_orga_solr.results[0])
+            form = Record(OrgaAdminForm, thedata)
             # modify status to 'deleted'
             form.editorial_status.data = 'deleted'
             form.changed.data = timestamp()
@@ -955,7 +979,7 @@ def group_get(group_id=''):
 
     if result:
 
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
 
         if request.headers.get('Authorization'):
             if is_token_valid(request.headers.get('Authorization')):
@@ -1007,8 +1031,8 @@ def group_post():
                     force = str2bool(request.args.get('force', 'false'))
                     rewrite = str2bool(request.args.get('rewrite', 'false'))
 
-                    if (force and json.loads(thedata).get('id') != json.loads(result.get('wtf_json')).get('id')) or rewrite:
-                        form = GroupAdminForm.from_json(json.loads(thedata))
+                    if (force and json.loads(thedata).get('id') != stored_fields.load(result).get('id')) or rewrite:
+                        form = Record(GroupAdminForm, json.loads(thedata))
                         form.created.data = timestamp()
                         form.changed.data = timestamp()
                         new_id, message = persistence.group2solr(form, action='create', relitems=rel)
@@ -1016,7 +1040,7 @@ def group_post():
 
                         result = persistence.get_group(new_id)
                         if result:
-                            response_json = {"message": message, "group": json.loads(result.get('wtf_json'))}
+                            response_json = {"message": message, "group": stored_fields.load(result)}
                             return make_response(json.dumps(response_json, indent=4), 201)
                         else:
                             response_json = {"message": "failed! record not indexed!", "group": json.loads(thedata)}
@@ -1024,7 +1048,7 @@ def group_post():
                     else:
                         return make_response('Bad request: group "%s" already exist!' % json.loads(thedata).get('id'), 400)
                 else:
-                    form = GroupAdminForm.from_json(json.loads(thedata))
+                    form = Record(GroupAdminForm, json.loads(thedata))
                     form.created.data = timestamp()
                     form.changed.data = timestamp()
                     new_id, message = persistence.group2solr(form, action='create', relitems=rel)
@@ -1032,7 +1056,7 @@ def group_post():
                     result = persistence.get_group(new_id)
 
                     if result:
-                        response_json = {"message": message, "group": json.loads(result.get('wtf_json'))}
+                        response_json = {"message": message, "group": stored_fields.load(result)}
                         return make_response(json.dumps(response_json, indent=4), 201)
                     else:
                         response_json = {"message": "failed! record not indexed!", "group": json.loads(thedata)}
@@ -1064,7 +1088,7 @@ def group_put(group_id=''):
 
             if result:
 
-                original_group = json.loads(result.get('wtf_json'))
+                original_group = stored_fields.load(result)
 
                 if addition_group.get('id') and addition_group.get('id') != original_group.get('id'):
 
@@ -1081,9 +1105,12 @@ def group_put(group_id=''):
                     merged_group = merger.merge(original_group, addition_group)
 
                     # load it!
-                    form = GroupAdminForm.from_json(merged_group)
+                    form = Record(GroupAdminForm, merged_group)
                     form.changed.data = timestamp()
-                    new_id, message = persistence.group2solr(form, action='update')
+                    try:
+                        new_id, message = persistence.group2solr(form, action='update', version=result.get('_version_'))
+                    except VersionConflict:
+                        return make_response('Conflict: the group has been modified in the meantime! Please retry.', 409)
 
                     response_json = {"message": message, "group": merged_group}
 
@@ -1113,8 +1140,8 @@ def group_delete(group_id=''):
         delete_group_solr.request()
 
         if delete_group_solr.results:
-            thedata = json.loads(delete_group_solr.results[0].get('wtf_json'))
-            form = GroupAdminForm.from_json(thedata)
+            thedata = stored_fields.load(delete_group_solr.results[0])
+            form = Record(GroupAdminForm, thedata)
             # modify status to 'deleted'
             form.editorial_status.data = 'deleted'
             form.changed.data = timestamp()
@@ -1130,6 +1157,102 @@ def group_delete(group_id=''):
         return make_response('Unauthorized', 401)
 
 
+RESOLVE_CORES = {'work': 'hb2', 'person': 'person', 'organisation': 'organisation', 'group': 'group'}
+
+
+@app.route('/api/resolve/<entity>', methods=['POST'])
+@csrf.exempt
+def resolve_ids(entity=''):
+    """
+        Map identifiers to the ids of their resources
+
+        swagger_from_file: api_doc/resolve_post.yml
+    """
+    if entity not in RESOLVE_CORES:
+        return make_response('Bad request: unknown entity \'%s\'!' % entity, 400)
+    if request.headers.get('Content-Type') != 'application/json':
+        return make_response('Bad request: invalid accept header!', 400)
+
+    try:
+        identifiers = json.loads(request.data.decode("utf-8"))
+    except ValueError:
+        identifiers = None
+    if not isinstance(identifiers, list):
+        return make_response('Bad request: expected a JSON array of identifiers!', 400)
+
+    resolved = id_index.resolve_many(RESOLVE_CORES.get(entity), identifiers)
+    if resolved is None:
+        return make_response('Service unavailable: identifier index not available!', 503)
+
+    resp = make_response(json.dumps(resolved, indent=4), 200)
+    resp.headers['Content-Type'] = 'application/json'
+    return resp
+
+
+def _bulk_form(entity, record):
+    if entity == 'work':
+        return Record.work(record)
+    if entity == 'person':
+        return Record(PersonAdminForm, record)
+    if entity == 'organisation':
+        return Record(OrgaAdminForm, record)
+    return Record(GroupAdminForm, record)
+
+
+@app.route('/api/bulk/<entity>', methods=['POST'])
+@csrf.exempt
+def bulk_post(entity=''):
+    """
+        Create or replace many resources at once
+
+        swagger_from_file: api_doc/bulk_post.yml
+    """
+    if entity not in RESOLVE_CORES:
+        return make_response('Bad request: unknown entity \'%s\'!' % entity, 400)
+    if request.headers.get('Content-Type') != 'application/json':
+        return make_response('Bad request: invalid accept header!', 400)
+    if not request.headers.get('Authorization') or not is_token_valid(request.headers.get('Authorization')):
+        return make_response('Unauthorized', 401)
+
+    try:
+        records = json.loads(request.data.decode("utf-8"))
+    except ValueError:
+        records = None
+    if not isinstance(records, list):
+        return make_response('Bad request: expected a JSON array of resources!', 400)
+
+    forms = []
+    for idx, record in enumerate(records):
+        if not isinstance(record, dict):
+            return make_response('Bad request: resource %s is not a JSON object!' % idx, 400)
+        try:
+            form = _bulk_form(entity, record)
+        except (AttributeError, TypeError):
+            return make_response('Bad request: invalid resource \'%s\'!' % record.get('id'), 400)
+        # keep the creation date of records imported again, so unchanged records are not indexed again
+        if not record.get('created'):
+            form.created.data = timestamp()
+        form.changed.data = timestamp()
+        forms.append(form)
+
+    rel = str2bool(request.args.get('rel', 'true'))
+    if entity == 'work':
+        results = persistence.bulk_record2solr(forms, action='create', relitems=rel)
+    elif entity == 'person':
+        # 'create' would skip the persons already there
+        results = [(new_id, message) for doit, new_id, message in
+                   persistence.bulk_person2solr(forms, action='update')]
+    elif entity == 'organisation':
+        results = persistence.bulk_orga2solr(forms, action='create', relitems=rel)
+    else:
+        results = persistence.bulk_group2solr(forms, action='create', relitems=rel)
+
+    response_json = [{'id': new_id, 'message': message} for new_id, message in results]
+    resp = make_response(json.dumps(response_json, indent=4), 200)
+    resp.headers['Content-Type'] = 'application/json'
+    return resp
+
+
 # validate JWT
 def is_token_valid(token=''):
 
@@ -43,8 +43,8 @@ from citeproc import formatter
 from citeproc.py2compat import *
 from citeproc.source.json import CiteProcJSON
 from datadiff import diff_dict
-from flask import Flask, render_template, redirect, request, jsonify, flash, url_for, send_file
-from flask import make_response
+from flask import Flask, render_template, redirect, request, jsonify, flash, url_for, send_file, session
+from flask import make_response, Response
 from flask_babel import Babel, gettext
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager, UserMixin, current_user, login_user, logout_user, login_required, \
@@ -59,6 +59,7 @@ from lxml import etree
 from requests import RequestException
 
 from forms.forms import *
+from forms.record import Record
 
 from processors import crossref_processor
 from processors import datacite_processor
@@ -66,9 +67,18 @@ from processors import mods_processor
 from processors import openurl_processor
 from processors import orcid_processor
 from processors import wtf_csl
+from processors.host_resolver import HostResolver
 
 from utils import display_vocabularies
-from utils.solr_handler import Solr
+from utils import stored_fields
+from utils.exec_counter import exec_counters
+from utils.id_index import id_index
+from utils.job_queue import relation_jobs
+from utils.phase_timing import phase_timer
+from utils.lock_manager import record_locks
+from utils.solr_handler import AsyncSolr, Solr, VersionConflict, query_cache, solr_gather, solr_gather_chunks, \
+    transport
+from utils.solr_trace import SolrTrace
 from utils import urlmarker
 
 import persistence
@@ -116,6 +126,9 @@ Redis(app, 'REDIS_PUBLIST_CACHE')
 app.config['REDIS_EXEC_COUNTER_URL'] = secrets.REDIS_EXEC_COUNTER_URL
 Redis(app, 'REDIS_EXEC_COUNTER')
 
+# seconds between the heartbeats of an open edit form keeping its lock (see utils.lock_manager)
+app.config['LOCK_HEARTBEAT'] = max(record_locks.ttl // 3, 10)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.session_protection = 'strong'
@@ -129,6 +142,8 @@ app.config['BOOTSTRAP_SERVE_LOCAL'] = secrets.BOOTSTRAP_SERVE_LOCAL
 
 csrf = CSRFProtect(app)
 
+solr_trace = SolrTrace(app)
+
 wtforms_json.init()
 
 socketio = SocketIO(app)
@@ -177,7 +192,7 @@ def last_split_filter(category):
 # Just a temporary hack...
 @app.template_filter('get_name')
 def get_name(record):
-    return json.loads(record.get('wtf_json')).get('name')
+    return stored_fields.load(record).get('name')
 
 
 @app.template_filter('filter_remove')
@@ -190,6 +205,11 @@ def deserialize_json_filter(thejson):
     return json.loads(thejson)
 
 
+@app.template_filter('record_data')
+def record_data_filter(doc):
+    return stored_fields.load(doc)
+
+
 @app.route('/dedup/<idtype>/<path:id>')
 def dedup(idtype='', id=''):
     resp = {'duplicate': False}
@@ -249,39 +269,33 @@ def homepage():
         else:
             gnd_id = '11354300X'
 
-    # ORCID iD counter
+    # ORCID iD and works counters: independent queries, run them concurrently
     filterquery = []
     filterquery.append('orcid:["" TO *]')
     filterquery.append('catalog:"Technische Universität Dortmund"')
-    persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                        query='*:*', rows=0, core='person',
-                        fquery=filterquery)
-    persons_solr.request()
-
-    orcid_tudo = persons_solr.count()
+    orcid_tudo_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                query='*:*', rows=0, core='person',
+                                fquery=filterquery, cache=True)
 
     filterquery = []
     filterquery.append('orcid:["" TO *]')
     filterquery.append('catalog:"Ruhr-Universität Bochum"')
-    persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                        query='*:*', rows=0, core='person',
-                        fquery=filterquery)
-    persons_solr.request()
+    orcid_rubi_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                query='*:*', rows=0, core='person',
+                                fquery=filterquery, cache=True)
 
-    orcid_rubi = persons_solr.count()
+    works_tudo_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                query='tudo:true', rows=0, facet='false', cache=True)
 
-    # Works counter
-    index_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                      query='tudo:true', facet='false')
-    index_solr.request()
+    works_rubi_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                query='rubi:true', rows=0, facet='false', cache=True)
 
-    works_tudo = index_solr.count()
+    solr_gather(orcid_tudo_solr, orcid_rubi_solr, works_tudo_solr, works_rubi_solr)
 
-    index_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                      query='rubi:true', facet='false')
-    index_solr.request()
-
-    works_rubi = index_solr.count()
+    orcid_tudo = orcid_tudo_solr.count()
+    orcid_rubi = orcid_rubi_solr.count()
+    works_tudo = works_tudo_solr.count()
+    works_rubi = works_rubi_solr.count()
 
     return render_template('index.html', header=lazy_gettext('Home'), site=theme(request.access_route),
                            gnd_id=gnd_id,
@@ -304,23 +318,21 @@ def stats(affiliation=''):
         if affiliation == 'rub':
             filterquery.append('catalog:"Ruhr-Universität Bochum"')
 
-        persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                            query='*:*', rows=0, core='person',
-                            fquery=filterquery)
-        persons_solr.request()
-
-        stats.setdefault('orcid_%s' % affiliation, persons_solr.count())
+        persons_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                 query='*:*', rows=0, core='person',
+                                 fquery=filterquery, cache=True)
 
         # Works counter
         if affiliation == 'rub':
-            index_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                              query='rubi:true', facet='false')
+            index_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                   query='rubi:true', rows=0, facet='false', cache=True)
         else:
-            index_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                              query='%s:true' % affiliation, facet='false')
+            index_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                   query='%s:true' % affiliation, rows=0, facet='false', cache=True)
 
-        index_solr.request()
+        solr_gather(persons_solr, index_solr)
 
+        stats.setdefault('orcid_%s' % affiliation, persons_solr.count())
         stats.setdefault('works_%s' % affiliation, index_solr.count())
 
         return jsonify(stats)
@@ -396,9 +408,31 @@ def search(data=None):
         export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                            application=secrets.SOLR_APP, query=query, export_field='wtf_json',
                            core=core)
-        export_docs = export_solr.export()
-        # logging.info(export_docs)
-        return jsonify({'items': wtf_csl.wtf_csl(export_docs)})
+
+        def pages():
+            page = []
+            for export_doc in export_solr.iter_export():
+                page.append(export_doc)
+                if len(page) == export_solr.export_rows:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+        def generate():
+            # the hosts of a page of works are resolved together and kept for the whole export
+            resolver = HostResolver(cache=True)
+            yield '{"items": ['
+            first = True
+            for page in pages():
+                for item in wtf_csl.wtf_csl(page, resolver=resolver):
+                    if not first:
+                        yield ','
+                    yield json.dumps(item)
+                    first = False
+            yield ']}'
+
+        return Response(generate(), mimetype='application/json')
 
     rows = 20
     search_solr = None
@@ -613,2011 +647,6 @@ def fetch_wos(doi):
                       headers={'Content-Type': 'application/xml'}).text.encode('utf8'))
 
 
-def _record2solr(form, action, relitems=True):
-
-    solr_data = {}
-    has_part = []
-    is_part_of = []
-    other_version = []
-    id = ''
-    is_rubi = False
-    is_tudo = False
-
-    # logging.info('FORM: %s' % form.data)
-
-    if form.data.get('id'):
-        solr_data.setdefault('id', form.data.get('id').strip())
-        id = form.data.get('id').strip()
-
-    for field in form.data:
-        # logging.info('%s => %s' % (field, form.data.get(field)))
-        # record information
-        if field == 'same_as':
-            for same_as in form.data.get(field):
-                if len(same_as.strip()) > 0:
-                    solr_data.setdefault('same_as', []).append(same_as.strip())
-        if field == 'created':
-            if len(form.data.get(field).strip()) == 10:
-                solr_data.setdefault('recordCreationDate', '%sT00:00:00.001Z' % form.data.get(field).strip())
-            else:
-                solr_data.setdefault('recordCreationDate', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        if field == 'changed':
-            if len(form.data.get(field).strip()) == 10:
-                solr_data.setdefault('recordChangeDate', '%sT00:00:00.001Z' % form.data.get(field).strip())
-            else:
-                solr_data.setdefault('recordChangeDate', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        if field == 'owner':
-            for owner in form.data.get(field):
-                solr_data.setdefault('owner', []).append(owner.strip())
-        if field == 'catalog':
-            for catalog in form.data.get(field):
-                solr_data.setdefault('catalog', []).append(catalog.strip())
-        if field == 'deskman' and form.data.get(field):
-            solr_data.setdefault('deskman', form.data.get(field).strip())
-        if field == 'editorial_status':
-            solr_data.setdefault('editorial_status', form.data.get(field).strip())
-        if field == 'apparent_dup':
-            solr_data.setdefault('apparent_dup', form.data.get(field))
-
-        if field == 'affiliation_context':
-            for context in form.data.get(field):
-                # logging.info(context)
-                if len(context) > 0:
-                    try:
-                        query = 'id:%s' % context
-
-                        parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='organisation', query=query,
-                                           facet='false', fields=['wtf_json'])
-                        parent_solr.request()
-
-                        if len(parent_solr.results) == 0:
-
-                            query = 'account:%s' % context
-
-                            parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                               application=secrets.SOLR_APP, core='organisation', query=query,
-                                               facet='false', fields=['wtf_json'])
-                            parent_solr.request()
-
-                            if len(parent_solr.results) == 0:
-
-                                query = 'same_as:%s' % context
-
-                                parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                   application=secrets.SOLR_APP, core='organisation', query=query,
-                                                   facet='false', fields=['wtf_json'])
-                                parent_solr.request()
-
-                                if len(parent_solr.results) == 0:
-                                    solr_data.setdefault('fakultaet', []).append(context)
-                                    if current_user.role == 'admin' or current_user.role == 'superadmin':
-                                        flash(
-                                            gettext(
-                                                'IDs from relation "affiliation" could not be found! Ref: %s' % context),
-                                            'warning')
-                                else:
-                                    for doc in parent_solr.results:
-                                        myjson = json.loads(doc.get('wtf_json'))
-                                        solr_data.setdefault('fakultaet', []).append(
-                                            '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                        solr_data.setdefault('affiliation_id', []).append(myjson.get('id'))
-                                        for catalog in myjson.get('catalog'):
-                                            if 'Bochum' in catalog:
-                                                # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                                solr_data.setdefault('frubi_orga', []).append(
-                                                    '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                                is_rubi = True
-                                            if 'Dortmund' in catalog:
-                                                solr_data.setdefault('ftudo_orga', []).append(
-                                                    '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                                is_tudo = True
-                            else:
-                                for doc in parent_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    solr_data.setdefault('fakultaet', []).append(
-                                        '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                    solr_data.setdefault('affiliation_id', []).append(myjson.get('id'))
-                                    for catalog in myjson.get('catalog'):
-                                        if 'Bochum' in catalog:
-                                            # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                            solr_data.setdefault('frubi_orga', []).append(
-                                                '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                            is_rubi = True
-                                        if 'Dortmund' in catalog:
-                                            solr_data.setdefault('ftudo_orga', []).append(
-                                                '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                            is_tudo = True
-                        else:
-                            for doc in parent_solr.results:
-                                myjson = json.loads(doc.get('wtf_json'))
-                                solr_data.setdefault('fakultaet', []).append('%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                solr_data.setdefault('affiliation_id', []).append(myjson.get('id'))
-                                for catalog in myjson.get('catalog'):
-                                    if 'Bochum' in catalog:
-                                        # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                        solr_data.setdefault('frubi_orga', []).append(
-                                            '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                        is_rubi = True
-                                    if 'Dortmund' in catalog:
-                                        solr_data.setdefault('ftudo_orga', []).append(
-                                            '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                        is_tudo = True
-
-                    except AttributeError as e:
-                        logging.error(e)
-
-        if field == 'group_context':
-            for context in form.data.get(field):
-                # logging.info(context)
-                if len(context) > 0:
-                    try:
-                        query = 'id:%s' % context
-                        parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='group', query=query, facet='false',
-                                           fields=['wtf_json'])
-                        parent_solr.request()
-
-                        if len(parent_solr.results) == 0:
-                            query = 'same_as:%s' % context
-                            parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                               application=secrets.SOLR_APP, core='group', query=query, facet='false',
-                                               fields=['wtf_json'])
-                            parent_solr.request()
-
-                            if len(parent_solr.results) == 0:
-                                solr_data.setdefault('group', []).append(context)
-                                if current_user.role == 'admin' or current_user.role == 'superadmin':
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "group" could not be found! Ref: %s' % context),
-                                        'warning')
-                            else:
-                                for doc in parent_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    solr_data.setdefault('group_id', []).append(myjson.get('id'))
-                                    solr_data.setdefault('group', []).append(
-                                        '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                    for catalog in myjson.get('catalog'):
-                                        if 'Bochum' in catalog:
-                                            # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                            solr_data.setdefault('frubi_orga', []).append(
-                                                '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                            is_rubi = True
-                                        if 'Dortmund' in catalog:
-                                            solr_data.setdefault('ftudo_orga', []).append(
-                                                '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                            is_tudo = True
-                        else:
-                            for doc in parent_solr.results:
-                                myjson = json.loads(doc.get('wtf_json'))
-                                solr_data.setdefault('group_id', []).append(myjson.get('id'))
-                                solr_data.setdefault('group', []).append('%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                for catalog in myjson.get('catalog'):
-                                    if 'Bochum' in catalog:
-                                        # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                        solr_data.setdefault('frubi_orga', []).append(
-                                            '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                        is_rubi = True
-                                    if 'Dortmund' in catalog:
-                                        solr_data.setdefault('ftudo_orga', []).append(
-                                            '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                                        is_tudo = True
-                    except AttributeError as e:
-                        logging.error(e)
-
-        if field == 'locked':
-            solr_data.setdefault('locked', form.data.get(field))
-
-        # the work
-        if field == 'publication_status':
-            solr_data.setdefault('publication_status', form.data.get(field).strip())
-        if field == 'pubtype':
-            solr_data.setdefault('pubtype', form.data.get(field).strip())
-        if field == 'subtype':
-            solr_data.setdefault('subtype', form.data.get(field).strip())
-        if field == 'title':
-            solr_data.setdefault('title', form.data.get(field).strip())
-            solr_data.setdefault('exacttitle', form.data.get(field).strip())
-            solr_data.setdefault('sorttitle', form.data.get(field).strip())
-        if field == 'subtitle':
-            solr_data.setdefault('subtitle', form.data.get(field).strip())
-            solr_data.setdefault('other_title', form.data.get(field).strip())
-        if field == 'title_supplement':
-            solr_data.setdefault('other_title', form.data.get(field).strip())
-        if field == 'other_title':
-            for other_tit in form.data.get(field):
-                # logging.info(other_tit)
-                if other_tit.get('other_title'):
-                    solr_data.setdefault('parallel_title', other_tit.get('other_title').strip())
-                    solr_data.setdefault('other_title', other_tit.get('other_title').strip())
-        if field == 'issued':
-            if form.data.get(field):
-                solr_data.setdefault('date', form.data.get(field).replace('[', '').replace(']', '').strip())
-                solr_data.setdefault('fdate', form.data.get(field).replace('[', '').replace(']', '')[0:4].strip())
-                if len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 4:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                              '').strip())
-                elif len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 7:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                           '').strip())
-                else:
-                    solr_data.setdefault('date_boost',
-                                         '%sT00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                        '').strip())
-        if field == 'application_date':
-            if form.data.get(field):
-                solr_data.setdefault('date', form.data.get(field).replace('[', '').replace(']', '').strip())
-                solr_data.setdefault('fdate', form.data.get(field).replace('[', '').replace(']', '')[0:4].strip())
-                if len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 4:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                              '').strip())
-                elif len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 7:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                           '').strip())
-                else:
-                    solr_data.setdefault('date_boost',
-                                         '%sT00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                        '').strip())
-        if field == 'priority_date':
-            if form.data.get(field):
-                solr_data.setdefault('date', form.data.get(field).replace('[', '').replace(']', '').strip())
-                solr_data.setdefault('fdate', form.data.get(field).replace('[', '').replace(']', '')[0:4].strip())
-                if len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 4:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                              '').strip())
-                elif len(form.data.get(field).replace('[', '').replace(']', '').strip()) == 7:
-                    solr_data.setdefault('date_boost',
-                                         '%s-01T00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                           '').strip())
-                else:
-                    solr_data.setdefault('date_boost',
-                                         '%sT00:00:00Z' % form.data.get(field).replace('[', '').replace(']',
-                                                                                                        '').strip())
-        if field == 'publisher':
-            solr_data.setdefault('publisher', form.data.get(field).strip())
-            solr_data.setdefault('fpublisher', form.data.get(field).strip())
-        if field == 'peer_reviewed':
-            solr_data.setdefault('peer_reviewed', form.data.get(field))
-        if field == 'language':
-            for lang in form.data.get(field):
-                solr_data.setdefault('language', []).append(lang)
-        if field == 'person':
-            # für alle personen
-            for idx, person in enumerate(form.data.get(field)):
-                # hat die person einen namen?
-                if person.get('name'):
-                    solr_data.setdefault('person', []).append(person.get('name').strip())
-                    solr_data.setdefault('fperson', []).append(person.get('name').strip())
-                    # hat die person eine gnd-id?
-                    if person.get('gnd'):
-                        # logging.info('drin: gnd: %s' % person.get('gnd'))
-                        solr_data.setdefault('pnd', []).append(
-                            '%s#%s' % (person.get('gnd').strip(), person.get('name').strip()))
-                        # prüfe, ob eine 'person' mit GND im System ist. Wenn ja, setze affiliation_context, wenn nicht
-                        # schon belegt.
-                        try:
-                            query = 'id:%s' % person.get('gnd')
-                            gnd_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                            application=secrets.SOLR_APP, core='person', query=query, facet='false',
-                                            fields=['wtf_json'])
-                            gnd_solr.request()
-                            if len(gnd_solr.results) == 0:
-                                # logging.info('keine Treffer zu gnd: %s' % person.get('gnd'))
-                                if current_user.role == 'admin' or current_user.role == 'superadmin':
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "person" could not be found! Ref: %s' % person.get('gnd')),
-                                        'warning')
-                            else:
-                                # setze den parameter für die boolesche zugehörigkeit
-                                myjson = json.loads(gnd_solr.results[0].get('wtf_json'))
-                                for catalog in myjson.get('catalog'):
-                                    if 'Bochum' in catalog:
-                                        # logging.info("%s, %s: yo! rubi!" % (person.get('name'), person.get('gnd')))
-                                        form.person[idx].rubi.data = True
-                                        solr_data.setdefault('frubi_pers', []).append('%s#%s' % (person.get('gnd').strip(), person.get('name').strip()))
-                                        is_rubi = True
-                                    if 'Dortmund' in catalog:
-                                        form.person[idx].tudo.data = True
-                                        solr_data.setdefault('ftudo_pers', []).append('%s#%s' % (person.get('gnd').strip(), person.get('name').strip()))
-                                        is_tudo = True
-                                # details zur zugeörigkeit ermitteln
-                                for idx1, doc in enumerate(gnd_solr.results):
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    # logging.info(myjson)
-                                    if myjson.get('affiliation') and len(myjson.get('affiliation')) > 0:
-                                        for affiliation in myjson.get('affiliation'):
-                                            affiliation_id = affiliation.get('organisation_id')
-                                            # logging.info(affiliation_id)
-                                            # füge affiliation_context dem wtf_json hinzu
-                                            # TODO wollen wir das?
-                                            # if affiliation_id not in form.data.get('affiliation_context'):
-                                                # form.affiliation_context.append_entry(affiliation_id)
-                        except AttributeError as e:
-                            logging.error(e)
-                    else:
-                        # TODO versuche Daten aus dem'person'-Index zu holen (vgl. is_part_of oder has_part)
-                        # die gndid muss dann aber auch dem 'wtf' hinzugefügt werden
-                        solr_data.setdefault('pnd', []).append(
-                            '%s#person-%s#%s' % (form.data.get('id'), idx, person.get('name').strip()))
-        if field == 'corporation':
-            for idx, corporation in enumerate(form.data.get(field)):
-                if corporation.get('name'):
-                    solr_data.setdefault('institution', []).append(corporation.get('name').strip())
-                    solr_data.setdefault('fcorporation', []).append(corporation.get('name').strip())
-                    # TODO reicht gnd hier aus? eher nein, oder?
-                    if corporation.get('gnd'):
-                        solr_data.setdefault('gkd', []).append(
-                            '%s#%s' % (corporation.get('gnd').strip(), corporation.get('name').strip()))
-                        # prüfe, ob eine 'person' mit GND im System ist. Wenn ja, setze affiliation_context, wenn nicht
-                        # schon belegt.
-                        try:
-                            query = 'id:%s' % corporation.get('gnd')
-                            gnd_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                            application=secrets.SOLR_APP, core='organisation', query=query, facet='false',
-                                            fields=['wtf_json'])
-                            gnd_solr.request()
-                            if len(gnd_solr.results) == 0:
-                                # logging.info('keine Treffer zu gnd: %s' % person.get('gnd'))
-                                if current_user.role == 'admin' or current_user.role == 'superadmin':
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "corporation" could not be found! Ref: %s' % corporation.get('gnd')),
-                                        'warning')
-                            else:
-                                # setze den parameter für die boolesche zugehörigkeit
-                                myjson = json.loads(gnd_solr.results[0].get('wtf_json'))
-                                for catalog in myjson.get('catalog'):
-                                    if 'Bochum' in catalog:
-                                        # logging.info("%s, %s: yo! rubi!" % (corporation.get('name'), corporation.get('gnd')))
-                                        form.corporation[idx].rubi.data = True
-                                        solr_data.setdefault('frubi_orga', []).append('%s#%s' % (corporation.get('gnd').strip(), corporation.get('name').strip()))
-                                        is_rubi = True
-                                    if 'Dortmund' in catalog:
-                                        form.corporation[idx].tudo.data = True
-                                        solr_data.setdefault('ftudo_orga', []).append('%s#%s' % (corporation.get('gnd').strip(), corporation.get('name').strip()))
-                                        is_tudo = True
-                                # details zur zugeörigkeit ermitteln
-                                for idx1, doc in enumerate(gnd_solr.results):
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    # logging.info(myjson)
-                                    if myjson.get('affiliation') and len(myjson.get('affiliation')) > 0:
-                                        for affiliation in myjson.get('affiliation'):
-                                            affiliation_id = affiliation.get('organisation_id')
-                                            # logging.info(affiliation_id)
-                                            # füge affiliation_context dem wtf_json hinzu
-                                            if affiliation_id not in form.data.get('affiliation_context'):
-                                                form.affiliation_context.append_entry(affiliation_id)
-                        except AttributeError as e:
-                            logging.error(e)
-                    else:
-                        solr_data.setdefault('gkd', []).append(
-                            '%s#corporation-%s#%s' % (form.data.get('id'), idx, corporation.get('name').strip()))
-                if corporation.get('role'):
-                    if 'RadioTVProgram' in form.data.get('pubtype') and corporation.get('role')[0] == 'edt':
-                        form.corporation[idx].role.data = 'brd'
-                    if 'Thesis' in form.data.get('pubtype') and corporation.get('role')[0] == 'ctb':
-                        form.corporation[idx].role.data = 'dgg'
-
-        # content and subjects
-        if field == 'abstract':
-            for abstract in form.data.get(field):
-                if abstract.get('sharable'):
-                    solr_data.setdefault('abstract', []).append(abstract.get('content').strip())
-                else:
-                    solr_data.setdefault('ro_abstract', []).append(abstract.get('content').strip())
-        if field == 'keyword':
-            for keyword in form.data.get(field):
-                if keyword.strip():
-                    solr_data.setdefault('subject', []).append(keyword.strip())
-        if field == 'keyword_temporal':
-            for keyword in form.data.get(field):
-                if keyword.strip():
-                    solr_data.setdefault('subject', []).append(keyword.strip())
-        if field == 'keyword_geographic':
-            for keyword in form.data.get(field):
-                if keyword.strip():
-                    solr_data.setdefault('subject', []).append(keyword.strip())
-        if field == 'swd_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('subject', []).append(keyword.get('label').strip())
-        if field == 'ddc_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('ddc', []).append(keyword.get('label').strip())
-        if field == 'mesh_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('mesh_term', []).append(keyword.get('label').strip())
-        if field == 'stw_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('stwterm_de', []).append(keyword.get('label').strip())
-        if field == 'lcsh_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('subject', []).append(keyword.get('label').strip())
-        if field == 'thesoz_subject':
-            for keyword in form.data.get(field):
-                if keyword.get('label') and keyword.get('label').strip():
-                    solr_data.setdefault('subject', []).append(keyword.get('label').strip())
-        # IDs
-        if field == 'DOI':
-            try:
-                for doi in form.data.get(field):
-                    solr_data.setdefault('doi', []).append(doi.strip())
-            except AttributeError as e:
-                logging.error(form.data.get('id'))
-                pass
-        if field == 'ISSN':
-            try:
-                for issn in form.data.get(field):
-                    solr_data.setdefault('issn', []).append(issn.strip())
-                    solr_data.setdefault('isxn', []).append(issn.strip())
-            except AttributeError as e:
-                logging.error(form.data.get('id'))
-                pass
-        if field == 'ZDBID':
-            try:
-                for zdbid in form.data.get(field):
-                    solr_data.setdefault('zdbid', []).append(zdbid.strip())
-            except AttributeError as e:
-                logging.error(form.data.get('id'))
-                pass
-        if field == 'ISBN':
-            try:
-                for isbn in form.data.get(field):
-                    solr_data.setdefault('isbn', []).append(isbn.strip())
-                    solr_data.setdefault('isxn', []).append(isbn.strip())
-            except AttributeError as e:
-                logging.error(form.data.get('id'))
-                pass
-        if field == 'ISMN':
-            try:
-                for ismn in form.data.get(field):
-                    solr_data.setdefault('ismn', []).append(ismn.strip())
-                    solr_data.setdefault('isxn', []).append(ismn.strip())
-            except AttributeError as e:
-                logging.error(form.data.get('id'))
-                pass
-        if field == 'PMID':
-            solr_data.setdefault('pmid', form.data.get(field).strip())
-        if field == 'WOSID':
-            solr_data.setdefault('isi_id', form.data.get(field).strip())
-        if field == 'orcid_put_code':
-            solr_data.setdefault('orcid_put_code', form.data.get(field).strip())
-
-        # funding
-        if field == 'note':
-            if 'funded by the Deutsche Forschungsgemeinschaft' in form.data.get(field):
-                form.DFG.data = True
-                solr_data.setdefault('dfg', form.data.get('DFG'))
-
-        if field == 'DFG':
-            solr_data.setdefault('dfg', form.data.get('DFG'))
-
-        # related entities
-        if field == 'event':
-            for event in form.data.get(field):
-                solr_data.setdefault('other_title', event.get('event_name').strip())
-        if field == 'container_title':
-            solr_data.setdefault('journal_title', form.data.get(field).strip())
-            solr_data.setdefault('fjtitle', form.data.get(field).strip())
-
-        if field == 'is_part_of' and len(form.data.get(field)) > 0:
-            ipo_ids = []
-            ipo_index = {}
-            try:
-                for idx, ipo in enumerate(form.data.get(field)):
-                    if ipo:
-                        # logging.info(ipo)
-                        if 'is_part_of' in ipo:
-                            # logging.info('POOP')
-                            if ipo.get('is_part_of') != '':
-                                ipo_ids.append(ipo.get('is_part_of').strip())
-                                ipo_index.setdefault(ipo.get('is_part_of').strip(), idx)
-                        else:
-                            # logging.info('PEEP')
-                            ipo_ids.append(ipo)
-                            ipo_index.setdefault(ipo, idx)
-                query = ''
-                if len(ipo_ids) > 1:
-                    query = '{!terms f=id}%s' % ','.join(ipo_ids)
-                if len(ipo_ids) == 1:
-                    query = 'id:%s' % ipo_ids[0]
-                if len(ipo_ids) > 0:
-                    ipo_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, query=query, rows=len(ipo_ids), facet='false',
-                                    fields=['wtf_json'])
-                    ipo_solr.request()
-                    if len(ipo_solr.results) == 0:
-                        if current_user.role == 'admin' or current_user.role == 'superadmin':
-                            flash(gettext(
-                                'Not all IDs from relation "is part of" could be found! Ref: %s' % form.data.get('id')),
-                                'warning')
-                    for doc in ipo_solr.results:
-                        myjson = json.loads(doc.get('wtf_json'))
-                        is_part_of.append(myjson.get('id'))
-                        idx = ipo_index.get(myjson.get('id'))
-                        title = myjson.get('title')
-                        if myjson.get('subseries'):
-                            title = '%s / %s' % (title, myjson.get('subseries'))
-                        solr_data.setdefault('is_part_of_id', []).append(myjson.get('id'))
-                        solr_data.setdefault('is_part_of', []).append(json.dumps({'pubtype': myjson.get('pubtype'),
-                                                                                  'id': myjson.get('id'),
-                                                                                  'title': title,
-                                                                                  'issn': myjson.get('issn'),
-                                                                                  'isbn': myjson.get('isbn'),
-                                                                                  'page_first': form.data.get(field)[
-                                                                                      idx].get('page_first', ''),
-                                                                                  'page_last': form.data.get(field)[
-                                                                                      idx].get('page_last', ''),
-                                                                                  'volume': form.data.get(field)[
-                                                                                      idx].get('volume', ''),
-                                                                                  'issue': form.data.get(field)[
-                                                                                      idx].get('issue', '')}))
-            except AttributeError as e:
-                logging.error(e)
-
-        if field == 'has_part' and len(form.data.get(field)) > 0:
-
-            hp_ids = []
-            try:
-                for idx, hp in enumerate(form.data.get(field)):
-                    if hp:
-                        if 'has_part' in hp:
-                            if hp.get('has_part') != '':
-                                hp_ids.append(hp.get('has_part').strip())
-                        else:
-                            # logging.info('PEEP')
-                            hp_ids.append(hp)
-                queries = []
-                if len(hp_ids) == 1:
-                    queries.append('id:%s' % hp_ids[0])
-                if len(hp_ids) > 1:
-                    query = '{!terms f=id}'
-                    tmp = []
-                    for hp_id in hp_ids:
-                        if len(tmp) < 2:
-                            tmp.append(hp_id)
-                        elif len(query + ','.join(tmp) + ',' + hp_id) < 7168:
-                            tmp.append(hp_id)
-                        else:
-                            queries.append('{!terms f=id}%s' % ','.join(tmp))
-                            tmp = [hp_id]
-                    if len(tmp) > 0:
-                        queries.append('{!terms f=id}%s' % ','.join(tmp))
-                if len(queries) > 0:
-                    for query in queries:
-                        hp_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, query=query, rows=len(hp_ids), facet='false',
-                                       fields=['wtf_json'])
-                        hp_solr.request()
-                        if len(hp_solr.results) == 0:
-                            if current_user.role == 'admin' or current_user.role == 'superadmin':
-                                flash(
-                                    gettext(
-                                        'Not all IDs from relation "has part" could be found! Ref: %s' % form.data.get(
-                                            'id')),
-                                    'warning')
-                        for doc in hp_solr.results:
-                            myjson = json.loads(doc.get('wtf_json'))
-                            has_part.append(myjson.get('id'))
-                            # logging.debug('PARTS: myjson.get(\'is_part_of\') = %s' % myjson.get('is_part_of'))
-                            if len(myjson.get('is_part_of')) > 0:
-                                for host in myjson.get('is_part_of'):
-                                    # logging.debug('PARTS: host = %s' % host)
-                                    # logging.debug('PARTS: %s vs. %s' % (host.get('is_part_of'), id))
-                                    if host.get('is_part_of') == id:
-                                        solr_data.setdefault('has_part_id', []).append(myjson.get('id'))
-                                        solr_data.setdefault('has_part', []).append(json.dumps({'pubtype': myjson.get('pubtype'),
-                                                                                                'id': myjson.get('id'),
-                                                                                                'title': myjson.get('title'),
-                                                                                                'page_first': host.get('page_first', ''),
-                                                                                                'page_last': host.get('page_last', ''),
-                                                                                                'volume': host.get('volume', ''),
-                                                                                                'issue': host.get('issue', '')}))
-                            # logging.info(solr_data.get('has_part'))
-            except AttributeError as e:
-                logging.error('has_part: %s' % e)
-
-        if field == 'other_version' and len(form.data.get(field)) > 0:
-            # for myov in form.data.get(field):
-            # logging.info('OV ' + myov)
-            ov_ids = []
-            try:
-                for version in form.data.get(field):
-                    if version.get('other_version') != '':
-                        ov_ids.append(version.get('other_version'))
-                query = ''
-                if len(ov_ids) > 0:
-                    query = '{!terms f=id}%s' % ','.join(ov_ids)
-                if len(ov_ids) == 1:
-                    query = 'id:%s' % ov_ids[0]
-                if len(ov_ids) > 0:
-                    ov_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                   application=secrets.SOLR_APP, query=query, facet='false', fields=['wtf_json'])
-                    ov_solr.request()
-                    if len(ov_solr.results) == 0:
-                        if current_user.role == 'admin' or current_user.role == 'superadmin':
-                            flash(
-                                gettext(
-                                    'Not all IDs from relation "other version" could be found! Ref: %s' % form.data.get(
-                                        'id')),
-                                'warning')
-                    for doc in ov_solr.results:
-                        # logging.info(json.loads(doc.get('wtf_json')))
-                        myjson = json.loads(doc.get('wtf_json'))
-                        other_version.append(myjson.get('id'))
-                        solr_data.setdefault('other_version_id', []).append(myjson.get('id'))
-                        solr_data.setdefault('other_version', []).append(json.dumps({'pubtype': myjson.get('pubtype'),
-                                                                                     'id': myjson.get('id'),
-                                                                                     'title': myjson.get('title'),}))
-            except AttributeError as e:
-                logging.error(e)
-
-    solr_data.setdefault('rubi', is_rubi)
-    solr_data.setdefault('tudo', is_tudo)
-
-    wtf_json = json.dumps(form.data).replace(' "', '"')
-    solr_data.setdefault('wtf_json', wtf_json)
-
-    csl_json = json.dumps(wtf_csl.wtf_csl(wtf_records=[json.loads(wtf_json)]))
-    solr_data.setdefault('csl_json', csl_json)
-
-    # TODO build openurl
-    open_url = openurl_processor.wtf_openurl(json.loads(wtf_json))
-    solr_data.setdefault('bibliographicCitation', open_url)
-
-    record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, core='hb2', data=[solr_data])
-    record_solr.update()
-    # reload all records listed in has_part, is_part_of, other_version
-    # logging.debug('relitems = %s' % relitems)
-    # logging.info('has_part: %s' % has_part)
-    # logging.info('is_part_of: %s' % is_part_of)
-    # logging.info('other_version: %s' % other_version)
-    if relitems:
-        for record_id in has_part:
-            # lock record
-            lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2',
-                                    data=[{'id': record_id, 'locked': {'set': 'true'}}])
-            lock_record_solr.update()
-            # search record
-            edit_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2', query='id:%s' % record_id)
-            edit_record_solr.request()
-            # load record in form and modify changeDate
-            thedata = json.loads(edit_record_solr.results[0].get('wtf_json'))
-            form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-            # add is_part_of to form if not exists
-            exists = False
-            if form.data.get('is_part_of'):
-                for ipo in form.data.get('is_part_of'):
-                    if ipo.get('is_part_of') == id:
-                        exists = True
-                        break
-            if not exists:
-                try:
-                    is_part_of_form = IsPartOfForm()
-                    is_part_of_form.is_part_of.data = id
-                    form.is_part_of.append_entry(is_part_of_form.data)
-                    form.changed.data = timestamp()
-                    # save record
-                    _record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    flash(gettext('ERROR linking from %s: %s' % (record_id, str(e))), 'error')
-            else:
-                # save record
-                _record2solr(form, action='update', relitems=False)
-            # unlock record
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                      application=secrets.SOLR_APP, core='hb2',
-                                      data=[{'id': record_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
-        for record_id in is_part_of:
-            # lock record
-            lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2',
-                                    data=[{'id': record_id, 'locked': {'set': 'true'}}])
-            lock_record_solr.update()
-            # search record
-            edit_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2', query='id:%s' % record_id)
-            edit_record_solr.request()
-            # load record in form and modify changeDate
-            thedata = json.loads(edit_record_solr.results[0].get('wtf_json'))
-            # logging.info('is_part_of-Item: %s' % thedata)
-            form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-            # add has_part to form
-            exists = False
-            if form.data.get('has_part'):
-                for hpo in form.data.get('has_part'):
-                    if hpo.get('has_part') == id:
-                        exists = True
-                        break
-            if not exists:
-                try:
-                    has_part_form = HasPartForm()
-                    has_part_form.has_part.data = id
-                    form.has_part.append_entry(has_part_form.data)
-                    form.changed.data = timestamp()
-                    # save record
-                    _record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    flash(gettext('ERROR linking from %s: %s' % (record_id, str(e))), 'error')
-            else:
-                # save record
-                _record2solr(form, action='update', relitems=False)
-
-            # unlock record
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                      application=secrets.SOLR_APP, core='hb2',
-                                      data=[{'id': record_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
-        for record_id in other_version:
-            # lock record
-            lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2',
-                                    data=[{'id': record_id, 'locked': {'set': 'true'}}])
-            lock_record_solr.update()
-            # search record
-            edit_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                    application=secrets.SOLR_APP, core='hb2', query='id:%s' % record_id)
-            edit_record_solr.request()
-            # load record in form and modify changeDate
-            thedata = json.loads(edit_record_solr.results[0].get('wtf_json'))
-            form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-            # add is_part_of to form
-            exists = False
-            if form.data.get('other_version'):
-                for ovo in form.data.get('other_version'):
-                    if ovo.get('other_version') == id:
-                        exists = True
-                        break
-            if not exists:
-                try:
-                    other_version_form = OtherVersionForm()
-                    other_version_form.other_version.data = id
-                    form.other_version.append_entry(other_version_form.data)
-                    form.changed.data = timestamp()
-                    # save record
-                    _record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    flash(gettext('ERROR linking from %s: %s' % (record_id, str(e))), 'error')
-            else:
-                # save record
-                _record2solr(form, action='update', relitems=False)
-            # unlock record
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                      application=secrets.SOLR_APP, core='hb2',
-                                      data=[{'id': record_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
-
-
-def _person2solr(form, action):
-    tmp = {}
-
-    if not form.data.get('editorial_status'):
-        form.editorial_status.data = 'new'
-
-    if not form.data.get('owner'):
-        tmp.setdefault('owner', ['daten.ub@tu-dortmund.de'])
-    else:
-        tmp.setdefault('owner', form.data.get('owner'))
-
-    new_id = form.data.get('id')
-    for field in form.data:
-        if field == 'name':
-            form.name.data = form.data.get(field).strip()
-            tmp.setdefault('name', form.data.get(field).strip())
-        elif field == 'also_known_as':
-            for also_known_as in form.data.get(field):
-                if len(also_known_as.strip()) > 0:
-                    tmp.setdefault('also_known_as', []).append(str(also_known_as).strip())
-        elif field == 'same_as':
-            for same_as in form.data.get(field):
-                if len(same_as.strip()) > 0:
-                    tmp.setdefault('same_as', []).append(same_as.strip())
-        elif field == 'gnd':
-            if len(form.data.get(field).strip()) > 0:
-                tmp.setdefault('gnd', form.data.get(field).strip())
-                new_id = form.data.get(field).strip()
-        elif field == 'dwid':
-            tmp.setdefault('dwid', form.data.get(field))
-            logging.info('%s vs. %s' % (form.data.get(field).strip(), form.data.get('gnd')))
-            if len(form.data.get('gnd')) == 0 and len(form.data.get(field).strip()) > 0:
-                new_id = form.data.get(field).strip().strip()
-        elif field == 'email':
-            tmp.setdefault('email', form.data.get(field))
-        elif field == 'rubi':
-            tmp.setdefault('rubi', form.data.get(field))
-        elif field == 'tudo':
-            tmp.setdefault('tudo', form.data.get(field))
-        elif field == 'created':
-            tmp.setdefault('created', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'changed':
-            tmp.setdefault('changed', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'catalog':
-            for catalog in form.data.get(field):
-                tmp.setdefault('catalog', catalog.strip())
-        elif field == 'status':
-            for status in form.data.get(field):
-                tmp.setdefault('personal_status', []).append(status.strip())
-        elif field == 'editorial_status':
-            tmp.setdefault('editorial_status', form.data.get(field))
-        elif field == 'deskman' and form.data.get(field):
-            tmp.setdefault('deskman', form.data.get(field).strip())
-        elif field == 'catalog':
-            for catalog in form.data.get(field):
-                tmp.setdefault('catalog', catalog.strip())
-        elif field == 'research_interest':
-            for research_interest in form.data.get(field):
-                tmp.setdefault('research_interest', []).append(research_interest.strip())
-        elif field == 'url':
-            for url in form.data.get(field):
-                tmp.setdefault('url', []).append(url.get('label').strip())
-        elif field == 'membership':
-            for membership in form.data.get(field):
-                if membership.get('label'):
-                    tmp.setdefault('membership', []).append(membership.get('label').strip())
-        elif field == 'award':
-            for award in form.data.get(field):
-                if award.get('label'):
-                    tmp.setdefault('award', []).append(award.get('label').strip())
-        elif field == 'project':
-            for project in form.data.get(field):
-                if project.get('label'):
-                    tmp.setdefault('project', []).append(project.get('label').strip())
-                if project.get('project_id') and project.get('label'):
-                    tmp.setdefault('project_id', []).append(
-                        '%s#%s' % (project.get('project_id').strip(), project.get('label').strip()))
-                if project.get('project_type'):
-                    tmp.setdefault('project_type', []).append(project.get('project_type'))
-        elif field == 'thesis':
-            for thesis in form.data.get(field):
-                if thesis.get('label'):
-                    tmp.setdefault('thesis', []).append(thesis.get('label').strip())
-        elif field == 'cv':
-            for cv in form.data.get(field):
-                if cv.get('label'):
-                    tmp.setdefault('cv', []).append(cv.get('label').strip())
-        elif field == 'editor':
-            for editor in form.data.get(field):
-                if editor.get('label'):
-                    tmp.setdefault('editor', []).append(editor.get('label').strip())
-                if editor.get('issn'):
-                    tmp.setdefault('editor_issn', []).append(editor.get('issn'))
-                if editor.get('zdbid'):
-                    tmp.setdefault('editor_zdbid', []).append(editor.get('zdbid'))
-        elif field == 'reviewer':
-            for reviewer in form.data.get(field):
-                if reviewer.get('label'):
-                    tmp.setdefault('reviewer', []).append(reviewer.get('label').strip())
-                if reviewer.get('issn'):
-                    tmp.setdefault('reviewer_issn', []).append(reviewer.get('issn'))
-                if reviewer.get('zdbid'):
-                    tmp.setdefault('reviewer_zdbid', []).append(reviewer.get('zdbid'))
-        elif field == 'data_supplied':
-            if form.data.get(field).strip() != "":
-                tmp.setdefault('data_supplied', '%sT00:00:00.001Z' % form.data.get(field).strip())
-
-        elif field == 'affiliation':
-            for idx, affiliation in enumerate(form.data.get(field)):
-                if affiliation.get('organisation_id'):
-                    tmp.setdefault('affiliation_id', affiliation.get('organisation_id'))
-                    try:
-                        query = 'id:%s' % affiliation.get('organisation_id')
-                        parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='organisation', query=query,
-                                           facet='false', fields=['wtf_json'])
-                        parent_solr.request()
-                        if len(parent_solr.results) == 0:
-                            query = 'account:%s' % affiliation.get('organisation_id')
-                            parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                               application=secrets.SOLR_APP, core='organisation', query=query,
-                                               facet='false', fields=['wtf_json'])
-                            parent_solr.request()
-                            if len(parent_solr.results) == 0:
-                                query = 'same_as:%s' % affiliation.get('organisation_id')
-                                parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                   application=secrets.SOLR_APP, core='organisation', query=query,
-                                                   facet='false', fields=['wtf_json'])
-                                parent_solr.request()
-                                if len(parent_solr.results) == 0:
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "organisation_id" could not be found! Ref: %s' % affiliation.get(
-                                                'organisation_id')),
-                                        'warning')
-                                else:
-                                    for doc in parent_solr.results:
-                                        myjson = json.loads(doc.get('wtf_json'))
-                                        # logging.info(myjson.get('pref_label'))
-                                        label = myjson.get('pref_label').strip()
-                                        form.affiliation[idx].pref_label.data = label
-                                        tmp.setdefault('affiliation', []).append(label)
-                                        tmp.setdefault('faffiliation', []).append(label)
-                            else:
-                                for doc in parent_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    # logging.info(myjson.get('pref_label'))
-                                    label = myjson.get('pref_label').strip()
-                                    form.affiliation[idx].pref_label.data = label
-                                    tmp.setdefault('affiliation', []).append(label)
-                                    tmp.setdefault('faffiliation', []).append(label)
-                        else:
-                            for doc in parent_solr.results:
-                                myjson = json.loads(doc.get('wtf_json'))
-                                # logging.info(myjson.get('pref_label'))
-                                label = myjson.get('pref_label').strip()
-                                form.affiliation[idx].pref_label.data = label
-                                tmp.setdefault('affiliation', []).append(label)
-                                tmp.setdefault('faffiliation', []).append(label)
-                    except AttributeError as e:
-                        logging.error(e)
-                elif affiliation.get('pref_label'):
-                    tmp.setdefault('affiliation', []).append(affiliation.get('pref_label').strip())
-                    tmp.setdefault('faffiliation', []).append(affiliation.get('pref_label').strip())
-
-        elif field == 'group':
-            for idx, group in enumerate(form.data.get(field)):
-                if group.get('group_id'):
-                    tmp.setdefault('group_id', group.get('group_id'))
-                    try:
-                        query = 'id:%s' % group.get('group_id')
-                        group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, core='group', query=query, facet='false',
-                                          fields=['wtf_json'])
-                        group_solr.request()
-                        if len(group_solr.results) == 0:
-                            query = 'same_as:%s' % group.get('group_id')
-                            group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                              application=secrets.SOLR_APP, core='group', query=query,
-                                              facet='false', fields=['wtf_json'])
-                            group_solr.request()
-                            if len(group_solr.results) == 0:
-                                flash(
-                                    gettext(
-                                        'IDs from relation "group_id" could not be found! Ref: %s' % group.get(
-                                            'group_id')),
-                                    'warning')
-                            else:
-                                for doc in group_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    # logging.info(myjson.get('pref_label'))
-                                    label = myjson.get('pref_label').strip()
-                                    form.affiliation[idx].pref_label.data = label
-                                    tmp.setdefault('group', []).append(label)
-                                    tmp.setdefault('fgroup', []).append(label)
-                        else:
-                            for doc in group_solr.results:
-                                myjson = json.loads(doc.get('wtf_json'))
-                                # logging.info(myjson.get('pref_label'))
-                                label = myjson.get('pref_label').strip()
-                                form.group[idx].pref_label.data = label
-                                tmp.setdefault('group', []).append(label)
-                                tmp.setdefault('fgroup', []).append(label)
-                    except AttributeError as e:
-                        logging.error(e)
-                elif group.get('pref_label'):
-                    tmp.setdefault('group', []).append(group.get('pref_label').strip())
-                    tmp.setdefault('fgroup', []).append(group.get('pref_label').strip())
-
-    doit = False
-    if action == 'create':
-        person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='person', query='id:%s' % new_id,
-                           facet='false', fields=['wtf_json'])
-        person_solr.request()
-        if len(person_solr.results) == 0:
-            doit = True
-    else:
-        doit = True
-
-    # logging.info('new_id: %s for %s' % (new_id, form.data.get('id')))
-    # logging.info('doit: %s for %s' % (doit, form.data.get('id')))
-
-    if doit:
-        if new_id != form.data.get('id'):
-            form.same_as.append_entry(form.data.get('id'))
-            tmp.setdefault('same_as', []).append(form.data.get('id'))
-            # delete record with current id
-            try:
-                delete_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, core='person', del_id=form.data.get('id'))
-                delete_person_solr.delete()
-            except AttributeError as e:
-                logging.error(e)
-            form.id.data = new_id
-        tmp.setdefault('id', new_id)
-        wtf_json = json.dumps(form.data)
-        tmp.setdefault('wtf_json', wtf_json)
-        person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='person', data=[tmp])
-        person_solr.update()
-
-    return doit, new_id
-
-
-def _orga2solr(form, action, relitems=True):
-    tmp = {}
-    parents = []
-    children = []
-    projects = []
-
-    id = form.data.get('id').strip()
-    logging.info('ID: %s' % id)
-    dwid = form.data.get('dwid')
-    logging.info('DWID: %s' % dwid)
-
-    if not form.data.get('editorial_status'):
-        form.editorial_status.data = 'new'
-
-    if not form.data.get('owner'):
-        tmp.setdefault('owner', ['daten.ub@tu-dortmund.de'])
-    else:
-        tmp.setdefault('owner', form.data.get('owner'))
-
-    for field in form.data:
-        if field == 'orga_id':
-            tmp.setdefault('orga_id', form.data.get(field))
-        elif field == 'same_as':
-            for same_as in form.data.get(field):
-                if len(same_as.strip()) > 0:
-                    tmp.setdefault('same_as', []).append(same_as.strip())
-        elif field == 'pref_label':
-            tmp.setdefault('pref_label', form.data.get(field).strip())
-        elif field == 'alt_label':
-            for alt_label in form.data.get(field):
-                tmp.setdefault('alt_label', []).append(alt_label.strip())
-        elif field == 'dwid':
-            for account in form.data.get(field):
-                tmp.setdefault('account', []).append(account.strip())
-            if len(form.data.get('gnd')) == 0 and len(form.data.get(field)[0].strip()) > 0:
-                form.id.data = form.data.get(field)[0].strip()
-        elif field == 'gnd':
-            if len(form.data.get(field)) > 0:
-                tmp.setdefault('gnd', form.data.get(field).strip())
-                form.id.data = form.data.get(field).strip()
-        elif field == 'created':
-            tmp.setdefault('created', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'changed':
-            tmp.setdefault('changed', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'deskman' and form.data.get(field):
-            tmp.setdefault('deskman', form.data.get(field).strip())
-        elif field == 'editorial_status':
-            tmp.setdefault('editorial_status', form.data.get(field))
-        elif field == 'catalog':
-            for catalog in form.data.get(field):
-                tmp.setdefault('catalog', catalog.strip())
-        elif field == 'destatis':
-            for destatis in form.data.get(field):
-                if destatis.get('destatis_label'):
-                    tmp.setdefault('destatis_label', []).append(destatis.get('destatis_label').strip())
-                if destatis.get('destatis_id'):
-                    tmp.setdefault('destatis_id', []).append(destatis.get('destatis_id').strip())
-
-        elif field == 'parent':
-            parent = form.data.get(field)[0]
-            # logging.info('parent: %s' % parent)
-            if parent.get('parent_id'):
-                # remember ID for work on related entity
-                parents.append(parent.get('parent_id'))
-                # prepare index data and enrich form data
-                tmp.setdefault('parent_id', parent.get('parent_id'))
-                try:
-                    query = 'id:%s' % parent.get('parent_id')
-                    parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='organisation', query=query,
-                                       facet='false',
-                                       fields=['wtf_json'])
-                    parent_solr.request()
-                    # logging.info('Treffer für %s: %s' % (parent.get('id'), len(parent_solr.results)))
-                    if len(parent_solr.results) == 0:
-                        flash(
-                        gettext(
-                            'IDs from relation "parent" could not be found! Ref: %s' % parent.get('parent_id')),
-                        'warning')
-                    else:
-                        for doc in parent_solr.results:
-                            myjson = json.loads(doc.get('wtf_json'))
-                            label = myjson.get('pref_label').strinp()
-                            tmp.setdefault('parent_label', label)
-                            tmp.setdefault('fparent', '%s#%s' % (myjson.get('id').strip(), label))
-                            form.parent[0].parent_label.data = label
-                except AttributeError as e:
-                    logging.error('ORGA: parent_id=%s: %s' % (parent.get('parent_id'), e))
-            elif parent.get('parent_label') and len(parent.get('parent_label')) > 0:
-                tmp.setdefault('fparent', parent.get('parent_label'))
-                tmp.setdefault('parent_label', parent.get('parent_label'))
-
-        elif field == 'children':
-            # logging.info('children in form of %s : %s' % (id, form.data.get(field)))
-            for idx, child in enumerate(form.data.get(field)):
-                if child:
-                    if 'child_id' in child and 'child_label' in child:
-                        if child.get('child_id'):
-                            # remember ID for work on related entity
-                            children.append(child.get('child_id'))
-                            # prepare index data and enrich form data
-                            try:
-                                query = 'id:%s' % child.get('child_id')
-                                child_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                  application=secrets.SOLR_APP, core='organisation',
-                                                  query=query,
-                                                  facet='false', fields=['wtf_json'])
-                                child_solr.request()
-                                if len(child_solr.results) > 0:
-                                    for doc in child_solr.results:
-                                        myjson = json.loads(doc.get('wtf_json'))
-                                        label = myjson.get('pref_label').strip()
-                                        form.children[idx].child_label.data = label
-                                        tmp.setdefault('children', []).append(
-                                            json.dumps({'id': myjson.get('id').strip(),
-                                                        'label': label,
-                                                        'type': 'organisation'}))
-                                        tmp.setdefault('fchildren', []).append(
-                                            '%s#%s' % (myjson.get('id').strip(), label))
-                                else:
-                                    child_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                      application=secrets.SOLR_APP, core='group',
-                                                      query=query,
-                                                      facet='false', fields=['wtf_json'])
-                                    child_solr.request()
-                                    if len(child_solr.results) > 0:
-                                        for doc in child_solr.results:
-                                            myjson = json.loads(doc.get('wtf_json'))
-                                            label = myjson.get('pref_label').strip()
-                                            form.children[idx].child_label.data = label
-                                            tmp.setdefault('children', []).append(json.dumps({'id': myjson.get('id').strip(),
-                                                                                              'label': label,
-                                                                                              'type': 'group'}))
-                                            tmp.setdefault('fchildren', []).append(
-                                                '%s#%s' % (myjson.get('id').strip(), label))
-
-                                    else:
-                                        flash(
-                                            gettext(
-                                                'IDs from relation "child" could not be found! Ref: %s' % child.get(
-                                                    'child_id')),
-                                            'warning')
-
-                            except AttributeError as e:
-                                logging.error('ORGA: child_id=%s: %s' % (child.get('child_id'), e))
-                        elif child.get('child_label'):
-                            tmp.setdefault('children', []).append(json.dumps({'id': '',
-                                                                              'label': child.get('child_label').strip(),
-                                                                              'type': ''}))
-                            tmp.setdefault('fchildren', []).append(child.get('child_label').strip())
-
-        elif field == 'projects':
-            # logging.info('projects in form of %s : %s' % (id, form.data.get(field)))
-            for idx, project in enumerate(form.data.get(field)):
-                if project:
-                    if 'project_id' in project and 'project_label' in project:
-                        if project.get('project_id'):
-                            # remember ID for work on related entity
-                            projects.append(project.get('project_id'))
-                            # prepare index data and enrich form data
-                            try:
-                                query = 'id:%s' % project.get('project_id')
-                                project_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                    application=secrets.SOLR_APP, core='group', query=query,
-                                                    facet='false', fields=['wtf_json'])
-                                project_solr.request()
-                                if len(project_solr.results) == 0:
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "projects" could not be found! Ref: %s' % project.get('project_id')),
-                                        'warning')
-                                for doc in project_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    label = myjson.get('pref_label').strip()
-                                    form.projects[idx].project_label.data = label
-                                    tmp.setdefault('projects', []).append(json.dumps({'id': myjson.get('id').strip(),
-                                                                                      'label': label}))
-                                    tmp.setdefault('fprojects', []).append('%s#%s' % (myjson.get('id').strip(), label))
-
-                            except AttributeError as e:
-                                logging.error('GROUP: project_id=%s: %s' % (project.get('project_id'), e))
-                        elif project.get('project_label'):
-                            tmp.setdefault('fprojects', []).append(project.get('project_label').strip())
-
-    # search record
-    search_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='organisation', rows=1000, query='parent_id:%s' % id)
-    search_orga_solr.request()
-    if len(search_orga_solr.results) > 0:
-        children = form.data.get('children')
-        for result in search_orga_solr.results:
-            exists = False
-            for project in children:
-                logging.info('%s vs. %s' % (project.get('child_id'), result.get('id')))
-                if project.get('child_id') == result.get('id'):
-                    exists = True
-                    break
-            if not exists:
-                childform = ChildForm()
-                childform.child_id.data = result.get('id')
-                childform.child_label.data = result.get('pref_label')
-                form.children.append_entry(childform.data)
-
-    # save record to index
-    try:
-        # logging.info('%s vs. %s' % (id, form.data.get('id')))
-        if id != form.data.get('id'):
-            delete_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, core='organisation', del_id=id)
-            delete_orga_solr.delete()
-            form.same_as.append_entry(id)
-            tmp.setdefault('id', form.data.get('id'))
-            tmp.setdefault('same_as', []).append(id)
-
-            id = form.data.get('id')
-        else:
-            tmp.setdefault('id', id)
-        # build json
-        wtf_json = json.dumps(form.data)
-        tmp.setdefault('wtf_json', wtf_json)
-        # logging.info(tmp)
-        orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                         application=secrets.SOLR_APP, core='organisation', data=[tmp])
-        orga_solr.update()
-    except AttributeError as e:
-        logging.error(e)
-
-    same_as = form.data.get('same_as')
-    # logging.info('same_as: %s' % same_as)
-
-    # add link to parent
-    if relitems:
-        # logging.info('parents: %s' % parents)
-        for parent_id in parents:
-            # search record
-            edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='organisation', query='id:%s' % parent_id)
-            edit_orga_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_orga_solr.results) > 0:
-                # lock record
-                lock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='organisation',
-                                      data=[{'id': parent_id, 'locked': {'set': 'true'}}])
-                lock_orga_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add child to form if not exists
-                    exists = False
-                    for project in form.data.get('children'):
-                        # logging.info('%s == %s ?' % (project.get('child_id'), id))
-                        if project.get('child_id'):
-                            if project.get('child_id') == id:
-                                exists = True
-                                break
-                            elif project.get('child_id') in dwid:
-                                exists = True
-                                break
-                            elif project.get('child_id') in same_as:
-                                exists = True
-                                break
-                    if not exists:
-                        try:
-                            childform = ChildForm()
-                            childform.child_id.data = id
-                            form.children.append_entry(childform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _orga2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (parent_id, str(e))), 'error')
-                    else:
-                        # possibly rewrite label
-                        form.changed.data = timestamp()
-                        _orga2solr(form, action='update', relitems=False)
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedate: %s' % edit_orga_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='organisation',
-                                        data=[{'id': parent_id, 'locked': {'set': 'false'}}])
-                unlock_orga_solr.update()
-            else:
-                logging.info('Currently there is no record for parent_id %s!' % parent_id)
-
-        # logging.info('children: %s' % children)
-        for child_id in children:
-            # search record
-            edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='organisation', query='id:%s' % child_id)
-            edit_orga_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_orga_solr.results) > 0:
-                # lock record
-                lock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='organisation',
-                                      data=[{'id': child_id, 'locked': {'set': 'true'}}])
-                lock_orga_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add parent to form if not exists
-                    if not form.data.get('parent'):
-                        try:
-                            parentform = ParentForm()
-                            parentform.parent_id = id
-                            form.parent.append_entry(parentform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _orga2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (child_id, str(e))), 'error')
-                    else:
-                        try:
-                            form.parent[0].parent_id = id
-                            form.changed.data = timestamp()
-                            # save record
-                            _orga2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (child_id, str(e))), 'error')
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedate: %s' % edit_orga_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='organisation',
-                                        data=[{'id': child_id, 'locked': {'set': 'false'}}])
-                unlock_orga_solr.update()
-            else:
-                edit_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='group', query='id:%s' % child_id)
-                edit_group_solr.request()
-                # load orga in form and modify changeDate
-                if len(edit_group_solr.results) > 0:
-                    # lock record
-                    lock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='group',
-                                           data=[{'id': child_id, 'locked': {'set': 'true'}}])
-                    lock_group_solr.update()
-                    # edit
-                    try:
-                        thedata = json.loads(edit_group_solr.results[0].get('wtf_json'))
-                        form = GroupAdminForm.from_json(thedata)
-                        # add parent to form if not exists
-                        if not form.data.get('parent'):
-                            try:
-                                parentform = ParentForm()
-                                parentform.parent_id = id
-                                form.parent.append_entry(parentform.data)
-                                form.changed.data = timestamp()
-                                # save record
-                                _group2solr(form, action='update', relitems=False)
-                            except AttributeError as e:
-                                flash(gettext('ERROR linking from %s: %s' % (child_id, str(e))), 'error')
-                        else:
-                            try:
-                                form.parent[0].parent_id = id
-                                form.changed.data = timestamp()
-                                # save record
-                                _group2solr(form, action='update', relitems=False)
-                            except AttributeError as e:
-                                flash(gettext('ERROR linking from %s: %s' % (child_id, str(e))), 'error')
-                    except TypeError as e:
-                        logging.error(e)
-                        logging.error('thedate: %s' % edit_group_solr.results[0].get('wtf_json'))
-                    # unlock record
-                    unlock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                             application=secrets.SOLR_APP, core='group',
-                                             data=[{'id': child_id, 'locked': {'set': 'false'}}])
-                    unlock_group_solr.update()
-
-                else:
-                    logging.info('Currently there is no record for child_id %s!' % child_id)
-
-        # logging.debug('partners: %s' % partners)
-        for project_id in projects:
-            # search record
-            query = 'id:%s' % project_id
-            edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='group', query=query)
-            edit_orga_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_orga_solr.results) > 0:
-                # lock record
-                lock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='group',
-                                      data=[{'id': project_id, 'locked': {'set': 'true'}}])
-                lock_orga_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
-                    form = GroupAdminForm.from_json(thedata)
-                    # add project to form if not exists
-                    exists = False
-                    for partner in form.data.get('partners'):
-                        # logging.info('%s == %s ?' % (project.get('project_id'), id))
-                        if partner.get('partner_id'):
-                            if partner.get('partner_id') == id:
-                                exists = True
-                                break
-                            elif partner.get('partner_id') in same_as:
-                                exists = True
-                                break
-                    # logging.debug('exists? %s' % exists)
-                    if not exists:
-                        try:
-                            partnerform = PartnerForm()
-                            partnerform.partner_id.data = id
-                            form.partners.append_entry(partnerform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _group2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (project_id, str(e))), 'error')
-                    else:
-                        # possibly rewrite label
-                        form.changed.data = timestamp()
-                        _group2solr(form, action='update', relitems=False)
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % edit_orga_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='group',
-                                        data=[{'id': project_id, 'locked': {'set': 'false'}}])
-                unlock_orga_solr.update()
-            else:
-                logging.info('Currently there is no record for project_id %s!' % project_id)
-
-        # store work records again
-        works_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                          application=secrets.SOLR_APP, core='hb2',
-                          query='affiliation_id:%s' % id, facet=False, rows=500000)
-        works_solr.request()
-
-        for work in works_solr.results:
-            # lock record
-            lock_work_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='hb2',
-                                  data=[{'id': work.get('id'), 'locked': {'set': 'true'}}])
-            lock_work_solr.update()
-
-            # edit
-            try:
-                thedata = json.loads(work.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-                form.changed.data = timestamp()
-                _record2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % work.get('wtf_json'))
-
-            # unlock record
-            unlock_work_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, core='hb2',
-                                    data=[{'id': work.get('id'), 'locked': {'set': 'false'}}])
-            unlock_work_solr.update()
-
-        # store person records again
-        persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='person',
-                            query='affiliation_id:%s' % id, facet=False, rows=500000)
-        persons_solr.request()
-
-        for person in persons_solr.results:
-            # lock record
-            lock_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, core='person',
-                                    data=[{'id': person.get('id'), 'locked': {'set': 'true'}}])
-            lock_person_solr.update()
-
-            # edit
-            try:
-                thedata = json.loads(person.get('wtf_json'))
-                form = PersonAdminForm.from_json(thedata)
-                form.changed.data = timestamp()
-                _person2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % person.get('wtf_json'))
-
-            # unlock record
-            unlock_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='person',
-                                      data=[{'id': person.get('id'), 'locked': {'set': 'false'}}])
-            unlock_person_solr.update()
-
-    return id
-
-
-def _group2solr(form, action, relitems=True):
-    tmp = {}
-    parents = []
-    children = []
-    partners = []
-
-    id = form.data.get('id').strip()
-    logging.info('ID: %s' % id)
-
-    if not form.data.get('editorial_status'):
-        form.editorial_status.data = 'new'
-
-    if action == 'update':
-        if form.data.get('editorial_status') == 'new':
-            form.editorial_status.data = 'in_process'
-
-    if not form.data.get('owner'):
-        tmp.setdefault('owner', ['daten.ub@tu-dortmund.de'])
-    else:
-        tmp.setdefault('owner', form.data.get('owner'))
-
-    for field in form.data:
-        if field == 'id':
-            tmp.setdefault('id', form.data.get(field))
-        elif field == 'same_as':
-            for same_as in form.data.get(field):
-                if len(same_as.strip()) > 0:
-                    tmp.setdefault('same_as', []).append(same_as.strip())
-        elif field == 'funds':
-            for funder in form.data.get(field):
-                if len(funder.get('organisation').strip()) > 0:
-                    tmp.setdefault('funder_id', []).append(funder.get('organisation_id').strip())
-                    tmp.setdefault('funder', []).append(funder.get('organisation').strip())
-                    tmp.setdefault('ffunder', []).append(funder.get('organisation').strip())
-        elif field == 'pref_label':
-            tmp.setdefault('pref_label', form.data.get(field).strip())
-        elif field == 'alt_label':
-            for alt_label in form.data.get(field):
-                tmp.setdefault('alt_label', []).append(alt_label.data.strip())
-        elif field == 'dwid':
-            tmp.setdefault('account', form.data.get(field))
-        elif field == 'gnd':
-            if len(form.data.get(field)) > 0:
-                tmp.setdefault('gnd', form.data.get(field).strip())
-                form.id.data = form.data.get(field).strip()
-        elif field == 'created':
-            tmp.setdefault('created', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'changed':
-            tmp.setdefault('changed', form.data.get(field).strip().replace(' ', 'T') + 'Z')
-        elif field == 'deskman' and form.data.get(field):
-            tmp.setdefault('deskman', form.data.get(field).strip())
-        elif field == 'editorial_status':
-            tmp.setdefault('editorial_status', form.data.get(field))
-        elif field == 'catalog':
-            for catalog in form.data.get(field):
-                tmp.setdefault('catalog', catalog.strip())
-        elif field == 'destatis':
-            for destatis in form.data.get(field):
-                if destatis.get('destatis_label'):
-                    tmp.setdefault('destatis_label', []).append(destatis.get('destatis_label').strip())
-                if destatis.get('destatis_id'):
-                    tmp.setdefault('destatis_id', []).append(destatis.get('destatis_id').strip())
-
-        elif field == 'parent':
-            parent = form.data.get(field)[0]
-            # logging.info('parent: %s' % parent)
-            if parent.get('parent_id'):
-                # remember ID for work on related entity
-                parents.append(parent.get('parent_id'))
-                # prepare index data and enrich form data
-                tmp.setdefault('parent_id', parent.get('parent_id'))
-                try:
-                    query = 'id:%s' % parent.get('parent_id')
-                    parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='group', query=query,
-                                       facet='false',
-                                       fields=['wtf_json'])
-                    parent_solr.request()
-                    # logging.info('Treffer für %s: %s' % (parent.get('id'), len(parent_solr.results)))
-                    results = []
-                    type = ''
-                    if len(parent_solr.results) == 0:
-
-                        parent_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='organisation', query=query,
-                                           facet='false',
-                                           fields=['wtf_json'])
-                        parent_solr.request()
-
-                        if len(parent_solr.results) == 0:
-                            flash(
-                                gettext(
-                                    'IDs from relation "parent" could not be found! Ref: %s' % parent.get('parent_id')),
-                                'warning')
-                        else:
-                            results = parent_solr.results
-                            type = 'organisation'
-                    else:
-                        results = parent_solr.results
-                        type = 'group'
-
-                    if results:
-                        for doc in parent_solr.results:
-                            myjson = json.loads(doc.get('wtf_json'))
-                            tmp.setdefault('parent_type', type)
-                            tmp.setdefault('parent_label', myjson.get('pref_label'))
-                            tmp.setdefault('fparent', '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
-                            form.parent[0].parent_label.data = myjson.get('pref_label')
-
-                except AttributeError as e:
-                    logging.error('GROUP: parent_id=%s: %s' % (parent.get('parent_id'), e))
-            elif parent.get('parent_label'):
-                tmp.setdefault('fparent', parent.get('parent_label'))
-                tmp.setdefault('parent_label', parent.get('parent_label'))
-
-        elif field == 'children':
-            # logging.info('children in form of %s : %s' % (id, form.data.get(field)))
-            for idx, child in enumerate(form.data.get(field)):
-                if child:
-                    if 'child_id' in child and 'child_label' in child:
-                        if child.get('child_id'):
-                            # remember ID for work on related entity
-                            children.append(child.get('child_id'))
-                            # prepare index data and enrich form data
-                            try:
-                                query = 'id:%s' % child.get('child_id')
-                                child_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                  application=secrets.SOLR_APP, core='group',
-                                                  query=query,
-                                                  facet='false', fields=['wtf_json'])
-                                child_solr.request()
-                                if len(child_solr.results) == 0:
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "child" could not be found! Ref: %s' % child.get(
-                                                'child_id')),
-                                        'warning')
-                                for doc in child_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    label = myjson.get('pref_label').strip()
-                                    form.children[idx].child_label.data = label
-                                    tmp.setdefault('children', []).append(json.dumps({'id': myjson.get('id'),
-                                                                                      'label': label}))
-                                    tmp.setdefault('fchildren', []).append('%s#%s' % (myjson.get('id'), label))
-                            except AttributeError as e:
-                                logging.error('GROUP: child_id=%s: %s' % (child.get('child_id'), e))
-                        elif child.get('child_label'):
-                            tmp.setdefault('children', []).append(child.get('child_label'))
-                            tmp.setdefault('fchildren', []).append(child.get('child_label'))
-
-        elif field == 'partners':
-            # logging.info('partners in form of %s : %s' % (id, form.data.get(field)))
-            for idx, partner in enumerate(form.data.get(field)):
-                if partner:
-                    if 'partner_id' in partner and 'partner_label' in partner:
-                        if partner.get('partner_id'):
-                            # remember ID for work on related entity
-                            partners.append(partner.get('partner_id'))
-                            # prepare index data and enrich form data
-                            try:
-                                query = 'id:%s' % partner.get('partner_id')
-                                partner_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                    application=secrets.SOLR_APP, core='organisation', query=query,
-                                                    facet='false', fields=['wtf_json'])
-                                partner_solr.request()
-                                # TODO same_as
-                                if len(partner_solr.results) == 0:
-                                    flash(
-                                        gettext(
-                                            'IDs from relation "partners" could not be found! Ref: %s' % partner.get('partner_id')),
-                                        'warning')
-                                for doc in partner_solr.results:
-                                    myjson = json.loads(doc.get('wtf_json'))
-                                    label = myjson.get('pref_label').strip()
-                                    form.partners[idx].partner_label.data = label
-                                    tmp.setdefault('partners', []).append(json.dumps({'id': myjson.get('id'),
-                                                                                      'label': label}))
-                                    tmp.setdefault('fpartners', []).append('%s#%s' % (myjson.get('id'), label))
-                            except AttributeError as e:
-                                logging.error('ORGA: partner_id=%s: %s' % (partner.get('partner_id'), e))
-                        elif partner.get('partner_label'):
-                            tmp.setdefault('partners', []).append(partner.get('partner_label'))
-                            tmp.setdefault('fpartners', []).append(partner.get('partner_label'))
-
-    # save record to index
-    try:
-        logging.info('%s vs. %s' % (id, form.data.get('id')))
-        if id != form.data.get('id'):
-            delete_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                     application=secrets.SOLR_APP, core='group', del_id=id)
-            delete_group_solr.delete()
-            form.same_as.append_entry(id)
-            tmp.setdefault('id', form.data.get('id'))
-            tmp.setdefault('same_as', []).append(id)
-
-            id = form.data.get('id')
-        else:
-            tmp.setdefault('id', id)
-        # build json
-        wtf_json = json.dumps(form.data)
-        tmp.setdefault('wtf_json', wtf_json)
-        # logging.info(tmp)
-        groups_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='group', data=[tmp])
-        groups_solr.update()
-    except AttributeError as e:
-        logging.error(e)
-
-    same_as = form.data.get('same_as')
-    # logging.info('same_as: %s' % same_as)
-
-    # add links to related entities
-    if relitems:
-        # logging.debug('parents: %s' % parents)
-        for parent_id in parents:
-            # search record
-            query = 'id:%s' % parent_id
-            edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='organisation', query=query)
-            edit_orga_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_orga_solr.results) > 0:
-                # lock record
-                lock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='organisation',
-                                      data=[{'id': parent_id, 'locked': {'set': 'true'}}])
-                lock_orga_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add child to form if not exists
-                    exists = False
-                    for child in form.data.get('children'):
-                        # logging.info('%s == %s ?' % (child.get('child_id'), id))
-                        if child.get('child_id') == id:
-                            exists = True
-                            break
-                        elif child.get('child_id') in same_as:
-                            exists = True
-                            break
-                    if not exists:
-                        try:
-                            childform = ChildForm()
-                            childform.child_id.data = id
-                            form.children.append_entry(childform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _orga2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (parent_id, str(e))), 'error')
-                    else:
-                        # possibly rewrite label
-                        form.changed.data = timestamp()
-                        _orga2solr(form, action='update', relitems=False)
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % edit_orga_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='organisation',
-                                        data=[{'id': parent_id, 'locked': {'set': 'false'}}])
-                unlock_orga_solr.update()
-            else:
-                edit_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='group', query=query)
-                edit_group_solr.request()
-                # load group in form and modify changeDate
-                if len(edit_group_solr.results) > 0:
-                    # lock record
-                    lock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, core='group',
-                                           data=[{'id': parent_id, 'locked': {'set': 'true'}}])
-                    lock_group_solr.update()
-                    # edit
-                    try:
-                        thedata = json.loads(edit_group_solr.results[0].get('wtf_json'))
-                        form = GroupAdminForm.from_json(thedata)
-                        # add child to form if not exists
-                        exists = False
-                        for child in form.data.get('children'):
-                            # logging.info('%s == %s ?' % (child.get('child_id'), id))
-                            if child.get('child_id') == id:
-                                exists = True
-                                break
-                            elif child.get('child_id') in same_as:
-                                exists = True
-                                break
-                        if not exists:
-                            try:
-                                childform = ChildForm()
-                                childform.child_id.data = id
-                                form.children.append_entry(childform.data)
-                                form.changed.data = timestamp()
-                                # save record
-                                _group2solr(form, action='update', relitems=False)
-                            except AttributeError as e:
-                                flash(gettext('ERROR linking from %s: %s' % (parent_id, str(e))), 'error')
-                        else:
-                            # possibly rewrite label
-                            form.changed.data = timestamp()
-                            _group2solr(form, action='update', relitems=False)
-                    except TypeError as e:
-                        logging.error(e)
-                        logging.error('thedata: %s' % edit_group_solr.results[0].get('wtf_json'))
-                    # unlock record
-                    unlock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                             application=secrets.SOLR_APP, core='group',
-                                             data=[{'id': parent_id, 'locked': {'set': 'false'}}])
-                    unlock_group_solr.update()
-                else:
-                    logging.info('Currently there is no record for parent_id %s!' % parent_id)
-
-        # logging.debug('children: %s' % children)
-        for child_id in children:
-            # search record
-            edit_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                   application=secrets.SOLR_APP, core='group', query='id:%s' % child_id)
-            edit_group_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_group_solr.results) > 0:
-                # lock record
-                lock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='group',
-                                       data=[{'id': child_id, 'locked': {'set': 'true'}}])
-                lock_group_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_group_solr.results[0].get('wtf_json'))
-                    form = GroupAdminForm.from_json(thedata)
-                    # add parent to form if not exists
-                    if not form.data.get('parent'):
-                        try:
-                            parentform = ParentForm()
-                            parentform.parent_id = id
-                            form.parent.append_entry(parentform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _group2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (parent_id, str(e))), 'error')
-                    else:
-                        try:
-                            form.parent[0].parent_id = id
-                            form.changed.data = timestamp()
-                            # save record
-                            _group2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (parent_id, str(e))), 'error')
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % edit_group_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                         application=secrets.SOLR_APP, core='group',
-                                         data=[{'id': child_id, 'locked': {'set': 'false'}}])
-                unlock_group_solr.update()
-            else:
-                logging.info('Currently there is no record for parent_id %s!' % parent_id)
-
-        # logging.debug('partners: %s' % partners)
-        for partner_id in partners:
-            # search record
-            query = 'id:%s' % partner_id
-            edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='organisation', query=query)
-            edit_orga_solr.request()
-            # load orga in form and modify changeDate
-            if len(edit_orga_solr.results) > 0:
-                # lock record
-                lock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='organisation',
-                                      data=[{'id': partner_id, 'locked': {'set': 'true'}}])
-                lock_orga_solr.update()
-                # edit
-                try:
-                    thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add project to form if not exists
-                    exists = False
-                    for project in form.data.get('projects'):
-                        # logging.info('%s == %s ?' % (project.get('project_id'), id))
-                        if project.get('project_id'):
-                            if project.get('project_id') == id:
-                                exists = True
-                                break
-                            elif project.get('project_id') in same_as:
-                                exists = True
-                                break
-                    # logging.debug('exists? %s' % exists)
-                    if not exists:
-                        try:
-                            projectmemberform = ProjectMemberForm()
-                            projectmemberform.project_id.data = id
-                            form.projects.append_entry(projectmemberform.data)
-                            form.changed.data = timestamp()
-                            # save record
-                            _orga2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            flash(gettext('ERROR linking from %s: %s' % (partner_id, str(e))), 'error')
-                    else:
-                        # possibly rewrite label
-                        form.changed.data = timestamp()
-                        _orga2solr(form, action='update', relitems=False)
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % edit_orga_solr.results[0].get('wtf_json'))
-                # unlock record
-                unlock_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='organisation',
-                                        data=[{'id': partner_id, 'locked': {'set': 'false'}}])
-                unlock_orga_solr.update()
-            else:
-                logging.info('Currently there is no record for partner_id %s!' % partner_id)
-
-        # store work records again
-        works_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                          application=secrets.SOLR_APP, core='hb2',
-                          query='group_id:%s' % id, facet=False, rows=500000)
-        works_solr.request()
-
-        for work in works_solr.results:
-            # lock record
-            lock_work_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                  application=secrets.SOLR_APP, core='hb2',
-                                  data=[{'id': work.get('id'), 'locked': {'set': 'true'}}])
-            lock_work_solr.update()
-
-            # edit
-            try:
-                thedata = json.loads(work.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-                form.changed.data = timestamp()
-                _record2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % work.get('wtf_json'))
-
-            # unlock record
-            unlock_work_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, core='hb2',
-                                    data=[{'id': work.get('id'), 'locked': {'set': 'false'}}])
-            unlock_work_solr.update()
-
-        # store person records again
-        persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='person',
-                            query='group_id:%s' % id, facet=False, rows=500000)
-        persons_solr.request()
-
-        for person in persons_solr.results:
-            # lock record
-            lock_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                    application=secrets.SOLR_APP, core='person',
-                                    data=[{'id': person.get('id'), 'locked': {'set': 'true'}}])
-            lock_person_solr.update()
-
-            # edit
-            try:
-                thedata = json.loads(person.get('wtf_json'))
-                form = PersonAdminForm.from_json(thedata)
-                form.changed.data = timestamp()
-                _person2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % person.get('wtf_json'))
-
-            # unlock record
-            unlock_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='person',
-                                      data=[{'id': person.get('id'), 'locked': {'set': 'false'}}])
-            unlock_person_solr.update()
-
-    return id
-
-
 @app.route('/dashboard')
 @login_required
 def dashboard():
@@ -2639,6 +668,7 @@ def dashboard():
                           application=secrets.SOLR_APP, start=(page - 1) * 10, query=query,
                           sort=sorting, json_facet=secrets.DASHBOARD_FACETS, fquery=filterquery)
     dashboard_solr.request()
+    record_locks.mark('hb2', dashboard_solr.results)
 
     num_found = dashboard_solr.count()
     pagination = ''
@@ -2708,6 +738,7 @@ def persons():
                         query=query, start=(page - 1) * 10, core='person',
                         sort=sorting, json_facet=secrets.DASHBOARD_PERS_FACETS, fquery=filterquery)
     persons_solr.request()
+    record_locks.mark('person', persons_solr.results)
 
     num_found = persons_solr.count()
 
@@ -2747,6 +778,7 @@ def orgas():
                       application=secrets.SOLR_APP, query=query, start=(page - 1) * 10, core='organisation',
                       sort='changed desc', json_facet=secrets.DASHBOARD_ORGA_FACETS, fquery=filterquery)
     orgas_solr.request()
+    record_locks.mark('organisation', orgas_solr.results)
 
     num_found = orgas_solr.count()
 
@@ -2784,6 +816,7 @@ def groups():
                        application=secrets.SOLR_APP, query=query, start=(page - 1) * 10, core='group',
                        sort='changed desc', json_facet=secrets.DASHBOARD_GROUP_FACETS, fquery=filterquery)
     groups_solr.request()
+    record_locks.mark('group', groups_solr.results)
 
     num_found = groups_solr.count()
 
@@ -3117,7 +1150,7 @@ def new_by_json():
         if type(record) is 'dict':
             try:
                 form = display_vocabularies.PUBTYPE2FORM.get(record.get('pubtype')).from_json(record)
-                return _record2solr(form, action='create', relitems=True)
+                return persistence.record2solr(form, action='create', relitems=True)
             except AttributeError as e:
                 logging.error(e)
                 make_response(jsonify(record), 500)
@@ -3125,7 +1158,7 @@ def new_by_json():
             for item in record:
                 try:
                     form = display_vocabularies.PUBTYPE2FORM.get(item.get('pubtype')).from_json(item)
-                    return _record2solr(form, action='create', relitems=True)
+                    return persistence.record2solr(form, action='create', relitems=True)
                 except AttributeError as e:
                     logging.error(e)
                     make_response(jsonify(item), 500)
@@ -3392,16 +1425,7 @@ def new_group():
 @csrf.exempt
 def is_record_locked(pubtype, record_id):
 
-    is_locked = False
-
-    show_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, query='id:%s' % record_id)
-    show_record_solr.request()
-
-    if len(show_record_solr.results) > 0:
-        is_locked = bool(show_record_solr.results[0].get('locked'))
-
-    return jsonify({'is_locked': is_locked})
+    return jsonify({'is_locked': record_locks.is_locked(_lock_core(pubtype), record_id)})
 
 
 @app.route('/retrieve/<pubtype>/<record_id>')
@@ -3417,15 +1441,15 @@ def show_record(pubtype, record_id=''):
 
         affiliation = result.get('fakultaet')
         group = result.get('group')
-        csl_json = wtf_csl.wtf_csl([json.loads(result.get('wtf_json'))])
-        orcid_json = orcid_processor.wtf_orcid([json.loads(result.get('wtf_json'))])
-        if result.get('bibliographicCitation'):
-            openurl = result.get('bibliographicCitation')
-        else:
-            openurl = openurl_processor.wtf_openurl(json.loads(result.get('wtf_json')))
+        thedata = stored_fields.load(result)
+        resolver = HostResolver([thedata], cache=True)
+        csl_json = wtf_csl.wtf_csl([thedata], resolver=resolver)
+        orcid_json = orcid_processor.wtf_orcid([thedata], resolver=resolver)
+        openurl = stored_fields.load(result, 'bibliographicCitation')
+        if not openurl:
+            openurl = openurl_processor.wtf_openurl(thedata, resolver=resolver)
 
-        thedata = json.loads(result.get('wtf_json'))
-        locked = result.get('locked')
+        locked = record_locks.is_locked('hb2', result.get('id'))
 
         editable = False
         user_eq_actor = False
@@ -3488,9 +1512,9 @@ def show_person(person_id=''):
     result = persistence.get_person(person_id)
 
     if result:
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
         form = PersonAdminForm.from_json(thedata)
-        locked = result.get('locked')
+        locked = record_locks.is_locked('person', result.get('id'))
 
         return render_template('person.html', record=form, header=form.data.get('name'),
                                site=theme(request.access_route), action='retrieve', record_id=person_id,
@@ -3510,10 +1534,10 @@ def show_orga(orga_id=''):
     result = persistence.get_orga(orga_id)
 
     if result:
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
         parent_type = result.get('parent_type')
         form = OrgaAdminForm.from_json(thedata)
-        locked = result.get('locked')
+        locked = record_locks.is_locked('organisation', result.get('id'))
 
         return render_template('orga.html', record=form, header=form.data.get('pref_label'),
                                site=theme(request.access_route), action='retrieve', record_id=orga_id,
@@ -3529,19 +1553,28 @@ def show_orga(orga_id=''):
 def show_orga_links(orga_id=''):
     linked_entities = {}
     # TODO get all orgas with parent_id=orga_id plus parent_id of orga_id
+    get_orgas_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                               application=secrets.SOLR_APP, query='parent_id:%s' % orga_id, core='organisation',
+                               facet='false')
+    show_orga_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                               application=secrets.SOLR_APP, query='id:%s' % orga_id, core='organisation',
+                               facet='false')
+    ## TODO export der personen!!!
+    get_persons_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                 application=secrets.SOLR_APP, query='*:*', core='person', facet='false')
+    # TODO get all publications with affiliation_context=orga_id
+    get_publications_solr = AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                      application=secrets.SOLR_APP, query='affiliation_context:%s' % orga_id,
+                                      core='hb2', facet='false')
+    solr_gather(get_orgas_solr, show_orga_solr, get_persons_solr, get_publications_solr)
+
     children = []
-    get_orgas_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                          application=secrets.SOLR_APP, query='parent_id:%s' % orga_id, core='organisation', facet='false')
-    get_orgas_solr.request()
     if len(get_orgas_solr.results) > 0:
         for child in get_orgas_solr.results:
             children.append(child.get('id'))
 
     parents = []
-    show_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                          application=secrets.SOLR_APP, query='id:%s' % orga_id, core='organisation', facet='false')
-    show_orga_solr.request()
-    thedata = json.loads(show_orga_solr.results[0].get('wtf_json'))
+    thedata = stored_fields.load(show_orga_solr.results[0])
     form = OrgaAdminForm.from_json(thedata)
     if form.data.get('parent_id') and len(form.data.get('parent_id')) > 0:
         parents.append(form.data.get('parent_id'))
@@ -3551,13 +1584,9 @@ def show_orga_links(orga_id=''):
 
     # TODO get all persons with affiliation.organisation_id=orga_id
     persons = []
-    ## TODO export der personen!!!
-    get_persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                            application=secrets.SOLR_APP, query='*:*', core='person', facet='false')
-    get_persons_solr.request()
     if len(get_persons_solr.results) > 0:
         for person in get_persons_solr.results:
-            thedata = json.loads(person.get('wtf_json'))
+            thedata = stored_fields.load(person)
             logging.info(thedata)
             affiliations = thedata.get('affiliation')
             logging.info(affiliations)
@@ -3567,12 +1596,7 @@ def show_orga_links(orga_id=''):
 
     linked_entities.setdefault('persons', persons)
 
-    # TODO get all publications with affiliation_context=orga_id
     publications = []
-    get_publications_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                 application=secrets.SOLR_APP, query='affiliation_context:%s' % orga_id, core='hb2', 
-                                 facet='false')
-    get_publications_solr.request()
     if len(get_publications_solr.results) > 0:
         for record in get_publications_solr.results:
             publications.append(record.get('id'))
@@ -3589,10 +1613,10 @@ def show_group(group_id=''):
     result = persistence.get_group(group_id)
 
     if result:
-        thedata = json.loads(result.get('wtf_json'))
+        thedata = stored_fields.load(result)
         parent_type = result.get('parent_type')
         form = GroupAdminForm.from_json(thedata)
-        locked = result.get('locked')
+        locked = record_locks.is_locked('group', result.get('id'))
 
         return render_template('group.html', record=form, header=form.data.get('pref_label'),
                                site=theme(request.access_route), action='retrieve', record_id=group_id,
@@ -3605,6 +1629,41 @@ def show_group(group_id=''):
         return redirect(url_for('dashboard'))
 
 
+def _lock_core(pubtype):
+    if pubtype in ('person', 'organisation', 'group'):
+        return pubtype
+    return 'hb2'
+
+
+def _lock_record(core, record_id):
+    # the lock only tells others the record is being edited, so a lock held by somebody else is reported, but does not
+    # keep from editing: the save does not depend on it, but on the version read with the form
+    owner = record_locks.acquire(core, record_id, current_user.id)
+    if owner != current_user.id:
+        flash(gettext('This record is currently being edited by %(owner)s!', owner=owner), 'warning')
+
+
+def _remember_version(core, record_id, doc):
+    # the _version_ of a record when its edit form is opened: the save is rejected if the record has been written
+    # in the meantime (see VersionConflict)
+    versions = session.get('edit_versions', {})
+    versions.pop('%s:%s' % (core, record_id), None)
+    if doc:
+        versions['%s:%s' % (core, record_id)] = doc.get('_version_')
+    session['edit_versions'] = dict(list(versions.items())[-20:])
+
+
+def _edit_version(core, record_id):
+    return session.get('edit_versions', {}).get('%s:%s' % (core, record_id))
+
+
+def _version_conflict(core, record_id):
+    # saving again overwrites the changes made in the meantime
+    _remember_version(core, record_id, persistence.get_by_id(core, record_id))
+    flash(gettext('The record has been modified by someone else in the meantime! Please check your data: saving '
+                  'again overwrites these modifications.'), 'danger')
+
+
 @app.route('/update/<pubtype>/<record_id>', methods=['GET', 'POST'])
 @login_required
 def edit_record(record_id='', pubtype=''):
@@ -3614,16 +1673,16 @@ def edit_record(record_id='', pubtype=''):
     user_is_actor = request.args.get('user_is_actor', False)
     # logging.info('user_is_actor = %s' % cptask)
 
-    lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='hb2',
-                            data=[{'id': record_id, 'locked': {'set': 'true'}}])
-    lock_record_solr.update()
+    if request.method == 'GET':
+        _lock_record('hb2', record_id)
 
     edit_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='hb2', query='id:%s' % record_id)
-    edit_record_solr.request()
+                            application=secrets.SOLR_APP, core='hb2')
+    edit_record_solr.get(record_id)
 
-    thedata = json.loads(edit_record_solr.results[0].get('wtf_json'))
+    thedata = stored_fields.load(edit_record_solr.results[0])
+    if request.method == 'GET':
+        _remember_version('hb2', record_id, edit_record_solr.results[0])
 
     if request.method == 'POST':
         # logging.info('POST')
@@ -3692,7 +1751,17 @@ def edit_record(record_id='', pubtype=''):
             except AttributeError:
                 pass
 
-            new_id, message = persistence.record2solr(form, action='update')
+            try:
+                new_id, message = persistence.record2solr(form, action='update',
+                                                          version=_edit_version('hb2', record_id))
+            except VersionConflict:
+                _version_conflict('hb2', record_id)
+                return render_template('tabbed_form.html', form=form,
+                                       header=lazy_gettext('Edit: %(title)s', title=form.data.get('title')),
+                                       locked=True, site=theme(request.access_route), action='update',
+                                       pubtype=pubtype, record_id=record_id, cptask=str2bool(cptask))
+            _remember_version('hb2', record_id, None)
+            record_locks.release('hb2', record_id, current_user.id)
             if current_user.role != 'user':
                 for msg in message:
                     flash(msg, category='warning')
@@ -3742,10 +1811,7 @@ def edit_record(record_id='', pubtype=''):
 
     else:
         if do_unlock:
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='hb2',
-                                      data=[{'id': record_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
+            record_locks.release('hb2', record_id, current_user.id)
 
         flash(lazy_gettext('You are not allowed to modify the record data, because the record is in editorial process. Please contact out team!'), 'warning')
         return redirect(url_for('show_record', pubtype=pubtype, record_id=record_id))
@@ -3757,18 +1823,17 @@ def edit_person(person_id=''):
     if current_user.role != 'admin' and current_user.role != 'superadmin':
         flash(gettext('For Admins ONLY!!!'))
         return redirect(url_for('homepage'))
-    lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='person',
-                            data=[{'id': person_id, 'locked': {'set': 'true'}}])
-    lock_record_solr.update()
+    if request.method == 'GET':
+        _lock_record('person', person_id)
 
     person = persistence.get_person(person_id)
 
     if request.method == 'POST':
         form = PersonAdminForm()
     else:
+        _remember_version('person', person_id, person)
         if person:
-            thedata = json.loads(person.get('wtf_json'))
+            thedata = stored_fields.load(person)
             form = PersonAdminForm.from_json(thedata)
         else:
             flash('The requested person %s was not found!' % person_id, category='warning')
@@ -3791,14 +1856,19 @@ def edit_person(person_id=''):
         if form.data.get('editorial_status') == 'edited' and current_user.role == 'superadmin':
             form.editorial_status.data = 'final_editing'
 
-        doit, redirect_id, message = persistence.person2solr(form, action='update')
+        try:
+            doit, redirect_id, message = persistence.person2solr(form, action='update',
+                                                                 version=_edit_version('person', person_id))
+        except VersionConflict:
+            _version_conflict('person', person_id)
+            return render_template('tabbed_form.html', form=form,
+                                   header=lazy_gettext('Edit: %(person)s', person=form.data.get('name')),
+                                   locked=True, site=theme(request.access_route), action='update',
+                                   pubtype='person', record_id=person_id)
+        _remember_version('person', person_id, None)
+        record_locks.release('person', person_id, current_user.id)
         for msg in message:
             flash(msg, category='warning')
-        if redirect_id == person_id:
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='person',
-                                      data=[{'id': redirect_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
 
         return show_person(form.data.get('id').strip())
         # return redirect(url_for('persons'))
@@ -3818,18 +1888,17 @@ def edit_orga(orga_id=''):
         flash(gettext('For Admins ONLY!!!'))
         return redirect(url_for('homepage'))
 
-    lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='organisation',
-                            data=[{'id': orga_id, 'locked': {'set': 'true'}}])
-    lock_record_solr.update()
+    if request.method == 'GET':
+        _lock_record('organisation', orga_id)
 
     orga = persistence.get_orga(orga_id)
 
     if request.method == 'POST':
         form = OrgaAdminForm()
     else:
+        _remember_version('organisation', orga_id, orga)
         if orga:
-            thedata = json.loads(orga.get('wtf_json'))
+            thedata = stored_fields.load(orga)
             form = OrgaAdminForm.from_json(thedata)
         else:
             flash('The requested organisation %s was not found!' % orga_id, category='warning')
@@ -3853,14 +1922,19 @@ def edit_orga(orga_id=''):
             form.editorial_status.data = 'final_editing'
 
         # redirect_id, message = persistence.orga2solr(form, action='update', getchildren=True, relitems=False)
-        redirect_id, message = persistence.orga2solr(form, action='update')
+        try:
+            redirect_id, message = persistence.orga2solr(form, action='update',
+                                                         version=_edit_version('organisation', orga_id))
+        except VersionConflict:
+            _version_conflict('organisation', orga_id)
+            return render_template('tabbed_form.html', form=form,
+                                   header=lazy_gettext('Edit: %(orga)s', orga=form.data.get('pref_label')),
+                                   locked=True, site=theme(request.access_route), action='update',
+                                   pubtype='organisation', record_id=orga_id)
+        _remember_version('organisation', orga_id, None)
+        record_locks.release('organisation', orga_id, current_user.id)
         for msg in message:
             flash(msg, category='warning')
-        if redirect_id == orga_id:
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='organisation',
-                                      data=[{'id': redirect_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
 
         return show_orga(redirect_id)
         # return redirect(url_for('orgas'))
@@ -3880,18 +1954,17 @@ def edit_group(group_id=''):
         flash(gettext('For Admins ONLY!!!'))
         return redirect(url_for('homepage'))
 
-    lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='group',
-                            data=[{'id': group_id, 'locked': {'set': 'true'}}])
-    lock_record_solr.update()
+    if request.method == 'GET':
+        _lock_record('group', group_id)
 
     group = persistence.get_group(group_id)
 
     if request.method == 'POST':
         form = GroupAdminForm()
     else:
+        _remember_version('group', group_id, group)
         if group:
-            thedata = json.loads(group.get('wtf_json'))
+            thedata = stored_fields.load(group)
             form = GroupAdminForm.from_json(thedata)
         else:
             flash('The requested group %s was not found!' % group_id, category='warning')
@@ -3912,14 +1985,19 @@ def edit_group(group_id=''):
             form.editorial_status.data = 'final_editing'
 
         # logging.info('FORM: %s' % form.data)
-        redirect_id, message = persistence.group2solr(form, action='update')
+        try:
+            redirect_id, message = persistence.group2solr(form, action='update',
+                                                          version=_edit_version('group', group_id))
+        except VersionConflict:
+            _version_conflict('group', group_id)
+            return render_template('tabbed_form.html', form=form,
+                                   header=lazy_gettext('Edit: %(group)s', group=form.data.get('pref_label')),
+                                   locked=True, site=theme(request.access_route), action='update',
+                                   pubtype='group', record_id=group_id)
+        _remember_version('group', group_id, None)
+        record_locks.release('group', group_id, current_user.id)
         for msg in message:
             flash(msg, category='warning')
-        if redirect_id == group_id:
-            unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, core='group',
-                                      data=[{'id': redirect_id, 'locked': {'set': 'false'}}])
-            unlock_record_solr.update()
 
         return show_group(redirect_id)
         # return redirect(url_for('groups'))
@@ -3938,9 +2016,12 @@ def delete_record(record_id=''):
     if current_user.role == 'admin':
         # load record
         edit_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                application=secrets.SOLR_APP, core='hb2', query='id:%s' % record_id)
-        edit_record_solr.request()
-        thedata = json.loads(edit_record_solr.results[0].get('wtf_json'))
+                                application=secrets.SOLR_APP, core='hb2')
+        edit_record_solr.get(record_id)
+        if not edit_record_solr.results:
+            flash('The requested record %s was not found!' % record_id, category='warning')
+            return make_response(jsonify({'deleted': False}), 404)
+        thedata = stored_fields.load(edit_record_solr.results[0])
         pubtype = thedata.get('pubtype')
         form = display_vocabularies.PUBTYPE2FORM.get(pubtype).from_json(thedata)
         # TODO if exists links of type 'other_version' (proof via Solr-Queries if not exists is_other_version_of), 'has_parts', then ERROR!
@@ -3949,7 +2030,7 @@ def delete_record(record_id=''):
         form.changed.data = timestamp()
         form.deskman.data = current_user.email
         # save record
-        _record2solr(form, action='update')
+        persistence.record2solr(form, action='update')
         # return
         flash(gettext('Set editorial status of %s to deleted!' % record_id))
 
@@ -3958,6 +2039,7 @@ def delete_record(record_id=''):
         delete_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
                                   application=secrets.SOLR_APP, core='hb2', del_id=record_id)
         delete_record_solr.delete()
+        id_index.remove('hb2', record_id)
         flash(gettext('Record %s deleted!' % record_id))
 
         return jsonify({'deleted': True})
@@ -3973,17 +2055,20 @@ def delete_person(person_id=''):
         flash(gettext('Set status of %s to deleted!' % person_id))
         # load person
         edit_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                                application=secrets.SOLR_APP, core='person', query='id:%s' % person_id)
-        edit_person_solr.request()
+                                application=secrets.SOLR_APP, core='person')
+        edit_person_solr.get(person_id)
+        if not edit_person_solr.results:
+            flash('The requested person %s was not found!' % person_id, category='warning')
+            return make_response(jsonify({'deleted': False}), 404)
 
-        thedata = json.loads(edit_person_solr.results[0].get('wtf_json'))
+        thedata = stored_fields.load(edit_person_solr.results[0])
         form = PersonAdminForm.from_json(thedata)
         # modify status to 'deleted'
         form.editorial_status.data = 'deleted'
         form.changed.data = timestamp()
         form.deskman.data = current_user.email
         # save person
-        _person2solr(form, action='delete')
+        persistence.person2solr(form, action='delete')
 
         return jsonify({'deleted': True})
     # TODO if superadmin
@@ -3991,6 +2076,7 @@ def delete_person(person_id=''):
         delete_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
                                   application=secrets.SOLR_APP, core='person', del_id=person_id)
         delete_person_solr.delete()
+        id_index.remove('person', person_id)
         flash(gettext('Person %s deleted!' % person_id))
 
         return jsonify({'deleted': True})
@@ -4006,17 +2092,20 @@ def delete_orga(orga_id=''):
         flash(gettext('Set status of %s to deleted!' % orga_id))
         # load orga
         edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                              application=secrets.SOLR_APP, core='organisation', query='id:%s' % orga_id)
-        edit_orga_solr.request()
+                              application=secrets.SOLR_APP, core='organisation')
+        edit_orga_solr.get(orga_id)
+        if not edit_orga_solr.results:
+            flash('The requested organisation %s was not found!' % orga_id, category='warning')
+            return make_response(jsonify({'deleted': False}), 404)
 
-        thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
+        thedata = stored_fields.load(edit_orga_solr.results[0])
         form = OrgaAdminForm.from_json(thedata)
         # modify status to 'deleted'
         form.editorial_status.data = 'deleted'
         form.changed.data = timestamp()
         form.deskman.data = current_user.email
         # save orga
-        _orga2solr(form, action='delete')
+        persistence.orga2solr(form, action='delete')
 
         return jsonify({'deleted': True})
     # TODO if superadmin
@@ -4024,6 +2113,7 @@ def delete_orga(orga_id=''):
         delete_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
                                 application=secrets.SOLR_APP, core='organisation', del_id=orga_id)
         delete_orga_solr.delete()
+        id_index.remove('organisation', orga_id)
         flash(gettext('Organisation %s deleted!' % orga_id))
 
         return jsonify({'deleted': True})
@@ -4039,17 +2129,20 @@ def delete_group(group_id=''):
         flash(gettext('Set status of %s to deleted!' % group_id))
         # load group
         edit_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
-                              application=secrets.SOLR_APP, core='group', query='id:%s' % group_id)
-        edit_orga_solr.request()
+                              application=secrets.SOLR_APP, core='group')
+        edit_orga_solr.get(group_id)
+        if not edit_orga_solr.results:
+            flash('The requested working group %s was not found!' % group_id, category='warning')
+            return make_response(jsonify({'deleted': False}), 404)
 
-        thedata = json.loads(edit_orga_solr.results[0].get('wtf_json'))
+        thedata = stored_fields.load(edit_orga_solr.results[0])
         form = GroupAdminForm.from_json(thedata)
         # modify status to 'deleted'
         form.editorial_status.data = 'deleted'
         form.changed.data = timestamp()
         form.deskman.data = current_user.email
         # save group
-        _group2solr(form, action='delete')
+        persistence.group2solr(form, action='delete')
 
         return jsonify({'deleted': True})
     # TODO if superadmin
@@ -4057,6 +2150,7 @@ def delete_group(group_id=''):
         delete_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, 
                                  application=secrets.SOLR_APP, core='group', del_id=group_id)
         delete_group_solr.delete()
+        id_index.remove('group', group_id)
         flash(gettext('Working Group %s deleted!' % group_id))
 
         return jsonify({'deleted': True})
@@ -4231,10 +2325,10 @@ def show_works_of_orga(orga_id=''):
 def get_affiliations(orga_id, counter):
     query_part = 'affiliation_id:%s' % orga_id
 
-    thedata = persistence.get_orga(orga_id)
+    thedata = persistence.get_orga(orga_id, cache=True)
 
     if thedata:
-        orga = json.loads(thedata.get('wtf_json'))
+        orga = stored_fields.load(thedata)
         if orga.get('children'):
             for child in orga.get('children'):
                 if child.get('child_id') and counter < 100:
@@ -4247,10 +2341,10 @@ def get_affiliations(orga_id, counter):
 def get_members(orga_id, counter):
     query_part = ''
 
-    thedata = persistence.get_orga(orga_id)
+    thedata = persistence.get_orga(orga_id, cache=True)
 
     if thedata:
-        orga = json.loads(thedata.get('wtf_json'))
+        orga = stored_fields.load(thedata)
 
         # TODO die query kann schiefgehen, wenn die child_id keine GND-ID sondern eine UUID war, die
         # Verknüpfung also nur indirekt über "same_as" läuft.
@@ -4258,7 +2352,7 @@ def get_members(orga_id, counter):
                            application=secrets.SOLR_APP,
                            query='affiliation_id:"%s"' % orga_id,
                            fquery=['gnd:[\'\' TO *]'], fields=['gnd', 'name'], rows=100000,
-                           core='person')
+                           core='person', cache=True)
         member_solr.request()
 
         if member_solr.results and len(member_solr.results) > 0:
@@ -4303,14 +2397,14 @@ def superadmin():
     if current_user.role != 'superadmin':
         flash(gettext('For SuperAdmins ONLY!!!'))
         return redirect(url_for('homepage'))
-    # Get locked records that were last changed more than one hour ago...
+    # Get locked records, the ones without heartbeat of their edit form for the longest time first...
     page = int(request.args.get('page', 1))
+    locks = record_locks.locks('hb2')
     locked_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
-                       core='hb2',
-                       fquery=['locked:true', 'recordChangeDate:[* TO NOW-1HOUR]'], sort='recordChangeDate asc',
-                       start=(page - 1) * 10)
-    locked_solr.request()
-    num_found = locked_solr.count()
+                       core='hb2')
+    locked_solr.get([lock.get('id') for lock in locks[(page - 1) * 10:page * 10]],
+                    fields=['id', 'title', 'recordChangeDate'])
+    num_found = len(locks)
     pagination = Pagination(page=page, total=num_found, found=num_found, bs_version=3, search=True,
                             record_name=lazy_gettext('records'),
                             search_msg=lazy_gettext('Showing {start} to {end} of {found} {record_name}'))
@@ -4391,10 +2485,7 @@ def unlock(record_id=''):
         # flash(gettext('For SuperAdmins ONLY!!!'))
         # return redirect(url_for('homepage'))
     if record_id:
-        unlock_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='hb2',
-                           data=[{'id': record_id, 'locked': {'set': 'false'}}])
-        unlock_solr.update()
+        record_locks.release('hb2', record_id)
 
     redirect_url = 'superadmin'
     if get_redirect_target():
@@ -4410,10 +2501,7 @@ def unlock_person(person_id=''):
         flash(gettext('For SuperAdmins ONLY!!!'))
         return redirect(url_for('homepage'))
     if person_id:
-        unlock_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='person',
-                           data=[{'id': person_id, 'locked': {'set': 'false'}}])
-        unlock_solr.update()
+        record_locks.release('person', person_id)
 
     redirect_url = 'superadmin'
     if get_redirect_target():
@@ -4429,10 +2517,7 @@ def unlock_orga(orga_id=''):
         flash(gettext('For SuperAdmins ONLY!!!'))
         return redirect(url_for('homepage'))
     if orga_id:
-        unlock_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='organisation',
-                           data=[{'id': orga_id, 'locked': {'set': 'false'}}])
-        unlock_solr.update()
+        record_locks.release('organisation', orga_id)
 
     redirect_url = 'superadmin'
     if get_redirect_target():
@@ -4448,10 +2533,7 @@ def unlock_group(group_id=''):
         flash(gettext('For SuperAdmins ONLY!!!'))
         return redirect(url_for('homepage'))
     if group_id:
-        unlock_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='group',
-                           data=[{'id': group_id, 'locked': {'set': 'false'}}])
-        unlock_solr.update()
+        record_locks.release('group', group_id)
 
     redirect_url = 'superadmin'
     if get_redirect_target():
@@ -4460,6 +2542,56 @@ def unlock_group(group_id=''):
     return redirect(url_for(redirect_url))
 
 
+@app.route('/solr/stats')
+@login_required
+def solr_stats():
+    if current_user.role != 'superadmin':
+        flash(gettext('For SuperAdmins ONLY!!!'))
+        return redirect(url_for('homepage'))
+
+    return jsonify({'cache': query_cache.stats(), 'transport': transport.stats(), 'id_index': id_index.stats()})
+
+
+@app.route('/jobs/status')
+@login_required
+def jobs_status():
+    if current_user.role != 'superadmin':
+        flash(gettext('For SuperAdmins ONLY!!!'))
+        return redirect(url_for('homepage'))
+
+    return jsonify(relation_jobs.status(limit=request.args.get('limit', 20, type=int)))
+
+
+@app.route('/solr/trace')
+@login_required
+def solr_trace_stats():
+    if current_user.role != 'superadmin':
+        flash(gettext('For SuperAdmins ONLY!!!'))
+        return redirect(url_for('homepage'))
+
+    by = request.args.get('by', 'calls')
+    if by not in ['calls', 'time', 'qtime', 'max_calls', 'max_time', 'avg_calls', 'avg_time']:
+        return make_response('Bad request: by!', 400)
+
+    return jsonify({'warn_calls': solr_trace.warn_calls, 'warn_time': solr_trace.warn_time,
+                    'endpoints': solr_trace.worst(by=by, limit=request.args.get('limit', 20, type=int))})
+
+
+@app.route('/persistence/timing')
+@login_required
+def phase_timing_stats():
+    if current_user.role != 'superadmin':
+        flash(gettext('For SuperAdmins ONLY!!!'))
+        return redirect(url_for('homepage'))
+
+    # the phases of record2solr, person2solr, orga2solr and group2solr run by this process
+    stats = phase_timer.stats(function=request.args.get('function'))
+    if str2bool(request.args.get('reset', False)):
+        phase_timer.reset()
+
+    return jsonify(stats)
+
+
 @app.route('/redis/stats/<db>')
 @login_required
 def redis_stats(db='0'):
@@ -4490,18 +2622,7 @@ def redis_stats(db='0'):
 
         return jsonify({'stats': stats})
     elif db == '3':
-        storage = app.extensions['redis']['REDIS_EXEC_COUNTER']
-
-        counter = {}
-
-        cnt = 0
-        for key in storage.keys('*'):
-            counter[key] = sorted(storage.hgetall(key).items(), key=lambda x: int(x[1]), reverse=True)
-            cnt += 1
-            if cnt == 100:
-                break
-
-        return jsonify({'counter': counter})
+        return jsonify({'counter': exec_counters.read(limit=100)})
     else:
         return 'No database with ID %s exists!' % db
 
@@ -4561,7 +2682,7 @@ def consolidate_email(affiliation=''):
         if len(persons) > 0:
             csv = 'ID; Name; RUBi; TUDo; E-Mail (IDM); E-Mail (Kontakt)\n'
             for person in persons:
-                thedata = json.loads(person.get('wtf_json'))
+                thedata = stored_fields.load(person)
                 csv += '"%s"; "%s"; %s; %s; %s; "%s"\n' % (thedata.get('id'), thedata.get('name'), person.get('rubi'), person.get('tudo'), thedata.get('email'), thedata.get('contact'))
 
             resp = make_response(csv, 200)
@@ -4602,7 +2723,7 @@ def export_openapc(year=''):
 
         if len(results) > 0:
             for record in results:
-                thedata = json.loads(record.get('wtf_json'))
+                thedata = stored_fields.load(record)
 
                 doi = record.get('doi')[0]
                 is_hybrid = False
@@ -4619,7 +2740,7 @@ def export_openapc(year=''):
                         if record.get('is_part_of_id')[0]:
                             host = persistence.get_work(record.get('is_part_of_id')[0])
                             if host:
-                                record = json.loads(host.get('wtf_json'))
+                                record = stored_fields.load(host)
                                 # print(json.dumps(record, indent=4))
                                 journal_title = record.get('title')
                                 if record.get('fsubseries'):
@@ -4691,7 +2812,7 @@ def export_oa_report(year=''):
 
         if results:
             for record in results:
-                thedata = json.loads(record.get('wtf_json'))
+                thedata = stored_fields.load(record)
 
                 author = ''
                 corresponding_author = ''
@@ -4741,7 +2862,7 @@ def export_oa_report(year=''):
                     if record.get('is_part_of_id')[0]:
                         host = persistence.get_work(record.get('is_part_of_id')[0])
                         if host:
-                            record = json.loads(host.get('wtf_json'))
+                            record = stored_fields.load(host)
                             # print(json.dumps(record, indent=4))
                             journal_title = record.get('title')
                             if record.get('fsubseries'):
@@ -4994,7 +3115,7 @@ def orcid_login():
 
                     logging.info(form.data)
 
-                    _person2solr(form, action='create')
+                    persistence.person2solr(form, action='create')
 
                     query = 'id:%s' % new_person_json.get('id')
                     person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
@@ -5004,29 +3125,23 @@ def orcid_login():
                     person_results = person_solr.results
 
                 for doc in person_results:
-                    myjson = json.loads(doc.get('wtf_json'))
+                    myjson = stored_fields.load(doc)
                     # logging.info('id: %s' % myjson.get('id'))
-                    lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                            application=secrets.SOLR_APP, core='person',
-                                            data=[{'id': myjson.get('id'), 'locked': {'set': 'true'}}])
-                    lock_record_solr.update()
+                    record_locks.acquire('person', myjson.get('id'), current_user.id)
 
                     edit_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                             application=secrets.SOLR_APP, query='id:%s' % myjson.get('id'),
                                             core='person', facet='false')
                     edit_person_solr.request()
 
-                    thedata = json.loads(edit_person_solr.results[0].get('wtf_json'))
+                    thedata = stored_fields.load(edit_person_solr.results[0])
 
-                    form = PersonAdminForm.from_json(thedata)
+                    form = Record(PersonAdminForm, thedata)
                     form.changed.data = timestamp()
                     form.orcid.data = orcid_id
 
-                    _person2solr(form, action='update')
-                    unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                              application=secrets.SOLR_APP, core='person',
-                                              data=[{'id': myjson.get('id'), 'locked': {'set': 'false'}}])
-                    unlock_record_solr.update()
+                    persistence.person2solr(form, action='update')
+                    record_locks.release('person', myjson.get('id'), current_user.id)
 
                     # TODO if existing record contains external-ids
                     # then push them to the ORCID record if they don't exist there
@@ -5658,6 +3773,7 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                     if id_type == 'organisation':
                         id_type = 'affiliation'
 
+                    member_queries = []
                     for orga_id in orgas.keys():
 
                         fquery = ['gnd:[\'\' TO *]']
@@ -5669,11 +3785,14 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                                 fquery.append('-personal_status:emeritus')
                                 fquery.append('-personal_status:alumnus')
 
-                        member_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, query='%s_id:"%s"' % (id_type, orga_id),
-                                           fquery=fquery, fields=['gnd', 'name'], rows=100000,
-                                           core='person')
-                        member_solr.request()
+                        member_queries.append(AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                                        application=secrets.SOLR_APP,
+                                                        query='%s_id:"%s"' % (id_type, orga_id),
+                                                        fquery=fquery, fields=['gnd', 'name'], rows=100000,
+                                                        core='person'))
+                    solr_gather(*member_queries)
+
+                    for member_solr in member_queries:
 
                         query_part = ''
 
@@ -5817,6 +3936,24 @@ def bibliography(agent='', agent_id='', style='harvard1'):
             publist_solr.request()
             # logging.info('publist_solr.tree: %s' % json.dumps(publist_solr.tree, indent=4))
 
+            # the lists per pubtype (and year) are independent of each other: fetch them concurrently, a few at a
+            # time, and decode and render them in the order of the tree, so only a few lists are held at once
+            pivot_keys = []
+            for pubtype in publist_solr.tree.get('pubtype,fdate'):
+                if pubtype.get('pivot'):
+                    for year in pubtype.get('pivot')[::-1]:
+                        pivot_keys.append((pubtype.get('value'), year.get('value')))
+                else:
+                    pivot_keys.append((pubtype.get('value'), None))
+            pivot_queries = (AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                       handler='query', query=query, fields=['wtf_json'], rows=100000,
+                                       fquery=(['fdate:%s' % year] if year is not None else []) +
+                                       ['pubtype:%s' % pubtype],
+                                       core='hb2', lazy=True)
+                             for pubtype, year in pivot_keys)
+            resolver = HostResolver(cache=True)
+            pivot_lists = resolver.decode_lists(solr_gather_chunks(pivot_queries))
+
             list_cnt = 0
             for pubtype in publist_solr.tree.get('pubtype,fdate'):
                 # logging.debug('pubtype = %s' % pubtype.get('value'))
@@ -5826,43 +3963,24 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                 if pubtype.get('pivot'):
                     for year in pubtype.get('pivot')[::-1]:
                         # logging.debug('\t%s: %s' % (year.get('value'), year.get('count')))
-                        filterquery = []
-                        filterquery.append('fdate:%s' % year.get('value'))
-                        filterquery.append('pubtype:%s' % pubtype.get('value'))
-                        pivot_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, handler='query',
-                                          query=query, fields=['wtf_json'], rows=100000,
-                                          fquery=filterquery, core='hb2')
-                        pivot_solr.request()
-                        results = pivot_solr.results
-                        # logging.debug('PIVOT_PUB_LIST: %s' % results)
-
-                        publist_docs = []
-                        for result in results:
-                            publist_docs.append(json.loads(result.get('wtf_json')))
-                            year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(json.loads(result.get('wtf_json'))).replace('&', '&amp;')
+                        publist_docs = next(pivot_lists)
+                        # logging.debug('PIVOT_PUB_LIST: %s' % publist_docs)
+
+                        for record in publist_docs:
+                            year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(record, resolver=resolver).replace('&', '&amp;')
 
                         if not group_by_type:
                             year_list += '<h5>%s</h5>' % year.get('value')
-                        year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                        year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
                 else:
-                    filterquery = []
-                    filterquery.append('pubtype:%s' % pubtype.get('value'))
-                    pivot_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, handler='query',
-                                      query=query, fields=['wtf_json'], rows=100000,
-                                      fquery=filterquery, core='hb2')
-                    pivot_solr.request()
-                    results = pivot_solr.results
-                    # logging.debug('PIVOT_PUB_LIST: %s' % results)
-
-                    publist_docs = []
-                    for result in results:
-                        publist_docs.append(json.loads(result.get('wtf_json')))
+                    publist_docs = next(pivot_lists)
+                    # logging.debug('PIVOT_PUB_LIST: %s' % publist_docs)
+
+                    for record in publist_docs:
                         year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(
-                            json.loads(result.get('wtf_json'))).replace('&', '&amp;')
+                            record, resolver=resolver).replace('&', '&amp;')
 
-                    year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                    year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
 
                 group_value = pubtype.get('value')
                 if locale.startswith('de'):
@@ -5924,19 +4042,22 @@ def bibliography(agent='', agent_id='', style='harvard1'):
             results.extend(publist_solr.results)
             # print('publist_solr.results: %s' % results)
 
-            publist_docs = []
+            # decode the docs group by group, once, resolving the hosts of each group together
+            resolver = HostResolver(cache=True)
+
             if group:
                 biblist = ''
                 list_cnt = 0
                 for result in results:
+                    publist_docs = [stored_fields.load(doc) for doc in result.get('doclist').get('docs')]
+                    resolver.prefetch(publist_docs)
                     # logging.debug('groupValue: %s' % result.get('groupValue'))
                     # logging.debug('numFound: %s' % result.get('doclist').get('numFound'))
                     # logging.debug('docs: %s' % result.get('doclist').get('docs'))
 
                     coins = ''
-                    for doc in result.get('doclist').get('docs'):
-                        publist_docs.append(json.loads(doc.get('wtf_json')))
-                        coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(json.loads(doc.get('wtf_json'))).replace('&', '&amp;')
+                    for record in publist_docs:
+                        coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(record, resolver=resolver).replace('&', '&amp;')
 
                     group_value = result.get('groupValue')
                     if str2bool(group_by_type):
@@ -5956,23 +4077,23 @@ def bibliography(agent='', agent_id='', style='harvard1'):
 
                     if str2bool(group_by_type):
                         if pubsort == 'stm':
-                            STM_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            STM_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             STM_TOC[result.get('groupValue')] = '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                             STM_COINS[result.get('groupValue')] = coins
                         elif pubsort == 'anh':
-                            ANH_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            ANH_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             ANH_TOC[result.get('groupValue')] = '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                             ANH_COINS[result.get('groupValue')] = coins
                         else:
-                            biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             biblist_toc += '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                             biblist_coins += coins
                     elif str2bool(group_by_year):
-                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                         biblist_toc += '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                         biblist_coins += coins
                     else:
-                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
 
                     if str2bool(group_by_type) and pubsort == 'anh':
                         # logging.debug(ANH_LIST)
@@ -5993,13 +4114,10 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                                 biblist_toc += STM_TOC.get(pubtype)
                                 biblist_coins += STM_COINS.get(pubtype)
 
-                    publist_docs = []
-
             else:
-                for result in results:
-                    publist_docs.append(json.loads(result.get('wtf_json')))
-
-                biblist = citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                publist_docs = [stored_fields.load(result) for result in results]
+                resolver.prefetch(publist_docs)
+                biblist = citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
 
         response = ''
 
@@ -6164,19 +4282,33 @@ def is_token_valid(token = ''):
 
 @socketio.on('lock', namespace='/hb2')
 def lock_message(message):
-    print('Locked ' + message.get('data'))
-    emit('locked', {'data': message['data']}, broadcast=True)
+    if not current_user.is_authenticated:
+        return False
+    owner = record_locks.acquire(_lock_core(message.get('pubtype')), message.get('data'), current_user.id)
+    if owner == current_user.id:
+        emit('locked', {'data': message['data']}, broadcast=True)
+    return owner == current_user.id
+
+
+@socketio.on('heartbeat', namespace='/hb2')
+def heartbeat_message(message):
+    # sent by the edit form while it is open; False if the lock has expired or has been released meanwhile
+    if not current_user.is_authenticated:
+        return False
+    return record_locks.heartbeat(_lock_core(message.get('pubtype')), message.get('data'), current_user.id)
 
 
 @socketio.on('unlock', namespace='/hb2')
 def unlock_message(message):
-    print(message)
     # resp = requests.get('http://127.0.0.1:8983/solr/hb2/query?q=id:%s&fl=editorial_status&omitHeader=true' % message.get('data')).json()
     # status = resp.get('response').get('docs')[0].get('editorial_status')
     # print(status)
-    print('Unlocked ' + message.get('data'))
-    # emit('unlocked', {'data': {'id': message.get('data'), 'status': status}}, broadcast=True)
-    emit('unlocked', {'data': message.get('data')}, broadcast=True)
+    if not current_user.is_authenticated:
+        return False
+    if record_locks.release(_lock_core(message.get('pubtype')), message.get('data'), current_user.id):
+        # emit('unlocked', {'data': {'id': message.get('data'), 'status': status}}, broadcast=True)
+        emit('unlocked', {'data': message.get('data')}, broadcast=True)
+    return True
 
 
 @socketio.on('connect', namespace='/hb2')
@@ -77,8 +77,55 @@ SOLR_PORT = '8983'
 
 SOLR_APP = 'solr'
 SOLR_CORE = 'hb2'
+# replicated setup: requests for SOLR_HOST:SOLR_PORT are spread over these nodes ('host:port'), updates go to
+# SOLR_LEADER (default: the first node); SOLR_BALANCE is 'round_robin' or 'least_latency', failed nodes are probed
+# every SOLR_PROBE_INTERVAL seconds
+SOLR_NODES = []
+SOLR_LEADER = ''
+SOLR_BALANCE = 'round_robin'
+SOLR_PROBE_INTERVAL = 30
+
+# HTTP transport shared by all Solr requests of a process (see utils/solr_handler.py)
+SOLR_POOL_CONNECTIONS = 10
+SOLR_POOL_MAXSIZE = 20
+SOLR_POOL_BLOCK = False
+SOLR_CONNECT_TIMEOUT = 5
+SOLR_READ_TIMEOUT = 300
+SOLR_KEEP_ALIVE = True
+# ask Solr for gzip compressed responses from this many rows on (or when wtf_json/csl_json is in fl)
+SOLR_COMPRESS_MIN_ROWS = 500
+# write buffer (utils.solr_handler.SolrWriteBuffer): max. delay in ms until buffered writes become visible,
+# batch size and max. age in seconds of a pending batch
+SOLR_COMMIT_WITHIN = 10000
+SOLR_WRITE_BATCH_SIZE = 500
+SOLR_WRITE_MAX_AGE = 5.0
+# concurrent queries (utils.solr_handler.AsyncSolr / solr_gather): worker threads per process and max. number of
+# queries in flight per Solr host
+SOLR_ASYNC_WORKERS = 8
+SOLR_HOST_CONCURRENCY = 4
+# queries of unbounded size (e.g. the lists of a bibliography) are gathered this many at a time, so that only their
+# responses are held in memory at once
+SOLR_GATHER_CHUNK = 4
+# opt-in query cache (Solr(..., cache=True)): max. entries per process, TTL in seconds and an optional Redis URL to
+# share cached responses and invalidations between the apps, e.g. 'redis://localhost:6379/4'
+SOLR_CACHE_SIZE = 1000
+SOLR_CACHE_TTL = 300
+SOLR_CACHE_REDIS_URL = ''
+# per-request Solr trace (utils.solr_trace): log a warning for requests with more calls or more seconds in Solr
+SOLR_TRACE_WARN_CALLS = 50
+SOLR_TRACE_WARN_TIME = 2.0
+# phase timing of saves (utils.phase_timing): keep the spans of the last PHASE_TIMING_KEEP_SLOW saves slower than
+# PHASE_TIMING_SLOW seconds
+PHASE_TIMING_SLOW = 1.0
+PHASE_TIMING_KEEP_SLOW = 50
+# stored fields of hb2 (utils.stored_fields): 'json' strings or 'msgpack' (zlib compressed, in the binary fields
+# wtf_bin, csl_bin, citation_bin; needs the msgpack package, else compressed JSON); re-index after switching
+STORED_FIELD_ENCODING = 'json'
+STORED_FIELD_COMPRESS_LEVEL = 6
 
 SOLR_EXPORT_FIELD = 'wtf_json'
+# page size for cursorMark exports
+SOLR_EXPORT_ROWS = 1000
 SOLR_ROWS = '20'
 SOLR_SEARCH_FACETS = {
     'catalog':
@@ -373,6 +420,35 @@ REDIS_EXEC_COUNTER_URL = 'redis://localhost:6379/3'
 REDIS_EXEC_COUNTER_HOST = 'localhost'
 REDIS_EXEC_COUNTER_PORT = 6379
 REDIS_EXEC_COUNTER_DB = 3
+# increments pending / seconds after which the execution counters of a process are written (utils.exec_counter)
+EXEC_COUNTER_FLUSH_SIZE = 500
+EXEC_COUNTER_FLUSH_INTERVAL = 10.0
+
+# alternate identifier -> id index maintained by persistence (utils.id_index); empty to resolve identifiers in Solr
+REDIS_ID_INDEX_URL = 'redis://localhost:6379/5'
+REDIS_ID_INDEX_HOST = 'localhost'
+REDIS_ID_INDEX_PORT = 6379
+REDIS_ID_INDEX_DB = 5
+
+# queue of relation maintenance jobs (utils.job_queue), worked off by bin/relation_worker.py; empty to work them off
+# in a thread of each app process instead
+REDIS_JOB_QUEUE_URL = 'redis://localhost:6379/6'
+REDIS_JOB_QUEUE_HOST = 'localhost'
+REDIS_JOB_QUEUE_PORT = 6379
+REDIS_JOB_QUEUE_DB = 6
+JOB_QUEUE_BATCH_SIZE = 100
+# a failed batch is queued again up to JOB_QUEUE_MAX_ATTEMPTS times; jobs claimed by a worker which died are queued
+# again after JOB_QUEUE_CLAIM_TIMEOUT seconds
+JOB_QUEUE_MAX_ATTEMPTS = 3
+JOB_QUEUE_CLAIM_TIMEOUT = 600
+
+# edit locks (utils.lock_manager); empty to keep them in memory of each app process. A lock expires LOCK_TTL seconds
+# after the last heartbeat of the edit form
+REDIS_LOCK_URL = 'redis://localhost:6379/7'
+REDIS_LOCK_HOST = 'localhost'
+REDIS_LOCK_PORT = 6379
+REDIS_LOCK_DB = 7
+LOCK_TTL = 900
 
 TRAC_URL = ''
 TRAC_USER = ''
@@ -22,9 +22,7 @@
 
 import datetime
 
-import simplejson as json
-
-from utils.solr_handler import Solr
+from utils.solr_handler import Solr, write_json_array
 
 try:
     import local_p_secrets as secrets
@@ -46,10 +44,8 @@ def export_solr_dump(core=''):
                                          core)
         export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                            application=secrets.SOLR_APP, export_field='wtf_json', core=core)
-        export_docs = export_solr.export()
-
         fo = open(filename, 'w')
-        fo.write(json.dumps(export_docs, indent=4))
+        write_json_array(export_solr.iter_export(), fo, indent=4)
         fo.close()
 
         filename = '%s/%s/%s_%s.not_imported.json' % (secrets.BACKUP_DIR, dow,
@@ -58,10 +54,8 @@ def export_solr_dump(core=''):
         export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                            application=secrets.SOLR_APP, query='-editorial_status:imported', export_field='wtf_json',
                            core=core)
-        export_docs = export_solr.export()
-
         fo = open(filename, 'w')
-        fo.write(json.dumps(export_docs, indent=4))
+        write_json_array(export_solr.iter_export(), fo, indent=4)
         fo.close()
 
     else:
@@ -69,10 +63,8 @@ def export_solr_dump(core=''):
                                          core)
         export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                            application=secrets.SOLR_APP, core=core)
-        export_docs = export_solr.export()
-
         fo = open(filename, 'w')
-        fo.write(json.dumps(export_docs, indent=4))
+        write_json_array(export_solr.iter_export(), fo, indent=4)
         fo.close()
 
 export_solr_dump('hb2_users')
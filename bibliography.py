@@ -49,9 +49,13 @@ from flask_wtf.csrf import CSRFProtect
 from forms.forms import *
 from processors import openurl_processor
 from processors import wtf_csl
+from processors.host_resolver import HostResolver
 from utils import display_vocabularies
 from utils import urlmarker
-from utils.solr_handler import Solr
+from utils import solr_handler
+from utils import stored_fields
+from utils.solr_handler import AsyncSolr, Solr, solr_gather, solr_gather_chunks
+from utils.solr_trace import SolrTrace
 
 try:
     import local_bibliography_secrets as secrets
@@ -93,6 +97,8 @@ Redis(app, 'REDIS_PUBLIST_CACHE')
 
 csrf = CSRFProtect(app)
 
+solr_trace = SolrTrace(app)
+
 log_formatter = logging.Formatter("[%(asctime)s] {%(pathname)s:%(lineno)d} %(levelname)s - %(message)s")
 handler = RotatingFileHandler(secrets.LOGFILE, maxBytes=10000, backupCount=1)
 handler.setLevel(logging.INFO)
@@ -357,6 +363,7 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                     if id_type == 'organisation':
                         id_type = 'affiliation'
 
+                    member_queries = []
                     for orga_id in orgas.keys():
 
                         fquery = ['gnd:[\'\' TO *]']
@@ -368,11 +375,14 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                                 fquery.append('-personal_status:emeritus')
                                 fquery.append('-personal_status:alumnus')
 
-                        member_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, query='%s_id:"%s"' % (id_type, orga_id),
-                                           fquery=fquery, fields=['gnd', 'name'], rows=100000,
-                                           core='person')
-                        member_solr.request()
+                        member_queries.append(AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                                        application=secrets.SOLR_APP,
+                                                        query='%s_id:"%s"' % (id_type, orga_id),
+                                                        fquery=fquery, fields=['gnd', 'name'], rows=100000,
+                                                        core='person'))
+                    solr_gather(*member_queries)
+
+                    for member_solr in member_queries:
 
                         query_part = ''
 
@@ -517,6 +527,24 @@ def bibliography(agent='', agent_id='', style='harvard1'):
             publist_solr.request()
             # logging.info('publist_solr.tree: %s' % json.dumps(publist_solr.tree, indent=4))
 
+            # the lists per pubtype (and year) are independent of each other: fetch them concurrently, a few at a
+            # time, and decode and render them in the order of the tree, so only a few lists are held at once
+            pivot_keys = []
+            for pubtype in publist_solr.tree.get('pubtype,fdate'):
+                if pubtype.get('pivot'):
+                    for year in pubtype.get('pivot')[::-1]:
+                        pivot_keys.append((pubtype.get('value'), year.get('value')))
+                else:
+                    pivot_keys.append((pubtype.get('value'), None))
+            pivot_queries = (AsyncSolr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                                       handler='query', query=query, fields=['wtf_json'], rows=100000,
+                                       fquery=(['fdate:%s' % year] if year is not None else []) +
+                                       ['pubtype:%s' % pubtype],
+                                       core='hb2', lazy=True)
+                             for pubtype, year in pivot_keys)
+            resolver = HostResolver(cache=True)
+            pivot_lists = resolver.decode_lists(solr_gather_chunks(pivot_queries))
+
             list_cnt = 0
             for pubtype in publist_solr.tree.get('pubtype,fdate'):
                 # logging.debug('pubtype = %s' % pubtype.get('value'))
@@ -526,22 +554,12 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                 if pubtype.get('pivot'):
                     for year in pubtype.get('pivot')[::-1]:
                         # logging.debug('\t%s: %s' % (year.get('value'), year.get('count')))
-                        filterquery = []
-                        filterquery.append('fdate:%s' % year.get('value'))
-                        filterquery.append('pubtype:%s' % pubtype.get('value'))
-                        pivot_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, handler='query',
-                                          query=query, fields=['wtf_json'], rows=100000,
-                                          fquery=filterquery, core='hb2')
-                        pivot_solr.request()
-                        results = pivot_solr.results
-                        # logging.debug('PIVOT_PUB_LIST: %s' % results)
-
-                        publist_docs = []
-                        for result in results:
-                            publist_docs.append(json.loads(result.get('wtf_json')))
-                            if format == 'html':
-                                year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(json.loads(result.get('wtf_json'))).replace('&', '&amp;')
+                        publist_docs = next(pivot_lists)
+                        # logging.debug('PIVOT_PUB_LIST: %s' % publist_docs)
+
+                        if format == 'html':
+                            for record in publist_docs:
+                                year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(record, resolver=resolver).replace('&', '&amp;')
 
                         if not group_by_type:
                             if format == 'html':
@@ -549,26 +567,17 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                             else:
                                 year_list += '%s\n' % year.get('value')
 
-                        year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                        year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
                 else:
-                    filterquery = []
-                    filterquery.append('pubtype:%s' % pubtype.get('value'))
-                    pivot_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                      application=secrets.SOLR_APP, handler='query',
-                                      query=query, fields=['wtf_json'], rows=100000,
-                                      fquery=filterquery, core='hb2')
-                    pivot_solr.request()
-                    results = pivot_solr.results
-                    # logging.debug('PIVOT_PUB_LIST: %s' % results)
-
-                    publist_docs = []
-                    for result in results:
-                        publist_docs.append(json.loads(result.get('wtf_json')))
-                        if format == 'html':
+                    publist_docs = next(pivot_lists)
+                    # logging.debug('PIVOT_PUB_LIST: %s' % publist_docs)
+
+                    if format == 'html':
+                        for record in publist_docs:
                             year_coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(
-                                json.loads(result.get('wtf_json'))).replace('&', '&amp;')
+                                record, resolver=resolver).replace('&', '&amp;')
 
-                    year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                    year_list += citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
 
                 if locale.startswith('de'):
                     group_value = display_vocabularies.PUBTYPE_GER.get(pubtype.get('value'))
@@ -639,20 +648,23 @@ def bibliography(agent='', agent_id='', style='harvard1'):
             results.extend(publist_solr.results)
             # print('publist_solr.results: %s' % results)
 
-            publist_docs = []
+            # decode the docs group by group, once, resolving the hosts of each group together
+            resolver = HostResolver(cache=True)
+
             if group:
                 biblist = ''
                 list_cnt = 0
                 for result in results:
+                    publist_docs = [stored_fields.load(doc) for doc in result.get('doclist').get('docs')]
+                    resolver.prefetch(publist_docs)
                     # logging.debug('groupValue: %s' % result.get('groupValue'))
                     # logging.debug('numFound: %s' % result.get('doclist').get('numFound'))
                     # logging.debug('docs: %s' % result.get('doclist').get('docs'))
 
                     coins = ''
-                    for doc in result.get('doclist').get('docs'):
-                        publist_docs.append(json.loads(doc.get('wtf_json')))
-                        if format == 'html':
-                            coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(json.loads(doc.get('wtf_json'))).replace('&', '&amp;')
+                    if format == 'html':
+                        for record in publist_docs:
+                            coins += '<div class="coins"><span class="Z3988" title="%s"></span></div>' % openurl_processor.wtf_openurl(record, resolver=resolver).replace('&', '&amp;')
 
                     group_value = result.get('groupValue')
                     if str2bool(group_by_type):
@@ -677,27 +689,27 @@ def bibliography(agent='', agent_id='', style='harvard1'):
 
                     if str2bool(group_by_type):
                         if pubsort == 'stm':
-                            STM_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            STM_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             if format == 'html':
                                 STM_TOC[result.get('groupValue')] = '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                                 STM_COINS[result.get('groupValue')] = coins
                         elif pubsort == 'anh':
-                            ANH_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            ANH_LIST[result.get('groupValue')] = header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             if format == 'html':
                                 ANH_TOC[result.get('groupValue')] = '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                                 ANH_COINS[result.get('groupValue')] = coins
                         else:
-                            biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                            biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                             if format == 'html':
                                 biblist_toc += '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                                 biblist_coins += coins
                     elif str2bool(group_by_year):
-                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
                         if format == 'html':
                             biblist_toc += '<li><a href="#%s_%s">%s</a></li>' % (biblist_id, list_cnt, group_value)
                             biblist_coins += coins
                     else:
-                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style) + footer
+                        biblist += header + citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style) + footer
 
                     if str2bool(group_by_type) and pubsort == 'anh':
                         # logging.debug(ANH_LIST)
@@ -720,13 +732,10 @@ def bibliography(agent='', agent_id='', style='harvard1'):
                                     biblist_toc += STM_TOC.get(pubtype)
                                     biblist_coins += STM_COINS.get(pubtype)
 
-                    publist_docs = []
-
             else:
-                for result in results:
-                    publist_docs.append(json.loads(result.get('wtf_json')))
-
-                biblist = citeproc_node(wtf_csl.wtf_csl(publist_docs), format, locale, style)
+                publist_docs = [stored_fields.load(result) for result in results]
+                resolver.prefetch(publist_docs)
+                biblist = citeproc_node(wtf_csl.wtf_csl(publist_docs, resolver=resolver), format, locale, style)
 
         response = ''
 
@@ -1045,6 +1054,9 @@ def dependencies_health():
         'external': False
     })
 
+    # health of the Solr nodes (SOLR_NODES)
+    dependencies.extend(solr_handler.cluster_health())
+
     # health of Redis
     try:
         storage = app.extensions['redis']['REDIS_PUBLIST_CACHE']
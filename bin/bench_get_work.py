@@ -0,0 +1,92 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark for persistence.get_work: the former cascade of up to eight queries vs. real-time get plus one ranked
+query over all identifier fields. Needs the Solr of p_secrets with some data in hb2. Run from the project root:
+
+    python bin/bench_get_work.py [runs]
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import os
+import sys
+import timeit
+import urllib.parse
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import persistence
+from utils import solr_handler
+from utils.solr_handler import Solr
+
+try:
+    import local_p_secrets as secrets
+except ImportError:
+    import p_secrets as secrets
+
+CASCADE = ['id:"%s"', 'id:"%s/"', 'same_as:%s', 'doi:%s', 'pmid:%s', 'isi_id:%s', 'e_id:%s', 'orcid_put_code:%s']
+
+calls = []
+solr_handler.add_listener(calls.append)
+
+
+def cascade_get_work(work_id):
+    for template in CASCADE:
+        value = work_id
+        if template.startswith('doi'):
+            value = urllib.parse.unquote_plus(work_id)
+        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                           query=template % value, facet='false')
+        get_request.request()
+        if len(get_request.results) > 0:
+            return get_request.results[0]
+    return None
+
+
+def sample():
+    sample_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core='hb2',
+                       query='doi:[\'\' TO *]', fields=['id', 'doi'], rows=1, facet='false')
+    sample_solr.request()
+    if len(sample_solr.results) == 0:
+        sys.exit('hb2 has no record with a DOI to benchmark with')
+    doc = sample_solr.results[0]
+    return [('hit: id', doc.get('id')), ('hit: doi', doc.get('doi')[0]), ('miss', str(uuid.uuid4()))]
+
+
+def bench(label, func, work_id, number):
+    del calls[:]
+    duration = timeit.timeit(lambda: func(work_id), number=number) / number
+    print('  %-22s %8.2f ms %6.1f queries' % (label, duration * 1000, len(calls) / number))
+
+
+def main(number):
+    for label, work_id in sample():
+        print('%s (%s)' % (label, work_id))
+        bench('cascade', cascade_get_work, work_id, number)
+        bench('get + resolve_id', persistence.get_work, work_id, number)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,94 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark for the records handed to persistence.record2solr by machine writes (relation jobs, API, ORCID): a
+WTForms form built by from_json() vs. forms.record.Record. Both are built from the same synthetic work and then
+read like record2solr does, which asks for form.data some hundred times per work. Run from the project root:
+
+    python bin/bench_record.py [runs] [reads]
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import wtforms_json
+from flask import Flask
+
+from forms.record import Record
+from utils import display_vocabularies
+
+wtforms_json.init()
+
+app = Flask(__name__)
+app.config['WTF_CSRF_ENABLED'] = False
+app.secret_key = 'bench'
+
+
+def work(persons):
+    return {
+        'id': str(uuid.uuid4()), 'pubtype': 'ArticleJournal', 'title': 'A realistic title', 'subtitle': 'subtitle',
+        'issued': '2016', 'language': ['eng'], 'DOI': ['10.1000/%s' % uuid.uuid4()], 'ISSN': ['1234-5678'],
+        'person': [{'name': 'Mustermann, Erika %s' % i, 'gnd': '1%08d' % i, 'role': ['aut'], 'tudo': True}
+                   for i in range(persons)],
+        'abstract': [{'content': 'Lorem ipsum dolor sit amet. ' * 30, 'sharable': True}],
+        'is_part_of': [{'is_part_of': str(uuid.uuid4()), 'volume': '12', 'issue': '3', 'page_first': '1',
+                        'page_last': '10'}],
+        'catalog': ['Technische Universität Dortmund'], 'owner': ['daten.ub@tu-dortmund.de'],
+        'created': '2016-01-01 12:00:00.001', 'changed': '2017-01-01 12:00:00.001', 'editorial_status': 'finalized',
+    }
+
+
+def from_form(data):
+    return display_vocabularies.PUBTYPE2FORM.get(data.get('pubtype')).from_json(data)
+
+
+def read(record, reads):
+    record.changed.data = '2017-01-02 12:00:00.001'
+    record.same_as.append_entry('same')
+    for i in range(reads):
+        record.data.get('person')
+
+
+def bench(label, build, data, runs, reads):
+    build_time = timeit.timeit(lambda: build(data), number=runs) / runs
+    total = timeit.timeit(lambda: read(build(data), reads), number=runs) / runs
+    print('  %-10s build %8.3f ms   build + %d reads %8.3f ms' % (label, build_time * 1000, reads, total * 1000))
+
+
+def main(runs, reads):
+    with app.test_request_context():
+        for persons in (1, 10, 100):
+            data = work(persons)
+            print('ArticleJournal with %s persons' % persons)
+            bench('from_json', from_form, data, runs, reads)
+            bench('Record', Record.work, data, runs, reads)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
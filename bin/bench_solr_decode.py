@@ -0,0 +1,104 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark for decoding Solr responses: eval() of 'wt=python' vs. the JSON decode path of utils.solr_handler.
+
+The result pages are synthetic but shaped like hb2 search results (wtf_json, csl_json, bibliographicCitation and
+the usual facet fields). Run from the project root:
+
+    python bin/bench_solr_decode.py [rows ...]
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import os
+import sys
+import timeit
+import uuid
+
+import simplejson as json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.solr_handler import decode_json, decode_lazy, decode_response
+
+
+def hb2_doc(idx):
+    record_id = str(uuid.uuid4())
+    persons = [{'name': 'Mustermann, Erika %s' % i, 'gnd': '1%08d' % (idx * 10 + i), 'role': ['aut'],
+                'tudo': True, 'rubi': False} for i in range(8)]
+    wtf = {
+        'id': record_id, 'pubtype': 'ArticleJournal', 'title': 'A realistic title for record %s' % idx,
+        'subtitle': 'with a subtitle', 'issued': '2016', 'language': ['eng'], 'person': persons,
+        'abstract': [{'content': 'Lorem ipsum dolor sit amet. ' * 30, 'sharable': True}],
+        'DOI': ['10.1000/%s' % idx], 'ISSN': ['1234-5678'], 'catalog': ['Technische Universität Dortmund'],
+        'is_part_of': [{'is_part_of': str(uuid.uuid4()), 'volume': '12', 'issue': '3', 'page_first': '1',
+                        'page_last': '10'}],
+        'created': '2016-01-01 12:00:00.001', 'changed': '2017-01-01 12:00:00.001',
+        'owner': ['daten.ub@tu-dortmund.de'], 'editorial_status': 'finalized',
+    }
+    csl = {'id': record_id, 'type': 'article-journal', 'title': wtf.get('title'),
+           'author': [{'family': 'Mustermann', 'given': 'Erika %s' % i} for i in range(8)],
+           'issued': {'date-parts': [[2016]]}}
+    return {
+        'id': record_id, 'title': wtf.get('title'), 'pubtype': 'ArticleJournal', 'fdate': '2016',
+        'person': [p.get('name') for p in persons], 'tudo': True, 'rubi': False,
+        'wtf_json': json.dumps(wtf), 'csl_json': json.dumps([csl]),
+        'bibliographicCitation': 'ctx_ver=Z39.88-2004&rft.atitle=%s' % wtf.get('title'),
+        '_version_': 1560000000000000000 + idx,
+    }
+
+
+def page(rows):
+    docs = [hb2_doc(idx) for idx in range(rows)]
+    return {
+        'responseHeader': {'status': 0, 'QTime': 12, 'params': {'q': '*:*', 'rows': str(rows)}},
+        'response': {'numFound': rows, 'start': 0, 'docs': docs},
+    }
+
+
+def bench(label, func, number):
+    duration = timeit.timeit(func, number=number) / number
+    print('  %-28s %10.2f ms' % (label, duration * 1000))
+
+
+def main(sizes):
+    for rows in sizes:
+        data = page(rows)
+        # the python writer's output is a python literal: repr() gives the same shape
+        python_body = repr(data)
+        json_body = json.dumps(data)
+        number = max(1, 2000 // rows)
+
+        print('rows=%s (python: %s KB, json: %s KB, %s runs)' % (rows, len(python_body) // 1024,
+                                                                 len(json_body) // 1024, number))
+        bench('eval (wt=python)', lambda: eval(python_body), number)
+        bench('literal_eval (wt=python)', lambda: decode_response(python_body, 'python'), number)
+        bench('decode_json (wt=json)', lambda: decode_json(json_body.encode('utf-8')), number)
+        bench('decode_lazy, header only', lambda: decode_lazy(json_body, rows), number)
+        bench('decode_lazy, first doc', lambda: decode_lazy(json_body, rows)['response']['docs'][0], number)
+        bench('decode_lazy, all docs', lambda: list(decode_lazy(json_body, rows)['response']['docs']), number)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [20, 1000, 10000])
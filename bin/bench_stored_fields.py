@@ -0,0 +1,99 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark for the encodings of the stored fields of hb2 (utils.stored_fields): JSON strings vs. compressed msgpack
+in binary fields, on the synthetic result pages of bench_solr_decode.py. Reports per encoding
+
+    stored      bytes of wtf_json, csl_json and bibliographicCitation per doc as Solr keeps them (raw bytes for binary
+                fields); 'lz4-like' approximates Solr's own compression of stored fields with zlib level 1 per 16 KB
+    transfer    size of a JSON response, plain and gzip compressed
+    decode      decode_json() of the response plus load() of wtf_json of every doc
+
+The real index size is best compared on the Solr admin page of hb2 after re-indexing with either encoding. Run
+from the project root:
+
+    python bin/bench_stored_fields.py [rows ...]
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import base64
+import gzip
+import os
+import sys
+import timeit
+import zlib
+
+import simplejson as json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_solr_decode import page
+from utils import stored_fields
+from utils.solr_handler import decode_json
+
+
+def stored_size(docs):
+    raw = b''
+    for doc in docs:
+        for field, binary in stored_fields.BINARY.items():
+            if doc.get(binary):
+                raw += base64.b64decode(doc.get(binary))
+            elif doc.get(field):
+                raw += doc.get(field).encode('utf-8')
+    # Solr compresses stored fields in blocks of about 16 KB
+    blocks = [raw[start:start + 16384] for start in range(0, len(raw), 16384)]
+    return len(raw), sum(len(zlib.compress(block, 1)) for block in blocks)
+
+
+def read_all(body):
+    for doc in decode_json(body).get('response').get('docs'):
+        stored_fields.load(doc)
+
+
+def bench(label, docs, number):
+    data = {'responseHeader': {'status': 0, 'QTime': 12}, 'response': {'numFound': len(docs), 'start': 0,
+                                                                        'docs': docs}}
+    body = json.dumps(data).encode('utf-8')
+    stored, compressed = stored_size(docs)
+    duration = timeit.timeit(lambda: read_all(body), number=number) / number
+    print('  %-8s stored %7.0f B/doc (lz4-like %6.0f)  transfer %7s KB (gzip %6s KB)  decode %8.2f ms' % (
+        label, stored / len(docs), compressed / len(docs), len(body) // 1024, len(gzip.compress(body)) // 1024,
+        duration * 1000))
+
+
+def main(sizes):
+    if stored_fields.msgpack is None:
+        print('msgpack is not installed: the binary fields hold compressed JSON')
+    for rows in sizes:
+        docs = page(rows).get('response').get('docs')
+        stored_fields.ENCODING = 'msgpack'
+        packed = [stored_fields.encode('hb2', doc) for doc in docs]
+        number = max(1, 2000 // rows)
+        print('rows=%s (%s runs)' % (rows, number))
+        bench('json', docs, number)
+        bench('msgpack', packed, number)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [20, 1000, 10000])
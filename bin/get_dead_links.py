@@ -40,22 +40,20 @@ def export_solr_dump():
     filename = '%s/%s/%s_%s.dead_ends.json' % (secrets.BACKUP_DIR, dow,
                                                   datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"), 'hb2')
 
+    # all known ids in one sorted docValues dump instead of one query per link
+    ids_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                    application=secrets.SOLR_APP, core='hb2')
+    known_ids = set(doc.get('id') for doc in ids_solr.export_stream(fields=['id']))
+
     export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                        application=secrets.SOLR_APP, query='is_part_of:[\'\' TO *]',
                        export_field='wtf_json', core='hb2')
-    export_docs = export_solr.export()
 
-    # TODO get id of the host and check if it exists
     dead_ends = []
-    for doc in export_docs:
+    for doc in export_solr.iter_export():
         for part in doc.get('is_part_of'):
             try:
-                query = 'id:%s' % part.get('is_part_of')
-                get_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, core='hb2', query=query, facet='false',
-                                       fields=['wtf_json'])
-                get_record_solr.request()
-                if len(get_record_solr.results) == 0:
+                if part.get('is_part_of') not in known_ids:
                     print('%s is a dead end' % part.get('is_part_of'))
                     if part.get('is_part_of') not in dead_ends:
                         dead_ends.append(part.get('is_part_of'))
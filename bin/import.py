@@ -226,6 +226,51 @@ def import_data(entity_type='', file='', force='false', rewrite='false', rel='tr
         print('Bad request!')
 
 
+def bulk_import_data(entity_type='', file='', rel='true', batch_size=1000):
+
+    if entity_type and file:
+
+        preprocess = {'organisation': preprocess_orga, 'group': preprocess_group, 'person': preprocess_person,
+                      'work': preprocess_work}.get(entity_type, lambda data: data)
+
+        not_imported = []
+
+        with open(file) as data_file:
+            import_json = json.load(data_file)
+
+        # POST batch_size records per request to the bulk API: one commit per request instead of one per record
+        cnt = 0
+        for start in range(0, len(import_json), batch_size):
+            records = [preprocess(record) for record in import_json[start:start + batch_size]]
+            try:
+                response = requests.post('%s/bulk/%s?rel=%s' % (secrets.API, entity_type, rel),
+                                         headers={'Content-Type': 'application/json', 'Authorization': 'Bearer %s' % secrets.TOKEN},
+                                         data=json.dumps(records)
+                                         )
+                status = response.status_code
+                logging.info('STATUS: %s' % status)
+                if status == 200:
+                    for result in json.loads(response.content.decode("utf-8")):
+                        if result.get('message'):
+                            logging.info('%s: %s' % (result.get('id'), result.get('message')))
+                    cnt += len(records)
+                else:
+                    logger.error('%s: %s' % (status, response.content.decode("utf-8")))
+                    not_imported.extend(records)
+
+            except requests.exceptions.ConnectionError as e:
+                logging.error(e)
+                not_imported.extend(records)
+
+        print("Report: %s / %s records loaded!" % (cnt, len(import_json)))
+        if not_imported:
+            fo = open('../log/records.import_failed.json', 'w')
+            fo.write(json.dumps(not_imported, indent=4))
+            fo.close()
+
+    else:
+        print('Bad request!')
+
 def import_orgas():
     print('START organisations: %s' % timestamp())
     cleanup('organisation')
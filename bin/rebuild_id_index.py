@@ -0,0 +1,71 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Fill the Redis identifier index (utils/id_index.py) from the Solr cores of p_secrets. Run from the project root
+after enabling REDIS_ID_INDEX_URL, after restoring a backup or whenever the index is suspected to be stale:
+
+    python bin/rebuild_id_index.py [work|person|organisation|group ...]
+
+Writes to a core during its rebuild may be lost from the index; run it when the apps are quiet.
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import id_index as id_index_module
+from utils.id_index import id_index
+from utils.solr_handler import Solr
+
+try:
+    import local_p_secrets as secrets
+except ImportError:
+    import p_secrets as secrets
+
+CORES = {'work': 'hb2', 'person': 'person', 'organisation': 'organisation', 'group': 'group'}
+
+
+def rebuild(core):
+    export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core=core,
+                       query='*:*', facet='false')
+    start = timeit.default_timer()
+    count = id_index.rebuild(core, export_solr.iter_export(fields=list(id_index_module.FIELDS.get(core))))
+    print('%-12s %8s docs %8.1f s' % (core, count, timeit.default_timer() - start))
+
+
+def main(entities):
+    if id_index.redis is None:
+        sys.exit('REDIS_ID_INDEX_URL is not set')
+    for entity in entities:
+        if entity not in CORES:
+            sys.exit('unknown entity: %s' % entity)
+    for entity in entities:
+        rebuild(CORES.get(entity))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(CORES))
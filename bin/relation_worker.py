@@ -0,0 +1,49 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Worker for the relation maintenance jobs queued by persistence (linking related works, re-indexing the works and
+persons of changed organisations and groups). Needs REDIS_JOB_QUEUE_URL; run one or more from the project root:
+
+    python bin/relation_worker.py
+
+Progress of the queue is shown at /jobs/status.
+"""
+
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import persistence
+from utils.job_queue import relation_jobs
+
+
+if __name__ == '__main__':
+    if not relation_jobs.shared:
+        sys.exit('REDIS_JOB_QUEUE_URL is not set')
+    logging.basicConfig(level=logging.INFO)
+    logging.info('handlers: %s' % ', '.join(sorted(persistence.relation_jobs.handlers)))
+    relation_jobs.work()
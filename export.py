@@ -22,9 +22,7 @@
 
 import datetime
 
-import simplejson as json
-
-from utils.solr_handler import Solr
+from utils.solr_handler import Solr, write_json_array
 
 try:
     import local_p_secrets as secrets
@@ -44,10 +42,8 @@ def export_solr_query(core='', query='*:*', filename=''):
             export_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                application=secrets.SOLR_APP, query=query, export_field='wtf_json',
                                core=core)
-            export_docs = export_solr.export()
-
             fo = open(filename, 'w')
-            fo.write(json.dumps(export_docs, indent=4))
+            write_json_array(export_solr.iter_export(), fo, indent=4)
             fo.close()
 
 # export_solr_query('hb2', 'pubtype:Patent', 'pubtype_Patent.json')
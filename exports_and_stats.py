@@ -38,6 +38,8 @@ from flask_wtf.csrf import CSRFProtect
 
 from forms.forms import *
 import persistence
+from utils import solr_handler
+from utils import stored_fields
 from utils.solr_handler import Solr
 
 try:
@@ -121,7 +123,7 @@ def export_openapc(year=''):
 
         if len(results) > 0:
             for record in results:
-                thedata = json.loads(record.get('wtf_json'))
+                thedata = stored_fields.load(record)
 
                 doi = record.get('doi')[0]
                 is_hybrid = False
@@ -138,7 +140,7 @@ def export_openapc(year=''):
                         if record.get('is_part_of_id')[0]:
                             host = persistence.get_work(record.get('is_part_of_id')[0])
                             if host:
-                                record = json.loads(host.get('wtf_json'))
+                                record = stored_fields.load(host)
                                 # print(json.dumps(record, indent=4))
                                 journal_title = record.get('title')
                                 if record.get('fsubseries'):
@@ -214,7 +216,7 @@ def export_oa_report(year=''):
 
         if results:
             for record in results:
-                thedata = json.loads(record.get('wtf_json'))
+                thedata = stored_fields.load(record)
 
                 author = ''
                 corresponding_author = ''
@@ -264,7 +266,7 @@ def export_oa_report(year=''):
                     if record.get('is_part_of_id')[0]:
                         host = persistence.get_work(record.get('is_part_of_id')[0])
                         if host:
-                            record = json.loads(host.get('wtf_json'))
+                            record = stored_fields.load(host)
                             # print(json.dumps(record, indent=4))
                             journal_title = record.get('title')
                             if record.get('fsubseries'):
@@ -453,6 +455,9 @@ def dependencies_health():
         'external': False
     })
 
+    # health of the Solr nodes (SOLR_NODES)
+    dependencies.extend(solr_handler.cluster_health())
+
     return dependencies
 
 
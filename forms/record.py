@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import collections
+
+from wtforms import BooleanField, FieldList, FormField, SelectField, SelectMultipleField
+from wtforms.fields.core import UnboundField
+
+from utils import display_vocabularies
+
+# field kinds of a form class and defaults of its fields as processed by WTForms(-JSON) for keys missing in the JSON
+_SPECS = {}
+
+
+def _kind(unbound):
+    field_class = unbound.field_class
+    default = unbound.kwargs.get('default')
+    if issubclass(field_class, FieldList):
+        return ('list', _kind(unbound.args[0]), unbound.kwargs.get('min_entries', 0))
+    if issubclass(field_class, FormField):
+        return ('form', spec(unbound.args[0]))
+    if issubclass(field_class, BooleanField):
+        return ('value', False)
+    if issubclass(field_class, SelectMultipleField):
+        return ('value', [])
+    if issubclass(field_class, SelectField):
+        if default is None:
+            # like SelectField.process_data()
+            try:
+                return ('value', unbound.kwargs.get('coerce', str)(default))
+            except (TypeError, ValueError):
+                return ('value', None)
+        return ('value', default)
+    return ('value', default if default is not None else '')
+
+
+def spec(form_class):
+    """
+    The fields of a form class in the order of form.data: name -> kind.
+    """
+    if form_class not in _SPECS:
+        fields = [(name, getattr(form_class, name)) for name in dir(form_class)
+                  if isinstance(getattr(form_class, name), UnboundField)]
+        fields.sort(key=lambda field: (field[1].creation_counter, field[0]))
+        _SPECS[form_class] = collections.OrderedDict((name, _kind(unbound)) for name, unbound in fields)
+    return _SPECS[form_class]
+
+
+def default(kind):
+    if kind[0] == 'list':
+        return [default(kind[1]) for _ in range(kind[2])]
+    if kind[0] == 'form':
+        return dict((name, default(subkind)) for name, subkind in kind[1].items())
+    value = kind[1]
+    if callable(value):
+        return value()
+    return list(value) if isinstance(value, list) else value
+
+
+def normalize(kind, value):
+    """
+    Data of a field as from_json() makes it: missing keys get their defaults, unknown keys are dropped and lists are
+    padded to min_entries.
+    """
+    if kind[0] == 'list':
+        entries = [normalize(kind[1], entry) for entry in value or []]
+        while len(entries) < kind[2]:
+            entries.append(default(kind[1]))
+        return entries
+    if kind[0] == 'form':
+        value = value or {}
+        return dict((name, normalize(subkind, value.get(name)) if name in value else default(subkind))
+                    for name, subkind in kind[1].items())
+    return value
+
+
+class Field(object):
+    """
+    A field of a Record: data, entries of lists (record.person[0].rubi.data = True) and append_entry().
+    """
+    __slots__ = ('_container', '_key', '_kind')
+
+    def __init__(self, container, key, kind):
+        self._container = container
+        self._key = key
+        self._kind = kind
+
+    @property
+    def data(self):
+        return self._container[self._key]
+
+    @data.setter
+    def data(self, value):
+        self._container[self._key] = value
+
+    def _entry(self, idx):
+        entries = self._container[self._key]
+        if self._kind[1][0] == 'form':
+            return Entry(entries[idx], self._kind[1][1])
+        return Field(entries, idx, self._kind[1])
+
+    def __getitem__(self, idx):
+        return self._entry(idx)
+
+    def __len__(self):
+        return len(self._container[self._key])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._entry(idx)
+
+    def append_entry(self, data=None):
+        entries = self._container[self._key]
+        entries.append(normalize(self._kind[1], data) if data is not None else default(self._kind[1]))
+        return self._entry(len(entries) - 1)
+
+    def pop_entry(self):
+        return self._container[self._key].pop()
+
+
+class Entry(object):
+    """
+    The fields of a dict, i.e. a record or an entry of a list of subforms.
+    """
+    __slots__ = ('data', '_fields')
+
+    def __init__(self, data, fields):
+        self.data = data
+        self._fields = fields
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._fields:
+            raise AttributeError(name)
+        return Field(self.data, name, self._fields[name])
+
+
+class Record(Entry):
+    """
+    The data of a form without the form: Record(PersonAdminForm, data) has the data form_class.from_json(data)
+    would have, and the fields persistence.record2solr(), person2solr(), orga2solr() and group2solr() use, so
+    non-interactive writes (relation jobs, cascades, the REST API) need not build WTForms objects. There is no
+    validation and no type coercion: values are taken as they are.
+    """
+    __slots__ = ('form_class',)
+
+    def __init__(self, form_class, data=None):
+        if form_class is None:
+            raise TypeError('Record needs a form class')
+        self.form_class = form_class
+        fields = spec(form_class)
+        super(Record, self).__init__(normalize(('form', fields), data), fields)
+
+    @classmethod
+    def work(cls, data):
+        """
+        The record of a work, with the form class of its pubtype.
+        """
+        return cls(display_vocabularies.PUBTYPE2FORM.get(data.get('pubtype')), data)
@@ -41,6 +41,7 @@ from flask_wtf.csrf import CSRFProtect
 from forms.forms import *
 
 from utils import display_vocabularies
+from utils import stored_fields
 
 try:
     import local_app_secrets as secrets
@@ -133,7 +134,7 @@ def last_split_filter(category):
 # Just a temporary hack...
 @app.template_filter('get_name')
 def get_name(record):
-    return json.loads(record.get('wtf_json')).get('name')
+    return stored_fields.load(record).get('name')
 
 
 @app.template_filter('filter_remove')
@@ -146,6 +147,11 @@ def deserialize_json_filter(thejson):
     return json.loads(thejson)
 
 
+@app.template_filter('record_data')
+def record_data_filter(doc):
+    return stored_fields.load(doc)
+
+
 @app.route('/')
 @app.route('/index')
 @app.route('/homepage')
@@ -40,6 +40,8 @@ from flask_wtf.csrf import CSRFProtect
 
 from forms.forms import *
 import persistence
+from utils import solr_handler
+from utils import stored_fields
 from utils.solr_handler import Solr
 
 try:
@@ -1568,6 +1570,9 @@ def dependencies_health():
         'external': False
     })
 
+    # health of the Solr nodes (SOLR_NODES)
+    dependencies.extend(solr_handler.cluster_health())
+
     # health of Redis
     try:
         storage = app.extensions['redis']['REDIS_OAI_PMH_RT']
@@ -1598,6 +1603,11 @@ def deserialize_json_filter(thejson):
     return json.loads(thejson)
 
 
+@app.template_filter('record_data')
+def record_data_filter(doc):
+    return stored_fields.load(doc)
+
+
 @app.route('/redis/stats/<db>')
 def redis_stats(db='2'):
     if db == '2':
@@ -31,6 +31,8 @@ import urllib
 from processors import crossref_processor
 from processors import datacite_processor
 from processors import orcid_processor
+from processors.host_resolver import HostResolver
+from utils import stored_fields
 from utils.solr_handler import Solr
 
 try:
@@ -257,10 +259,12 @@ def get_new_records(affiliation='', query='*:*'):
         logging.error('No records found for query: %s' % query)
     else:
         print(len(get_record_solr.results))
-        # orcid_records.append(orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[json.loads(get_record_solr.results[0].get('wtf_json'))])[0])
-        for record in get_record_solr.results:
-            wtf = json.loads(record.get('wtf_json'))
-            orcid_records.setdefault(record.get('id'), orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[wtf]))
+        # orcid_records.append(orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[stored_fields.load(get_record_solr.results[0])])[0])
+        records = [(record, stored_fields.load(record)) for record in get_record_solr.results]
+        resolver = HostResolver([wtf for record, wtf in records])
+        for record, wtf in records:
+            orcid_records.setdefault(record.get('id'), orcid_processor.wtf_orcid(
+                affiliation=affiliation, wtf_records=[wtf], resolver=resolver))
 
     return orcid_records
 
@@ -278,10 +282,12 @@ def get_updated_records(affiliation='', query='*:*'):
         logging.error('No records found for query: %s' % query)
     else:
         print(len(get_record_solr.results))
-        # orcid_records.append(orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[json.loads(get_record_solr.results[0].get('wtf_json'))])[0])
-        for record in get_record_solr.results:
-            wtf = json.loads(record.get('wtf_json'))
-            orcid_records.setdefault(record.get('orcid_put_code')[0], orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[wtf]))
+        # orcid_records.append(orcid_processor.wtf_orcid(affiliation=affiliation, wtf_records=[stored_fields.load(get_record_solr.results[0])])[0])
+        records = [(record, stored_fields.load(record)) for record in get_record_solr.results]
+        resolver = HostResolver([wtf for record, wtf in records])
+        for record, wtf in records:
+            orcid_records.setdefault(record.get('orcid_put_code')[0], orcid_processor.wtf_orcid(
+                affiliation=affiliation, wtf_records=[wtf], resolver=resolver))
 
     return orcid_records
 
@@ -27,6 +27,9 @@ LOGFILE = 'log/persistence.log'
 SOLR_HOST = 'localhost'
 SOLR_PORT = '5200'
 SOLR_APP = 'solr'
+# identifiers per query of resolve_ids() and docs per update request of bulk_record2solr() etc.
+RESOLVE_BATCH_SIZE = 500
+BULK_BATCH_SIZE = 500
 
 # ---- BACKUP ---- #
 BACKUP_DIR = ''
@@ -20,19 +20,27 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import functools
+import hashlib
 import logging
 from logging.handlers import RotatingFileHandler
 import simplejson as json
-import timeit
 import urllib
-import redis
 
 from forms.forms import *
+from forms.record import Record
 
 from processors import openurl_processor, wtf_csl
+from processors.host_resolver import HostResolver
 
-from utils import display_vocabularies
-from utils.solr_handler import Solr
+from utils import denormalisation
+from utils.exec_counter import exec_counters
+from utils import id_index as id_index_module
+from utils.id_index import id_index
+from utils.job_queue import relation_jobs
+from utils.phase_timing import phase_timer
+from utils.solr_handler import Solr, SolrError, SolrWriteBuffer, COMMIT_WITHIN
+from utils import stored_fields
 
 try:
     import local_p_secrets as secrets
@@ -50,165 +58,284 @@ handler.setFormatter(log_formatter)
 logger.addHandler(handler)
 
 
-def get_work(work_id):
-    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, query='id:"%s"' % work_id)
-    get_request.request()
-
-    if len(get_request.results) == 0:
-        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, query='id:"%s/"' % work_id)
-        get_request.request()
-
-        if len(get_request.results) == 0:
-
-            get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                               application=secrets.SOLR_APP, query='same_as:%s' % work_id,
-                               facet='false')
-            get_request.request()
-
-            if len(get_request.results) == 0:
-                get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                   application=secrets.SOLR_APP, query='doi:%s' % urllib.parse.unquote_plus(work_id),
-                                   facet='false')
-                get_request.request()
-
-                if len(get_request.results) == 0:
-                    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, query='pmid:%s' % work_id,
-                                       facet='false')
-                    get_request.request()
-
-                    if len(get_request.results) == 0:
-                        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                           application=secrets.SOLR_APP, query='isi_id:%s' % work_id,
-                                           facet='false')
-                        get_request.request()
-
-                        if len(get_request.results) == 0:
-                            get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                               application=secrets.SOLR_APP, query='e_id:%s' % work_id,
-                                               facet='false')
-                            get_request.request()
-
-                            if len(get_request.results) == 0:
-                                get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                                   application=secrets.SOLR_APP, query='orcid_put_code:%s' % work_id,
-                                                   facet='false')
-                                get_request.request()
-
-                                if len(get_request.results) == 0:
-                                    return None
-                                else:
-                                    return get_request.results[0]
-                            else:
-                                return get_request.results[0]
-                        else:
-                            return get_request.results[0]
-                    else:
-                        return get_request.results[0]
-                else:
-                    return get_request.results[0]
-            else:
-                return get_request.results[0]
+def get_by_id(core, record_id):
+    """
+    Exact primary key lookup through Solr's real-time get: skips query parsing and sees uncommitted writes.
+    """
+    if not record_id or ',' in record_id:
+        return None
+    docs = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core=core).get(record_id)
+    if len(docs) > 0:
+        return docs[0]
+    return None
+
+
+def _canonical(data):
+    if isinstance(data, dict):
+        return dict((key, _canonical(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [_canonical(value) for value in data]
+    if isinstance(data, str):
+        return data.strip()
+    return data
+
+
+def content_hash(data):
+    """
+    SHA-1 of the form data of a record in a canonical form (sorted keys, stripped strings), ignoring the timestamp
+    'changed' which differs on every save.
+    """
+    data = _canonical(dict((key, value) for key, value in data.items() if key != 'changed'))
+    return hashlib.sha1(json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def unchanged(core, record_id, digest):
+    """
+    Whether the stored doc of record_id was saved from the same content (see content_hash).
+    """
+    if not record_id or ',' in record_id:
+        return False
+    docs = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                core=core).get(record_id, fields=['id', 'content_hash'])
+    return len(docs) > 0 and docs[0].get('content_hash') == digest
+
+
+def _phrase(value):
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def resolve_id(core, candidates, cache=False):
+    """
+    Find the doc an identifier belongs to with one query over all identifier fields of a core.
+
+    :param candidates: (field, value) pairs in order of priority
+    :return: (doc, field) of the best match or (None, None)
+
+    Every clause gets a constant score of twice the score of the next one, so the sum of all lower ranked clauses
+    never outweighs a higher ranked one: the top doc is the one the cascade of single queries would have found.
+    """
+    clauses = []
+    for idx, (field, value) in enumerate(candidates):
+        clauses.append('(%s:%s)^=%s' % (field, _phrase(value), 2 ** (len(candidates) - idx)))
+    query = '{!lucene q.op=OR}%s' % ' '.join(clauses)
+    resolve_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core=core,
+                        query=urllib.parse.quote(query, safe=''), rows=1, sort='score desc,_docid_ asc',
+                        facet='false', cache=cache)
+    resolve_solr.request()
+
+    if len(resolve_solr.results) == 0:
+        return None, None
+    doc = resolve_solr.results[0]
+    for field, value in candidates:
+        stored = doc.get(field)
+        if stored == value or (isinstance(stored, list) and value in stored):
+            return doc, field
+    # a match on an indexed-only value
+    return doc, None
+
+
+def lookup(core, value, candidates, cache=False):
+    """
+    Resolve an alternate identifier through the Redis id index, then through resolve_id() if the index is not
+    available, does not know the value or points to a doc that is gone. With cache=True only the cached
+    resolve_id() query is used, the index hit would be followed by an uncached real-time get.
+    """
+    if cache:
+        return resolve_id(core, candidates, cache=True)
+    record_id, field = id_index.resolve(core, value) or (None, None)
+    if record_id:
+        doc = get_by_id(core, record_id)
+        if doc:
+            return doc, field
+    return resolve_id(core, candidates, cache=cache)
+
+
+RESOLVE_BATCH_SIZE = getattr(secrets, 'RESOLVE_BATCH_SIZE', 500)
+
+
+def resolve_ids(core, values, cache=False):
+    """
+    Batch variant of get_person(), get_orga() and get_group(): resolve many identifiers with a single query of one
+    {!terms} clause per identifier field of the core (per RESOLVE_BATCH_SIZE identifiers) instead of one lookup per
+    identifier.
+
+    :return: dict value -> doc for all values found; a value matching several docs maps to the one the single
+             lookup would have returned, i.e. the first match in the order of id_index.FIELDS (persons: gnd, id,
+             dwid, orcid, same_as)
+    """
+    fields = list(id_index_module.FIELDS.get(core))
+    batch = []
+    seen = set()
+    found = {}
+    for value in values:
+        if not value or value in seen:
+            continue
+        seen.add(value)
+        if any(char in value for char in ',\'"\\'):
+            # cannot be passed in a terms list
+            doc, field = resolve_id(core, [(field, value) for field in fields], cache=cache)
+            if doc:
+                found[value] = doc
         else:
-            return get_request.results[0]
-    else:
-        return get_request.results[0]
-
-
-def get_person(person_id):
-    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, query='gnd:%s' % person_id, core='person',
-                       facet='false')
-    get_request.request()
-
-    if len(get_request.results) == 0:
-        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, query='id:%s' % person_id, core='person',
-                           facet='false')
-        get_request.request()
-
-        if len(get_request.results) == 0:
-            get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                               application=secrets.SOLR_APP, query='dwd:%s' % person_id, core='person',
-                               facet='false')
-            get_request.request()
-
-            if len(get_request.results) == 0:
-                get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                   application=secrets.SOLR_APP, query='orcid:%s' % person_id, core='person',
-                                   facet='false')
-                get_request.request()
-
-                if len(get_request.results) == 0:
-                    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                       application=secrets.SOLR_APP, query='same_as:%s' % person_id, core='person',
-                                       facet='false')
-                    get_request.request()
-
-                    if len(get_request.results) == 0:
-                        return None
+            batch.append(value)
+    # one query per RESOLVE_BATCH_SIZE identifiers, bulk_record2solr() etc. resolve those of many records at once
+    for start in range(0, len(batch), RESOLVE_BATCH_SIZE):
+        _resolve_batch(core, fields, batch[start:start + RESOLVE_BATCH_SIZE], found, cache)
+    return found
+
+
+def _resolve_batch(core, fields, batch, found, cache):
+    terms = ','.join(batch)
+    query = '{!lucene q.op=OR}%s' % ' '.join('_query_:"{!terms f=%s v=\'%s\'}"' % (field, terms) for field in fields)
+    resolve_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core=core,
+                        query=urllib.parse.quote(query, safe=''), rows=len(batch) * len(fields),
+                        sort='_docid_ asc', facet='false', cache=cache)
+    resolve_solr.request()
+
+    matches = {}
+    for doc in resolve_solr.results:
+        for field in fields:
+            stored = doc.get(field)
+            for value in stored if isinstance(stored, list) else [stored]:
+                matches.setdefault((field, value), doc)
+    for value in batch:
+        for field in fields:
+            if (field, value) in matches:
+                found[value] = matches.get((field, value))
+                break
+
+
+def get_work(work_id, with_field=False):
+    """
+    The hb2 doc for an id or any other identifier of a work. With with_field=True a tuple (doc, matched field).
+    """
+    result = get_by_id('hb2', work_id)
+    if result:
+        return (result, 'id') if with_field else result
+
+    result, field = lookup('hb2', work_id, [
+        ('id', work_id),
+        ('id', '%s/' % work_id),
+        ('same_as', work_id),
+        ('doi', urllib.parse.unquote_plus(work_id)),
+        ('pmid', work_id),
+        ('isi_id', work_id),
+        ('e_id', work_id),
+        ('orcid_put_code', work_id),
+    ])
+    return (result, field) if with_field else result
+
+
+def get_person(person_id, with_field=False):
+    # gnd before id: the ids of many persons are GNDs of others, and most lookups are by GND
+    result, field = lookup('person', person_id, [
+        ('gnd', person_id),
+        ('id', person_id),
+        ('dwid', person_id),
+        ('orcid', person_id),
+        ('same_as', person_id),
+    ])
+    return (result, field) if with_field else result
+
+
+def get_orga(orga_id, cache=False, with_field=False):
+    if not cache:
+        result = get_by_id('organisation', orga_id)
+        if result:
+            return (result, 'id') if with_field else result
+
+    result, field = lookup('organisation', orga_id, [
+        ('id', orga_id),
+        ('account', orga_id),
+        ('same_as', orga_id),
+    ], cache=cache)
+    return (result, field) if with_field else result
+
+
+def get_group(group_id, with_field=False):
+    result = get_by_id('group', group_id)
+    if result:
+        return (result, 'id') if with_field else result
+
+    result, field = lookup('group', group_id, [
+        ('id', group_id),
+        ('same_as', group_id),
+    ])
+    return (result, field) if with_field else result
+
+
+def prefetch_related(forms):
+    """
+    Resolve the persons, organisations and groups referred to by any number of works or persons with one query per
+    core, for record2solr(related=...) and person2solr(related=...).
+
+    :return: dict core -> dict identifier -> Solr doc
+    """
+    persons = []
+    orgas = []
+    groups = []
+    for form in forms:
+        persons.extend(person.get('gnd') for person in form.data.get('person') or [] if person.get('name'))
+        orgas.extend(corporation.get('gnd') for corporation in form.data.get('corporation') or []
+                     if corporation.get('name'))
+        orgas.extend(form.data.get('affiliation_context') or [])
+        groups.extend(form.data.get('group_context') or [])
+        # persons
+        orgas.extend(affiliation.get('organisation_id') for affiliation in form.data.get('affiliation') or [])
+        groups.extend(group.get('group_id') for group in form.data.get('group') or [])
+    return {'person': resolve_ids('person', persons), 'organisation': resolve_ids('organisation', orgas),
+            'group': resolve_ids('group', groups)}
+
+
+def _relation_ids(data):
+    # ids of the works related to a work as submitted
+    relations = {}
+    for relation in ('has_part', 'is_part_of', 'other_version'):
+        for entry in data.get(relation) or []:
+            if isinstance(entry, dict):
+                entry = entry.get(relation)
+            if entry and entry.strip():
+                relations.setdefault(relation, []).append(entry.strip())
+    return relations
+
+
+def link_relations(works, targets=None):
+    """
+    Link the works related to the given ones back, in the background by the relation worker (see _link_works).
+    Related works linked already only get the copies of the given work's data updated (see _propagate).
+
+    :param works: list of (id, has_part ids, is_part_of ids, other_version ids)
+    :param targets: the related works resolved by resolve_ids() already; by default one query for all works
+    :return: dict id -> messages about related works not found
+    """
+    if targets is None:
+        targets = resolve_ids('hb2', [record_id for work in works for record_ids in work[1:]
+                                      for record_id in record_ids])
+    messages = {}
+    for id, has_part, is_part_of, other_version in works:
+        linked = False
+        for relation, inverse, record_ids in [('has_part', 'is_part_of', has_part),
+                                              ('is_part_of', 'has_part', is_part_of),
+                                              ('other_version', 'other_version', other_version)]:
+            for record_id in record_ids:
+                result = targets.get(record_id)
+                if result:
+                    links = stored_fields.load(result).get(inverse) or []
+                    if any(link.get(inverse) == id for link in links):
+                        linked = True
                     else:
-                        return get_request.results[0]
+                        relation_jobs.enqueue('link', result.get('id'), op=[inverse, id], origin='work:%s' % id)
                 else:
-                    return get_request.results[0]
-            else:
-                return get_request.results[0]
-        else:
-            return get_request.results[0]
-    else:
-        return get_request.results[0]
-
-
-def get_orga(orga_id):
-    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, query='id:"%s"' % orga_id, core='organisation', facet='false')
-    get_request.request()
-
-    if len(get_request.results) == 0:
-        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, query='account:%s' % orga_id, core='organisation',
-                           facet='false')
-        get_request.request()
-
-        if len(get_request.results) == 0:
-            get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                               application=secrets.SOLR_APP, query='same_as:%s' % orga_id, core='organisation',
-                               facet='false')
-            get_request.request()
+                    messages.setdefault(id, []).append('ID from relation "%s" could not be found! Ref: %s' % (
+                        relation, record_id))
+        if linked:
+            relation_jobs.enqueue('denorm', 'hb2:%s' % id, op='work:%s' % id, origin='work:%s' % id)
+    return messages
 
-            if len(get_request.results) == 0:
-                return None
-            else:
-                return get_request.results[0]
-        else:
-            return get_request.results[0]
-    else:
-        return get_request.results[0]
-
-
-def get_group(group_id):
-    get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, query='id:%s' % group_id, core='group', facet='false')
-    get_request.request()
-
-    if len(get_request.results) == 0:
-
-        get_request = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, query='same_as:%s' % group_id, core='group',
-                           facet='false')
-        get_request.request()
-
-        if len(get_request.results) == 0:
-            return None
-        else:
-            return get_request.results[0]
-    else:
-        return get_request.results[0]
 
-
-def record2solr(form, action, relitems=True):
+# form is a WTForms form or, for writes which are not edits of a user, a forms.record.Record with the same data
+@phase_timer.timed('record2solr')
+def record2solr(form, action, relitems=True, commit=True, buffer=None, force=False, related=None, version=None):
 
     message = []
 
@@ -219,6 +346,8 @@ def record2solr(form, action, relitems=True):
     id = ''
     is_rubi = False
     is_tudo = False
+    # the hosts loaded for is_part_of are reused for CSL and OpenURL
+    resolver = HostResolver()
 
     # logger.info('FORM: %s' % form.data)
     if form.data.get('id'):
@@ -226,28 +355,27 @@ def record2solr(form, action, relitems=True):
         id = str(form.data.get('id').strip())
 
     # execution counter
-    r = redis.StrictRedis(host=secrets.REDIS_EXEC_COUNTER_HOST, port=secrets.REDIS_EXEC_COUNTER_PORT,
-                          db=secrets.REDIS_EXEC_COUNTER_DB)
-    if r.hexists('record2solr', 'total'):
-        cnt = int(r.hget('record2solr', 'total'))
-        cnt += 1
-        r.hset('record2solr', 'total', cnt)
-    else:
-        r.hset('record2solr', 'total', 1)
-
-    if r.hexists('record2solr', id):
-        cnt = int(r.hget('record2solr', id))
-        cnt += 1
-        r.hset('record2solr', id, cnt)
-    else:
-        r.hset('record2solr', id, 1)
-
-    # start process
-    start_total = timeit.default_timer()
-    logger.debug('Profiling: start')
-
-    logger.debug('Profiling: start fields')
-    start = timeit.default_timer()
+    exec_counters.count('record2solr', id)
+    phase_timer.tag(id=id, action=action, bulk=buffer is not None)
+
+    # nothing to do if the record is resubmitted unchanged; re-index jobs pass force, their changes are in the
+    # related records
+    digest = content_hash(form.data)
+    if not force and unchanged('hb2', id, digest):
+        message.append('No changes in %s: record not saved' % id)
+        phase_timer.tag(skipped=True)
+        return id, message
+    phase_timer.lap('check')
+
+    # resolve all related persons, organisations and groups up front: one query per core, unless prefetched for a
+    # batch of works (see bulk_record2solr)
+    if related is None:
+        related = prefetch_related([form])
+    related_persons = related.get('person')
+    related_orgas = related.get('organisation')
+    related_groups = related.get('group')
+    phase_timer.tag(persons=len(related_persons), organisations=len(related_orgas), groups=len(related_groups))
+    phase_timer.lap('related')
 
     for field in form.data:
         # logging.info('%s => %s' % (field, form.data.get(field)))
@@ -523,10 +651,10 @@ def record2solr(form, action, relitems=True):
                         solr_data.setdefault('pndid', []).append(
                             '%s' % person.get('gnd').strip())
                         # prüfe, ob eine 'person' mit GND im System ist.
-                        result = get_person(person.get('gnd'))
+                        result = related_persons.get(person.get('gnd'))
 
                         if result:
-                            myjson = json.loads(result.get('wtf_json'))
+                            myjson = stored_fields.load(result)
                             # TODO exists aka? then add more pnd-fields
                             # TODO allgemeiner?
                             for catalog in myjson.get('catalog'):
@@ -562,9 +690,9 @@ def record2solr(form, action, relitems=True):
                             '%s' % corporation.get('gnd').strip())
 
                         # prüfe, ob eine 'person' mit GND im System ist.
-                        result = get_orga(corporation.get('gnd'))
+                        result = related_orgas.get(corporation.get('gnd'))
                         if result:
-                            myjson = json.loads(result.get('wtf_json'))
+                            myjson = stored_fields.load(result)
                             # TODO allgemeiner?
                             for catalog in myjson.get('catalog'):
                                 if 'Bochum' in catalog:
@@ -596,10 +724,10 @@ def record2solr(form, action, relitems=True):
                 # logging.info(context)
                 if context:
 
-                    result = get_orga(context)
+                    result = related_orgas.get(context)
 
                     if result:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
                         solr_data.setdefault('fakultaet', []).append(
                             '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
                         solr_data.setdefault('affiliation_id', []).append(myjson.get('id'))
@@ -623,10 +751,10 @@ def record2solr(form, action, relitems=True):
                 # logging.info(context)
                 if context:
 
-                    result = get_group(context)
+                    result = related_groups.get(context)
 
                     if result:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
                         solr_data.setdefault('group_id', []).append(myjson.get('id'))
                         solr_data.setdefault('group', []).append(
                             '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
@@ -674,7 +802,8 @@ def record2solr(form, action, relitems=True):
                     if len(ipo_solr.results) == 0:
                         message.append('Not all IDs from relation "is part of" could be found! Ref: %s' % form.data.get('id'))
                     for doc in ipo_solr.results:
-                        myjson = json.loads(doc.get('wtf_json'))
+                        myjson = stored_fields.load(doc)
+                        resolver.add(myjson)
                         is_part_of.append(myjson.get('id'))
                         idx = ipo_index.get(myjson.get('id'))
                         title = myjson.get('title')
@@ -735,7 +864,7 @@ def record2solr(form, action, relitems=True):
                             message.append('Not all IDs from relation "has part" could be found! Ref: %s' % form.data.get(
                                             'id'))
                         for doc in hp_solr.results:
-                            myjson = json.loads(doc.get('wtf_json'))
+                            myjson = stored_fields.load(doc)
                             has_part.append(myjson.get('id'))
                             # logging.debug('PARTS: myjson.get(\'is_part_of\') = %s' % myjson.get('is_part_of'))
                             if len(myjson.get('is_part_of')) > 0:
@@ -776,8 +905,8 @@ def record2solr(form, action, relitems=True):
                         message.append('Not all IDs from relation "other version" could be found! Ref: %s' % form.data.get(
                                         'id'))
                     for doc in ov_solr.results:
-                        # logging.info(json.loads(doc.get('wtf_json')))
-                        myjson = json.loads(doc.get('wtf_json'))
+                        # logging.info(stored_fields.load(doc))
+                        myjson = stored_fields.load(doc)
                         other_version.append(myjson.get('id'))
                         solr_data.setdefault('other_version_id', []).append(myjson.get('id'))
                         solr_data.setdefault('other_version', []).append(json.dumps({'pubtype': myjson.get('pubtype'),
@@ -786,47 +915,40 @@ def record2solr(form, action, relitems=True):
             except AttributeError as e:
                 logging.error(e)
 
-    stop = timeit.default_timer()
-    fields = stop - start
-    logger.debug('Profiling: fields - %s' % fields)
+    phase_timer.lap('fields')
 
-    logger.debug('Profiling: start wtf_json')
-    start = timeit.default_timer()
     solr_data.setdefault('rubi', is_rubi)
     solr_data.setdefault('tudo', is_tudo)
 
     wtf_json = json.dumps(form.data).replace(' "', '"')
     solr_data.setdefault('wtf_json', wtf_json)
-    stop = timeit.default_timer()
-    wtf = stop - start
-    logger.debug('Profiling: wtf - %s' % wtf)
+    solr_data.setdefault('content_hash', digest)
+    phase_timer.lap('wtf_json')
 
     # build CSL-JSON
-    logger.debug('Profiling: start csl')
-    start = timeit.default_timer()
-    csl_json = json.dumps(wtf_csl.wtf_csl(wtf_records=[json.loads(wtf_json)]))
+    csl_json = json.dumps(wtf_csl.wtf_csl(wtf_records=[json.loads(wtf_json)], resolver=resolver))
     solr_data.setdefault('csl_json', csl_json)
-    stop = timeit.default_timer()
-    csl = stop - start
-    logger.debug('Profiling: csl - %s' % csl)
+    phase_timer.lap('csl')
 
     # build openurl
-    logger.debug('Profiling: start openurl')
-    start = timeit.default_timer()
-    open_url = openurl_processor.wtf_openurl(json.loads(wtf_json))
+    open_url = openurl_processor.wtf_openurl(json.loads(wtf_json), resolver=resolver)
     solr_data.setdefault('bibliographicCitation', open_url)
-    stop = timeit.default_timer()
-    z3988 = stop - start
-    logger.debug('Profiling: openurl - %s' % z3988)
+    phase_timer.lap('openurl')
 
     # store record
-    record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                       application=secrets.SOLR_APP, core='hb2', data=[solr_data])
-    record_solr.update()
-
-    stop = timeit.default_timer()
-    stored = stop - start_total
-    logger.debug('Profiling: self stored - %s' % stored)
+    if buffer is not None:
+        # the identifiers are indexed when the buffer has written the doc
+        buffer.add(solr_data, written=functools.partial(id_index.update, 'hb2', solr_data))
+    else:
+        if version:
+            # write only if nobody else has written the record since it was read: raises VersionConflict otherwise
+            solr_data['_version_'] = version
+        record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                           application=secrets.SOLR_APP, core='hb2', data=[solr_data],
+                           commit_within=0 if commit else COMMIT_WITHIN)
+        record_solr.update()
+        id_index.update('hb2', solr_data)
+    phase_timer.lap('store')
 
     # reload all records listed in has_part, is_part_of, other_version
     # logging.debug('relitems = %s' % relitems)
@@ -834,183 +956,7 @@ def record2solr(form, action, relitems=True):
     # logging.info('is_part_of: %s' % is_part_of)
     # logging.info('other_version: %s' % other_version)
     if relitems:
-        logger.debug('Profiling: start relitems')
-        start_relitems = timeit.default_timer()
-
-        for record_id in has_part:
-            logger.debug('Profiling: start get part - %s' % record_id)
-            start_part = timeit.default_timer()
-
-            # search record
-            result = get_work(record_id)
-
-            stop = timeit.default_timer()
-            duration = stop - start
-            logger.debug('Profiling: end get part - %s' % duration)
-
-            if result:
-                # lock record
-                logger.debug('Profiling: start lock part')
-                start = timeit.default_timer()
-                lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='hb2',
-                                        data=[{'id': record_id, 'locked': {'set': 'true'}}])
-                lock_record_solr.update()
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end lock part - %s' % duration)
-
-                # load record in form and modify changeDate
-                logger.debug('Profiling: start modify part')
-                start = timeit.default_timer()
-                thedata = json.loads(result.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-
-                # add is_part_of to form if not exists
-                exists = False
-                if form.data.get('is_part_of'):
-                    for ipo in form.data.get('is_part_of'):
-                        if ipo.get('is_part_of') == id:
-                            exists = True
-                            break
-                if not exists:
-                    is_part_of_form = IsPartOfForm()
-                    is_part_of_form.is_part_of.data = id
-                    form.is_part_of.append_entry(is_part_of_form.data)
-
-                # save record
-                try:
-                    form.changed.data = timestamp()
-                    record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    logger.error('linking from %s: %s' % (record_id, str(e)))
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end modify part - %s' % duration)
-
-                # unlock record
-                logger.debug('Profiling: start unlock part')
-                start = timeit.default_timer()
-                unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, core='hb2',
-                                          data=[{'id': record_id, 'locked': {'set': 'false'}}])
-                unlock_record_solr.update()
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end unlock part - %s' % duration)
-            else:
-                message.append('ID from relation "has_part" could not be found! Ref: %s' % record_id)
-
-            stop_part = timeit.default_timer()
-            duration = stop_part - start_part
-            logger.debug('Profiling: end part - %s' % duration)
-
-        for record_id in is_part_of:
-
-            logger.debug('Profiling: start get host')
-            start = timeit.default_timer()
-            result = get_work(record_id)
-            stop = timeit.default_timer()
-            duration = stop - start
-            logger.debug('Profiling: end get host - %s' % duration)
-
-            if result:
-                # TODO next steps only if record is not currently locked; put record_id in "do it later queue"
-                # or put the record_id to the end of the current queue
-                # TODO lock/unlock not necessary because the probability of inconsistency is minimal
-                # as a result of the automatic process
-                logger.debug('Profiling: start lock host')
-                start = timeit.default_timer()
-                lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='hb2',
-                                        data=[{'id': record_id, 'locked': {'set': 'true'}}])
-                lock_record_solr.update()
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end lock host - %s' % duration)
-
-                # load record in form and modify changeDate
-                logger.debug('Profiling: start modify host')
-                start = timeit.default_timer()
-                thedata = json.loads(result.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-
-                # add has_part to form
-                exists = False
-                if form.data.get('has_part'):
-                    for hpo in form.data.get('has_part'):
-                        if hpo.get('has_part') == id:
-                            exists = True
-                            break
-                if not exists:
-                    has_part_form = HasPartForm()
-                    has_part_form.has_part.data = id
-                    form.has_part.append_entry(has_part_form.data)
-
-                # save record
-                try:
-                    form.changed.data = timestamp()
-                    record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    logger.error('linking from %s: %s' % (record_id, str(e)))
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end modify host - %s' % duration)
-
-                # unlock record
-                logger.debug('Profiling: start unlock host')
-                start = timeit.default_timer()
-                unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, core='hb2',
-                                          data=[{'id': record_id, 'locked': {'set': 'false'}}])
-                unlock_record_solr.update()
-                stop = timeit.default_timer()
-                duration = stop - start
-                logger.debug('Profiling: end unlock host - %s' % duration)
-            else:
-                message.append('ID from relation "is_part_of" could not be found! Ref: %s' % record_id)
-
-        for record_id in other_version:
-
-            result = get_work(record_id)
-
-            if result:
-                # lock record
-                lock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, core='hb2',
-                                        data=[{'id': record_id, 'locked': {'set': 'true'}}])
-                lock_record_solr.update()
-
-                # load record in form and modify changeDate
-                thedata = json.loads(result.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-
-                # add is_part_of to form
-                exists = False
-                if form.data.get('other_version'):
-                    for ovo in form.data.get('other_version'):
-                        if ovo.get('other_version') == id:
-                            exists = True
-                            break
-                if not exists:
-                    other_version_form = OtherVersionForm()
-                    other_version_form.other_version.data = id
-                    form.other_version.append_entry(other_version_form.data)
-
-                # save record
-                try:
-                    form.changed.data = timestamp()
-                    record2solr(form, action='update', relitems=False)
-                except AttributeError as e:
-                    logger.error('linking from %s: %s' % (record_id, str(e)))
-
-                # unlock record
-                unlock_record_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                          application=secrets.SOLR_APP, core='hb2',
-                                          data=[{'id': record_id, 'locked': {'set': 'false'}}])
-                unlock_record_solr.update()
-            else:
-                message.append('ID from relation "other_version" could not be found! Ref: %s' % record_id)
+        message.extend(link_relations([(id, has_part, is_part_of, other_version)]).get(id, []))
 
         # TODO link all records as 'has_part' which has a 'same_as'-ID in 'is_part_of'
 
@@ -1018,22 +964,27 @@ def record2solr(form, action, relitems=True):
 
         # TODO link all records as 'other_version' which has a 'same_as'-ID in 'other_version'
 
-        stop_relitems = timeit.default_timer()
-        duration = stop_relitems - start_relitems
-        logger.debug('Profiling: end relitems - %s' % duration)
-
-    stop_total = timeit.default_timer()
-    duration = stop_total - start_total
-    logger.debug('Profiling: end - %s' % duration)
+        phase_timer.lap('relitems')
 
     return id, message
 
 
-def person2solr(form, action):
+@phase_timer.timed('person2solr')
+def person2solr(form, action, commit=True, buffer=None, force=False, related=None, version=None):
 
     message = []
     tmp = {}
 
+    exec_counters.count('person2solr', form.data.get('id'))
+    phase_timer.tag(id=form.data.get('id'), action=action, bulk=buffer is not None)
+
+    digest = content_hash(form.data)
+    if not force and unchanged('person', form.data.get('id'), digest):
+        message.append('No changes in %s: record not saved' % form.data.get('id'))
+        phase_timer.tag(skipped=True)
+        return action != 'create', form.data.get('id'), message
+    phase_timer.lap('check')
+
     if not form.data.get('editorial_status'):
         form.editorial_status.data = 'new'
 
@@ -1145,10 +1096,13 @@ def person2solr(form, action):
             for idx, affiliation in enumerate(form.data.get(field)):
                 if affiliation.get('organisation_id'):
 
-                    result = get_orga(affiliation.get('organisation_id'))
+                    if related is not None:
+                        result = related.get('organisation').get(affiliation.get('organisation_id'))
+                    else:
+                        result = get_orga(affiliation.get('organisation_id'))
 
                     if result:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
 
                         form.affiliation[idx].organisation_id.data = myjson.get('id').strip()
                         tmp.setdefault('affiliation_id', []).append(myjson.get('id').strip())
@@ -1170,10 +1124,13 @@ def person2solr(form, action):
             for idx, group in enumerate(form.data.get(field)):
                 if group.get('group_id'):
 
-                    result = get_group(group.get('group_id'))
+                    if related is not None:
+                        result = related.get('group').get(group.get('group_id'))
+                    else:
+                        result = get_group(group.get('group_id'))
 
                     if result:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
 
                         form.group[idx].group_id.data = myjson.get('id').strip()
                         tmp.setdefault('affiliation_id', []).append(group.get('group_id'))
@@ -1190,6 +1147,7 @@ def person2solr(form, action):
                 elif group.get('pref_label'):
                     tmp.setdefault('group', []).append(group.get('pref_label').strip())
                     tmp.setdefault('fgroup', []).append(group.get('pref_label').strip())
+    phase_timer.lap('fields')
 
     doit = False
     if action == 'create':
@@ -1204,9 +1162,12 @@ def person2solr(form, action):
 
     # logging.info('new_id: %s for %s' % (new_id, form.data.get('id')))
     # logging.info('doit: %s for %s' % (doit, form.data.get('id')))
+    phase_timer.lap('exists')
 
     if doit:
         if new_id != form.data.get('id'):
+            # a new record replaces the one read
+            version = None
             form.same_as.append_entry(form.data.get('id'))
             tmp.setdefault('same_as', []).append(form.data.get('id'))
             # delete record with current id
@@ -1214,15 +1175,25 @@ def person2solr(form, action):
                 delete_person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                           application=secrets.SOLR_APP, core='person', del_id=form.data.get('id'))
                 delete_person_solr.delete()
+                id_index.remove('person', form.data.get('id'))
             except AttributeError as e:
                 logging.error(e)
             form.id.data = new_id
         tmp.setdefault('id', new_id)
         wtf_json = json.dumps(form.data)
         tmp.setdefault('wtf_json', wtf_json)
-        person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='person', data=[tmp])
-        person_solr.update()
+        tmp.setdefault('content_hash', digest)
+        if buffer is not None:
+            buffer.add(tmp, written=functools.partial(id_index.update, 'person', tmp))
+        else:
+            if version:
+                tmp['_version_'] = version
+            person_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                               application=secrets.SOLR_APP, core='person', data=[tmp],
+                               commit_within=0 if commit else COMMIT_WITHIN)
+            person_solr.update()
+            id_index.update('person', tmp)
+        phase_timer.lap('store')
 
     # TODO for all works linked with the current GND-ID, add the ORCID iD
     # TODO for all works linked with the current GND-ID, add the rubi/tudo checkbox
@@ -1231,7 +1202,9 @@ def person2solr(form, action):
     return doit, new_id, message
 
 
-def orga2solr(form, action, relitems=True, getchildren=False):
+@phase_timer.timed('orga2solr')
+def orga2solr(form, action, relitems=True, getchildren=False, commit=True, buffer=None, deferred=None,
+              version=None):
 
     message = []
 
@@ -1242,6 +1215,15 @@ def orga2solr(form, action, relitems=True, getchildren=False):
 
     id = form.data.get('id').strip()
     logging.info('ID: %s' % id)
+    exec_counters.count('orga2solr', id)
+    phase_timer.tag(id=id, action=action, bulk=buffer is not None)
+    digest = content_hash(form.data)
+    if unchanged('organisation', id, digest):
+        message.append('No changes in %s: record not saved' % id)
+        phase_timer.tag(skipped=True)
+        return id, message
+    previous = get_by_id('organisation', id) if relitems else None
+    phase_timer.lap('check')
     dwid = form.data.get('dwid')
     logging.info('DWID: %s' % dwid)
 
@@ -1305,7 +1287,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                 # print('Treffer für %s: %s' % (parent.get('id'), result))
                 if result:
                     try:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
                         label = myjson.get('pref_label').strip()
                         tmp['parent_label'] = label
                         tmp['fparent'] = '%s#%s' % (myjson.get('id').strip(), label)
@@ -1333,7 +1315,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
 
                             if result:
                                 try:
-                                    myjson = json.loads(result.get('wtf_json'))
+                                    myjson = stored_fields.load(result)
                                     label = myjson.get('pref_label').strip()
                                     form.children[idx].child_label.data = label
                                     tmp.setdefault('children', []).append(
@@ -1349,7 +1331,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
 
                                 if result:
                                     try:
-                                        myjson = json.loads(result.get('wtf_json'))
+                                        myjson = stored_fields.load(result)
                                         label = myjson.get('pref_label').strip()
                                         form.children[idx].child_label.data = label
                                         tmp.setdefault('children', []).append(json.dumps({'id': myjson.get('id').strip(),
@@ -1381,7 +1363,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
 
                             if result:
                                 try:
-                                    myjson = json.loads(result.get('wtf_json'))
+                                    myjson = stored_fields.load(result)
                                     label = myjson.get('pref_label').strip()
                                     form.projects[idx].project_label.data = label
                                     tmp.setdefault('projects', []).append(json.dumps({'id': myjson.get('id').strip(),
@@ -1393,6 +1375,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                                 message.append('IDs from relation "projects" could not be found! Ref: %s' % project.get('project_id'))
                         elif project.get('project_label'):
                             tmp.setdefault('fprojects', []).append(project.get('project_label').strip())
+    phase_timer.lap('fields')
 
     # case: gnd deleted
     del_id = ''
@@ -1422,6 +1405,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
         delete_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                 application=secrets.SOLR_APP, core='organisation', del_id=del_id)
         delete_orga_solr.delete()
+        id_index.remove('organisation', del_id)
 
     # get existing children from index
     search_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
@@ -1437,10 +1421,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                     exists = True
                     break
             if not exists:
-                childform = ChildForm()
-                childform.child_id.data = result.get('id')
-                childform.child_label.data = result.get('pref_label')
-                form.children.append_entry(childform.data)
+                form.children.append_entry({'child_id': result.get('id'), 'child_label': result.get('pref_label')})
 
     for dwid in form.data.get('dwid'):
         search_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
@@ -1456,10 +1437,7 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                         exists = True
                         break
                 if not exists:
-                    childform = ChildForm()
-                    childform.child_id.data = result.get('id')
-                    childform.child_label.data = result.get('pref_label')
-                    form.children.append_entry(childform.data)
+                    form.children.append_entry({'child_id': result.get('id'), 'child_label': result.get('pref_label')})
 
     for same_as in form.data.get('same_as'):
         search_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
@@ -1475,10 +1453,8 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                         exists = True
                         break
                 if not exists:
-                    childform = ChildForm()
-                    childform.child_id.data = result.get('id')
-                    childform.child_label.data = result.get('pref_label')
-                    form.children.append_entry(childform.data)
+                    form.children.append_entry({'child_id': result.get('id'), 'child_label': result.get('pref_label')})
+    phase_timer.lap('children')
 
     # save record to index
     try:
@@ -1495,11 +1471,14 @@ def orga2solr(form, action, relitems=True, getchildren=False):
                                facet='false')
             get_request.request()
 
+            # the record read is replaced by another one
+            version = None
             if len(get_request.results) == 0:
 
                 delete_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                         application=secrets.SOLR_APP, core='organisation', del_id=id)
                 delete_orga_solr.delete()
+                id_index.remove('organisation', id)
                 form.same_as.append_entry(id)
                 tmp.setdefault('id', form.data.get('id'))
                 tmp.setdefault('same_as', []).append(id)
@@ -1512,220 +1491,44 @@ def orga2solr(form, action, relitems=True, getchildren=False):
         # build json
         wtf_json = json.dumps(form.data)
         tmp.setdefault('wtf_json', wtf_json)
+        tmp.setdefault('content_hash', digest)
         # logging.info(tmp)
-        orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                         application=secrets.SOLR_APP, core='organisation', data=[tmp])
-        orga_solr.update()
+        if buffer is not None:
+            buffer.add(tmp, written=functools.partial(id_index.update, 'organisation', tmp))
+        else:
+            if version:
+                tmp['_version_'] = version
+            orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                             application=secrets.SOLR_APP, core='organisation', data=[tmp],
+                             commit_within=0 if commit else COMMIT_WITHIN)
+            orga_solr.update()
+            id_index.update('organisation', tmp)
     except AttributeError as e:
         logging.error(e)
+    phase_timer.lap('store')
 
     same_as = form.data.get('same_as')
+    dwids = form.data.get('dwid') or []
+    cascade = denormalisation.cascade('organisation', previous, id, form.data)
+    old_label = stored_fields.load(previous).get('pref_label') if cascade == 'update' else None
     # logging.info('same_as: %s' % same_as)
 
     logging.info('children: %s' % children)
 
     # add link to parent
     if relitems:
-        # logging.info('parents: %s' % parents)
-        for parent_id in parents:
-            # search record
-            result = get_orga(parent_id)
-
-            # load orga in form and modify changeDate
-            if result:
-                # edit
-                try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add child to form if not exists
-                    exists = False
-                    for child in form.data.get('children'):
-                        # logging.info('%s == %s ?' % (project.get('child_id'), id))
-                        if child.get('child_id'):
-                            if child.get('child_id') == id:
-                                exists = True
-                                break
-                            elif child.get('child_id') in dwid:
-                                exists = True
-                                break
-                            elif child.get('child_id') in same_as:
-                                exists = True
-                                break
-                    if not exists:
-                        childform = ChildForm()
-                        childform.child_id.data = id
-                        form.children.append_entry(childform.data)
-
-                    # save record
-                    try:
-                        form.changed.data = timestamp()
-                        orga2solr(form, action='update', relitems=False)
-                    except AttributeError as e:
-                        logging.error('linking from %s: %s' % (parent_id, str(e)))
-
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % result.get('wtf_json'))
-            else:
-                logging.info('Currently there is no record for parent_id %s!' % parent_id)
-
-        # logging.info('children: %s' % children)
-        for child_id in children:
-            # search record
-            result = get_orga(child_id)
-
-            # load orga in form and modify changeDate
-            if result:
-                # edit
-                try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add parent to form if not exists
-                    if not form.data.get('parent'):
-                        parentform = ParentForm()
-                        parentform.parent_id = id
-                        form.parent.append_entry(parentform.data)
-                    else:
-                        form.parent[0].parent_id = id
-
-                    # save record
-                    try:
-                        form.changed.data = timestamp()
-                        orga2solr(form, action='update', relitems=False)
-                    except AttributeError as e:
-                        logging.error('linking from %s: %s' % (child_id, str(e)))
-
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % result.get('wtf_json'))
-            else:
-                result = get_group(child_id)
-
-                # load orga in form and modify changeDate
-                if result:
-                    # edit
-                    try:
-                        thedata = json.loads(result.get('wtf_json'))
-                        form = GroupAdminForm.from_json(thedata)
-                        # add parent to form if not exists
-                        if not form.data.get('parent'):
-                            parentform = ParentForm()
-                            parentform.parent_id = id
-                            form.parent.append_entry(parentform.data)
-                        else:
-                            form.parent[0].parent_id = id
-
-                        # save record
-                        try:
-                            form.changed.data = timestamp()
-                            group2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            logging.error('linking from %s: %s' % (child_id, str(e)))
-
-                    except TypeError as e:
-                        logging.error(e)
-                        logging.error('thedata: %s' % result.get('wtf_json'))
-                else:
-                    logging.info('Currently there is no record for child_id %s!' % child_id)
-
-        # logging.debug('partners: %s' % partners)
-        for project_id in projects:
-            # search record
-            result = get_group(project_id)
-
-            # load orga in form and modify changeDate
-            if result:
-                # edit
-                try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = GroupAdminForm.from_json(thedata)
-                    # add project to form if not exists
-                    exists = False
-                    for partner in form.data.get('partners'):
-                        # logging.info('%s == %s ?' % (project.get('project_id'), id))
-                        if partner.get('partner_id'):
-                            if partner.get('partner_id') == id:
-                                exists = True
-                                break
-                            elif partner.get('partner_id') in same_as:
-                                exists = True
-                                break
-                    # logging.debug('exists? %s' % exists)
-                    if not exists:
-                        partnerform = PartnerForm()
-                        partnerform.partner_id.data = id
-                        form.partners.append_entry(partnerform.data)
-
-                    # save record
-                    try:
-                        form.changed.data = timestamp()
-                        group2solr(form, action='update', relitems=False)
-                    except AttributeError as e:
-                        logging.error('ERROR linking from %s: %s' % (project_id, str(e)))
-
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % result.get('wtf_json'))
-            else:
-                logging.info('Currently there is no record for project_id %s!' % project_id)
-
-        # store work records again
-        works_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                          application=secrets.SOLR_APP, core='hb2',
-                          query='affiliation_id:%s' % id, facet=False, rows=500000)
-        works_solr.request()
-
-        for work in works_solr.results:
-            # edit
-            try:
-                thedata = json.loads(work.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-                form.changed.data = timestamp()
-                record2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % work.get('wtf_json'))
-
-        # store person records again
-        results = []
-        persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='person',
-                            query='affiliation_id:%s' % id, facet=False, rows=500000)
-        persons_solr.request()
-        if len(persons_solr.results) > 0:
-            results.append(persons_solr.results)
-        for entry in dwid:
-            persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                application=secrets.SOLR_APP, core='person',
-                                query='affiliation_id:%s' % entry, facet=False, rows=500000)
-            persons_solr.request()
-            if len(persons_solr.results) > 0:
-                results += persons_solr.results
-        for entry in same_as:
-            persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                application=secrets.SOLR_APP, core='person',
-                                query='affiliation_id:%s' % entry, facet=False, rows=500000)
-            persons_solr.request()
-            if len(persons_solr.results) > 0:
-                results += persons_solr.results
-
-        for person in results:
-            # edit
-            try:
-                thedata = json.loads(person.get('wtf_json'))
-                form = PersonAdminForm.from_json(thedata)
-                form.changed.data = timestamp()
-                person2solr(form, action='update')
-            except TypeError as e:
-                logging.error(e)
-                logging.error('thedata: %s' % person.get('wtf_json'))
-            except AttributeError as e:
-                logging.error(e)
+        relations = (id, parents, children, projects, same_as, dwids, cascade, old_label)
+        if deferred is not None:
+            deferred.append(relations)
+        else:
+            _orga_relations(*relations)
+        phase_timer.lap('relitems')
 
     return id, message
 
 
-def group2solr(form, action, relitems=True):
+@phase_timer.timed('group2solr')
+def group2solr(form, action, relitems=True, commit=True, buffer=None, deferred=None, version=None):
 
     message = []
 
@@ -1735,6 +1538,15 @@ def group2solr(form, action, relitems=True):
     partners = []
 
     id = form.data.get('id').strip()
+    exec_counters.count('group2solr', id)
+    phase_timer.tag(id=id, action=action, bulk=buffer is not None)
+    digest = content_hash(form.data)
+    if unchanged('group', id, digest):
+        message.append('No changes in %s: record not saved' % id)
+        phase_timer.tag(skipped=True)
+        return id, message
+    previous = get_by_id('group', id) if relitems else None
+    phase_timer.lap('check')
     # logging.info('ID: %s' % id)
 
     if not form.data.get('editorial_status'):
@@ -1802,7 +1614,7 @@ def group2solr(form, action, relitems=True):
                 result = get_group(parent.get('parent_id'))
 
                 if result:
-                    myjson = json.loads(result.get('wtf_json'))
+                    myjson = stored_fields.load(result)
                     tmp.setdefault('parent_type', 'group')
                     tmp.setdefault('parent_label', myjson.get('pref_label'))
                     tmp.setdefault('fparent', '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
@@ -1811,7 +1623,7 @@ def group2solr(form, action, relitems=True):
                     result = get_orga(parent.get('parent_id'))
 
                     if result:
-                        myjson = json.loads(result.get('wtf_json'))
+                        myjson = stored_fields.load(result)
                         tmp.setdefault('parent_type', 'organisation')
                         tmp.setdefault('parent_label', myjson.get('pref_label'))
                         tmp.setdefault('fparent', '%s#%s' % (myjson.get('id'), myjson.get('pref_label')))
@@ -1837,7 +1649,7 @@ def group2solr(form, action, relitems=True):
                             result = get_group(child.get('child_id'))
 
                             if result:
-                                myjson = json.loads(result.get('wtf_json'))
+                                myjson = stored_fields.load(result)
                                 label = myjson.get('pref_label').strip()
                                 form.children[idx].child_label.data = label
                                 tmp.setdefault('children', []).append(json.dumps({'id': myjson.get('id'),
@@ -1864,7 +1676,7 @@ def group2solr(form, action, relitems=True):
                             result = get_orga(partner.get('partner_id'))
 
                             if result:
-                                myjson = json.loads(result.get('wtf_json'))
+                                myjson = stored_fields.load(result)
                                 label = myjson.get('pref_label').strip()
                                 form.partners[idx].partner_label.data = label
                                 tmp.setdefault('partners', []).append(json.dumps({'id': myjson.get('id'),
@@ -1877,6 +1689,7 @@ def group2solr(form, action, relitems=True):
                         elif partner.get('partner_label'):
                             tmp.setdefault('partners', []).append(partner.get('partner_label'))
                             tmp.setdefault('fpartners', []).append(partner.get('partner_label'))
+    phase_timer.lap('fields')
 
     # case: gnd deleted
     del_id = ''
@@ -1906,14 +1719,18 @@ def group2solr(form, action, relitems=True):
         delete_orga_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                 application=secrets.SOLR_APP, core='group', del_id=del_id)
         delete_orga_solr.delete()
+        id_index.remove('group', del_id)
 
     # save record to index
     try:
         # logging.info('%s vs. %s' % (id, form.data.get('id')))
         if id != form.data.get('id'):
+            # the record read is replaced by another one
+            version = None
             delete_group_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
                                      application=secrets.SOLR_APP, core='group', del_id=id)
             delete_group_solr.delete()
+            id_index.remove('group', id)
             form.same_as.append_entry(id)
             tmp.setdefault('id', form.data.get('id'))
             tmp.setdefault('same_as', []).append(id)
@@ -1924,209 +1741,579 @@ def group2solr(form, action, relitems=True):
         # build json
         wtf_json = json.dumps(form.data)
         tmp.setdefault('wtf_json', wtf_json)
+        tmp.setdefault('content_hash', digest)
         # logging.info(tmp)
-        groups_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                           application=secrets.SOLR_APP, core='group', data=[tmp])
-        groups_solr.update()
+        if buffer is not None:
+            buffer.add(tmp, written=functools.partial(id_index.update, 'group', tmp))
+        else:
+            if version:
+                tmp['_version_'] = version
+            groups_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                               application=secrets.SOLR_APP, core='group', data=[tmp],
+                               commit_within=0 if commit else COMMIT_WITHIN)
+            groups_solr.update()
+            id_index.update('group', tmp)
     except AttributeError as e:
         logging.error(e)
+    phase_timer.lap('store')
 
     same_as = form.data.get('same_as')
+    cascade = denormalisation.cascade('group', previous, id, form.data)
+    old_label = stored_fields.load(previous).get('pref_label') if cascade == 'update' else None
     # logging.info('same_as: %s' % same_as)
 
     # add links to related entities
     if relitems:
-        # logging.debug('parents: %s' % parents)
-        for parent_id in parents:
-            # search record
-            result = get_orga(parent_id)
+        relations = (id, parents, children, partners, same_as, cascade, old_label)
+        if deferred is not None:
+            deferred.append(relations)
+        else:
+            _group_relations(*relations)
+        phase_timer.lap('relitems')
 
-            # load orga in form and modify changeDate
-            if result:
-                # logging.info('IS ORGA')
+    return id, message
+
+
+def _orga_relations(id, parents, children, projects, same_as, dwids, cascade, old_label=None):
+    """
+    Link the parents, children and projects of an organisation back to it and queue the updates of the works and
+    persons copying its data; part of orga2solr(relitems=True).
+    """
+    # logging.info('parents: %s' % parents)
+    for parent_id in parents:
+        # search record
+        result = get_orga(parent_id)
+
+        # load orga in form and modify changeDate
+        if result:
+            # edit
+            try:
+                thedata = stored_fields.load(result)
+                form = Record(OrgaAdminForm, thedata)
+                # add child to form if not exists
+                exists = False
+                for child in form.data.get('children'):
+                    # logging.info('%s == %s ?' % (project.get('child_id'), id))
+                    if child.get('child_id'):
+                        if child.get('child_id') == id:
+                            exists = True
+                            break
+                        elif child.get('child_id') in dwids:
+                            exists = True
+                            break
+                        elif child.get('child_id') in same_as:
+                            exists = True
+                            break
+                if not exists:
+                    form.children.append_entry({'child_id': id})
+
+                # save record
                 try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add child to form if not exists
-                    exists = False
-                    for child in form.data.get('children'):
-                        if child.get('child_id'):
-                            # logging.info('%s == %s ?' % (child.get('child_id'), id))
-                            if child.get('child_id') == id:
-                                exists = True
-                                break
-                            elif child.get('child_id') in same_as:
-                                exists = True
-                                break
-                    if not exists:
-                        childform = ChildForm()
-                        childform.child_id.data = id
-                        form.children.append_entry(childform.data)
+                    form.changed.data = timestamp()
+                    orga2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('linking from %s: %s' % (parent_id, str(e)))
 
-                    # save record
-                    try:
-                        form.changed.data = timestamp()
-                        orga2solr(form, action='update', relitems=False)
-                    except AttributeError as e:
-                        logging.error('linking from %s: %s' % (parent_id, str(e)))
+            except TypeError as e:
+                logging.error(e)
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
+            logging.info('Currently there is no record for parent_id %s!' % parent_id)
 
-                except TypeError as e:
-                    logging.error(e)
-                    logging.error('thedata: %s' % result.get('wtf_json'))
-            else:
-                result = get_group(parent_id)
+    # logging.info('children: %s' % children)
+    for child_id in children:
+        # search record
+        result = get_orga(child_id)
 
-                # load group in form and modify changeDate
-                if result:
-                    # logging.info('IS GROUP')
-                    try:
-                        thedata = json.loads(result.get('wtf_json'))
-                        form = GroupAdminForm.from_json(thedata)
-                        # add child to form if not exists
-                        exists = False
-                        for child in form.data.get('children'):
-                            if child.get('child_id'):
-                                # logging.info('%s == %s ?' % (child.get('child_id'), id))
-                                if child.get('child_id') == id:
-                                    exists = True
-                                    break
-                                elif child.get('child_id') in same_as:
-                                    exists = True
-                                    break
-                        if not exists:
-                            childform = ChildForm()
-                            childform.child_id.data = id
-                            form.children.append_entry(childform.data)
-
-                        # save record
-                        # logging.info('children in form of %s : %s' % (parent_id, form.data.get('children')))
-                        try:
-                            form.changed.data = timestamp()
-                            group2solr(form, action='update', relitems=False)
-                        except AttributeError as e:
-                            logging.error('linking from %s: %s' % (parent_id, str(e)))
-
-                    except TypeError as e:
-                        logging.error(e)
-                        logging.error('thedata: %s' % result.get('wtf_json'))
+        # load orga in form and modify changeDate
+        if result:
+            # edit
+            try:
+                thedata = stored_fields.load(result)
+                form = Record(OrgaAdminForm, thedata)
+                # add parent to form if not exists
+                if not form.data.get('parent'):
+                    form.parent.append_entry({'parent_id': id})
                 else:
-                    logging.info('Currently there is no record for parent_id %s!' % parent_id)
+                    form.parent[0].parent_id.data = id
 
-        # logging.debug('children: %s' % children)
-        for child_id in children:
-            # search record
+                # save record
+                try:
+                    form.changed.data = timestamp()
+                    orga2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('linking from %s: %s' % (child_id, str(e)))
+
+            except TypeError as e:
+                logging.error(e)
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
             result = get_group(child_id)
 
             # load orga in form and modify changeDate
             if result:
+                # edit
                 try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = GroupAdminForm.from_json(thedata)
+                    thedata = stored_fields.load(result)
+                    form = Record(GroupAdminForm, thedata)
                     # add parent to form if not exists
                     if not form.data.get('parent'):
-                        parentform = ParentForm()
-                        parentform.parent_id = id
-                        form.parent.append_entry(parentform.data)
+                        form.parent.append_entry({'parent_id': id})
                     else:
-                        form.parent[0].parent_id = id
+                        form.parent[0].parent_id.data = id
 
                     # save record
                     try:
                         form.changed.data = timestamp()
-                        group2solr(form, action='update', relitems=False)
+                        group2solr(form, action='update', relitems=False, commit=False)
                     except AttributeError as e:
-                        logging.error('linking from %s: %s' % (parent_id, str(e)))
+                        logging.error('linking from %s: %s' % (child_id, str(e)))
+
                 except TypeError as e:
                     logging.error(e)
                     logging.error('thedata: %s' % result.get('wtf_json'))
             else:
                 logging.info('Currently there is no record for child_id %s!' % child_id)
 
-        # logging.debug('partners: %s' % partners)
-        for partner_id in partners:
-            # search record
-            result = get_orga(partner_id)
+    # logging.debug('partners: %s' % partners)
+    for project_id in projects:
+        # search record
+        result = get_group(project_id)
 
-            # load orga in form and modify changeDate
+        # load orga in form and modify changeDate
+        if result:
+            # edit
+            try:
+                thedata = stored_fields.load(result)
+                form = Record(GroupAdminForm, thedata)
+                # add project to form if not exists
+                exists = False
+                for partner in form.data.get('partners'):
+                    # logging.info('%s == %s ?' % (project.get('project_id'), id))
+                    if partner.get('partner_id'):
+                        if partner.get('partner_id') == id:
+                            exists = True
+                            break
+                        elif partner.get('partner_id') in same_as:
+                            exists = True
+                            break
+                # logging.debug('exists? %s' % exists)
+                if not exists:
+                    form.partners.append_entry({'partner_id': id})
+
+                # save record
+                try:
+                    form.changed.data = timestamp()
+                    group2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('ERROR linking from %s: %s' % (project_id, str(e)))
+
+            except TypeError as e:
+                logging.error(e)
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
+            logging.info('Currently there is no record for project_id %s!' % project_id)
+
+    # update the work and person records copying data of the organisation: in the background, by the relation
+    # worker, either the copied fields only (see _propagate) or a full re-index (see _reindex_related)
+    origin = 'organisation:%s' % id
+    if cascade == 'update':
+        relation_jobs.enqueue('denorm', 'organisation:%s' % id, op=old_label, origin=origin)
+    elif cascade == 'reindex':
+        relation_jobs.enqueue('related', 'hb2:affiliation_id:%s' % id, op=origin, origin=origin)
+        relation_jobs.enqueue_many('related', ['person:affiliation_id:%s' % entry
+                                               for entry in [id] + dwids + same_as], op=origin, origin=origin)
+
+
+def _group_relations(id, parents, children, partners, same_as, cascade, old_label=None):
+    """
+    Link the parents, children and partners of a group back to it and queue the updates of the works and persons
+    copying its data; part of group2solr(relitems=True).
+    """
+    # logging.debug('parents: %s' % parents)
+    for parent_id in parents:
+        # search record
+        result = get_orga(parent_id)
+
+        # load orga in form and modify changeDate
+        if result:
+            # logging.info('IS ORGA')
+            try:
+                thedata = stored_fields.load(result)
+                form = Record(OrgaAdminForm, thedata)
+                # add child to form if not exists
+                exists = False
+                for child in form.data.get('children'):
+                    if child.get('child_id'):
+                        # logging.info('%s == %s ?' % (child.get('child_id'), id))
+                        if child.get('child_id') == id:
+                            exists = True
+                            break
+                        elif child.get('child_id') in same_as:
+                            exists = True
+                            break
+                if not exists:
+                    form.children.append_entry({'child_id': id})
+
+                # save record
+                try:
+                    form.changed.data = timestamp()
+                    orga2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('linking from %s: %s' % (parent_id, str(e)))
+
+            except TypeError as e:
+                logging.error(e)
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
+            result = get_group(parent_id)
+
+            # load group in form and modify changeDate
             if result:
+                # logging.info('IS GROUP')
                 try:
-                    thedata = json.loads(result.get('wtf_json'))
-                    form = OrgaAdminForm.from_json(thedata)
-                    # add project to form if not exists
+                    thedata = stored_fields.load(result)
+                    form = Record(GroupAdminForm, thedata)
+                    # add child to form if not exists
                     exists = False
-                    for project in form.data.get('projects'):
-                        # logging.info('%s == %s ?' % (project.get('project_id'), id))
-                        if project.get('project_id'):
-                            if project.get('project_id') == id:
+                    for child in form.data.get('children'):
+                        if child.get('child_id'):
+                            # logging.info('%s == %s ?' % (child.get('child_id'), id))
+                            if child.get('child_id') == id:
                                 exists = True
                                 break
-                            elif project.get('project_id') in same_as:
+                            elif child.get('child_id') in same_as:
                                 exists = True
                                 break
-                    # logging.debug('exists? %s' % exists)
                     if not exists:
-                        projectmemberform = ProjectMemberForm()
-                        projectmemberform.project_id.data = id
-                        form.projects.append_entry(projectmemberform.data)
-                    else:
-                        form.changed.data = timestamp()
+                        form.children.append_entry({'child_id': id})
 
                     # save record
+                    # logging.info('children in form of %s : %s' % (parent_id, form.data.get('children')))
                     try:
                         form.changed.data = timestamp()
-                        orga2solr(form, action='update', relitems=False)
+                        group2solr(form, action='update', relitems=False, commit=False)
                     except AttributeError as e:
-                        logging.error('ERROR linking from %s: %s' % (partner_id, str(e)))
+                        logging.error('linking from %s: %s' % (parent_id, str(e)))
 
                 except TypeError as e:
                     logging.error(e)
                     logging.error('thedata: %s' % result.get('wtf_json'))
             else:
-                logging.info('Currently there is no record for partner_id %s!' % partner_id)
+                logging.info('Currently there is no record for parent_id %s!' % parent_id)
 
-        # store work records again
-        works_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                          application=secrets.SOLR_APP, core='hb2',
-                          query='group_id:%s' % id, facet=False, rows=500000)
-        works_solr.request()
+    # logging.debug('children: %s' % children)
+    for child_id in children:
+        # search record
+        result = get_group(child_id)
 
-        for work in works_solr.results:
+        # load orga in form and modify changeDate
+        if result:
             try:
-                thedata = json.loads(work.get('wtf_json'))
-                form = display_vocabularies.PUBTYPE2FORM.get(thedata.get('pubtype')).from_json(thedata)
-                form.changed.data = timestamp()
-                record2solr(form, action='update')
+                thedata = stored_fields.load(result)
+                form = Record(GroupAdminForm, thedata)
+                # add parent to form if not exists
+                if not form.data.get('parent'):
+                    form.parent.append_entry({'parent_id': id})
+                else:
+                    form.parent[0].parent_id.data = id
+
+                # save record
+                try:
+                    form.changed.data = timestamp()
+                    group2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('linking from %s: %s' % (parent_id, str(e)))
             except TypeError as e:
                 logging.error(e)
-                logging.error('thedata: %s' % work.get('wtf_json'))
-
-        # store person records again
-        results = []
-        persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                            application=secrets.SOLR_APP, core='person',
-                            query='group_id:%s' % id, facet=False, rows=500000)
-        persons_solr.request()
-        if len(persons_solr.results) > 0:
-            results += persons_solr.results
-
-        for entry in same_as:
-            persons_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                application=secrets.SOLR_APP, core='person',
-                                query='group_id:%s' % entry, facet=False, rows=500000)
-            persons_solr.request()
-            if len(persons_solr.results) > 0:
-                results += persons_solr.results
-
-        for person in results:
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
+            logging.info('Currently there is no record for child_id %s!' % child_id)
+
+    # logging.debug('partners: %s' % partners)
+    for partner_id in partners:
+        # search record
+        result = get_orga(partner_id)
+
+        # load orga in form and modify changeDate
+        if result:
             try:
-                thedata = json.loads(person.get('wtf_json'))
-                form = PersonAdminForm.from_json(thedata)
-                form.changed.data = timestamp()
-                person2solr(form, action='update')
+                thedata = stored_fields.load(result)
+                form = Record(OrgaAdminForm, thedata)
+                # add project to form if not exists
+                exists = False
+                for project in form.data.get('projects'):
+                    # logging.info('%s == %s ?' % (project.get('project_id'), id))
+                    if project.get('project_id'):
+                        if project.get('project_id') == id:
+                            exists = True
+                            break
+                        elif project.get('project_id') in same_as:
+                            exists = True
+                            break
+                # logging.debug('exists? %s' % exists)
+                if not exists:
+                    form.projects.append_entry({'project_id': id})
+                else:
+                    form.changed.data = timestamp()
+
+                # save record
+                try:
+                    form.changed.data = timestamp()
+                    orga2solr(form, action='update', relitems=False, commit=False)
+                except AttributeError as e:
+                    logging.error('ERROR linking from %s: %s' % (partner_id, str(e)))
+
             except TypeError as e:
                 logging.error(e)
-                logging.error('thedata: %s' % person.get('wtf_json'))
-            except AttributeError as e:
-                logging.error(e)
+                logging.error('thedata: %s' % result.get('wtf_json'))
+        else:
+            logging.info('Currently there is no record for partner_id %s!' % partner_id)
 
-    return id, message
+    # update the work and person records copying data of the group: in the background, by the relation worker,
+    # either the copied fields only (see _propagate) or a full re-index (see _reindex_related)
+    origin = 'group:%s' % id
+    if cascade == 'update':
+        relation_jobs.enqueue('denorm', 'group:%s' % id, op=old_label, origin=origin)
+    elif cascade == 'reindex':
+        relation_jobs.enqueue('related', 'hb2:group_id:%s' % id, op=origin, origin=origin)
+        relation_jobs.enqueue_many('related', ['person:group_id:%s' % entry for entry in [id] + same_as],
+                                   op=origin, origin=origin)
+
+
+def _bulk_buffer(core, batch_size):
+    return SolrWriteBuffer(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP, core=core,
+                           batch_size=batch_size or getattr(secrets, 'BULK_BATCH_SIZE', 500), max_age=0)
+
+
+def _bulk_flush(buffer):
+    """
+    Write the rest of a bulk buffer and wait for it.
+
+    :return: set of the ids of the docs in batches Solr rejected
+    """
+    try:
+        buffer.flush(wait=True)
+    except SolrError as e:
+        logger.error('bulk indexing: %s' % e)
+    return set(op[1].get('id') for op in buffer.failed if op[0] == 'add')
+
+
+def _not_indexed(record_id):
+    return ['Record could not be indexed! Ref: %s' % record_id]
+
+
+def bulk_record2solr(forms, action='create', relitems=True, batch_size=None):
+    """
+    Index many works (e.g. an import): the related persons, organisations and groups of all of them are resolved
+    up front with one query per core, the docs are sent batch_size at a time with a single commit at the end, and
+    the works related to them are linked back in a second pass over the whole batch.
+
+    :return: list of (id, message) in the order of forms
+    """
+    related = prefetch_related(forms)
+    results = []
+    with _bulk_buffer('hb2', batch_size) as buffer:
+        for form in forms:
+            try:
+                results.append(record2solr(form, action, relitems=False, commit=False, buffer=buffer,
+                                           related=related))
+            except (AttributeError, TypeError) as e:
+                logger.error('bulk indexing %s: %s' % (form.data.get('id'), str(e)))
+                results.append((form.data.get('id'), _not_indexed(form.data.get('id'))))
+        failed = _bulk_flush(buffer)
+    results = [(id, _not_indexed(id)) if id in failed else (id, message) for id, message in results]
+
+    if relitems:
+        works = []
+        for form, (id, message) in zip(forms, results):
+            if id in failed:
+                continue
+            relations = _relation_ids(form.data)
+            works.append((id, relations.get('has_part', []), relations.get('is_part_of', []),
+                          relations.get('other_version', [])))
+        targets = resolve_ids('hb2', [record_id for work in works for record_ids in work[1:]
+                                      for record_id in record_ids])
+        messages = link_relations(works, targets=targets)
+        # works related to others of the same batch did not find them when they were indexed
+        ids = set(work[0] for work in works)
+        for work in works:
+            if any(targets.get(record_id, {}).get('id') in ids for record_ids in work[1:] for record_id in record_ids):
+                relation_jobs.enqueue('work', work[0], origin='work:%s' % work[0])
+        for id, message in results:
+            message.extend(messages.get(id, []))
+
+    return results
+
+
+def bulk_person2solr(forms, action='create', batch_size=None):
+    """
+    Index many persons: their organisations and groups are resolved up front with one query per core and the docs
+    are sent batch_size at a time with a single commit at the end.
+
+    :return: list of (doit, id, message) in the order of forms
+    """
+    related = prefetch_related(forms)
+    results = []
+    with _bulk_buffer('person', batch_size) as buffer:
+        for form in forms:
+            try:
+                results.append(person2solr(form, action, commit=False, buffer=buffer, related=related))
+            except (AttributeError, TypeError) as e:
+                logger.error('bulk indexing %s: %s' % (form.data.get('id'), str(e)))
+                results.append((False, form.data.get('id'), _not_indexed(form.data.get('id'))))
+        failed = _bulk_flush(buffer)
+    return [(False, id, _not_indexed(id)) if id in failed else (doit, id, message) for doit, id, message in results]
+
+
+def bulk_orga2solr(forms, action='create', relitems=True, batch_size=None):
+    """
+    Index many organisations batch_size at a time with a single commit at the end. Their parents, children and
+    projects are linked back in a second pass, when the whole batch can be found.
+
+    :return: list of (id, message) in the order of forms
+    """
+    results = []
+    deferred = []
+    with _bulk_buffer('organisation', batch_size) as buffer:
+        for form in forms:
+            try:
+                results.append(orga2solr(form, action, relitems=relitems, commit=False, buffer=buffer,
+                                         deferred=deferred))
+            except (AttributeError, TypeError) as e:
+                logger.error('bulk indexing %s: %s' % (form.data.get('id'), str(e)))
+                results.append((form.data.get('id'), _not_indexed(form.data.get('id'))))
+        failed = _bulk_flush(buffer)
+    for relations in deferred:
+        if relations[0] not in failed:
+            _orga_relations(*relations)
+    return [(id, _not_indexed(id)) if id in failed else (id, message) for id, message in results]
+
+
+def bulk_group2solr(forms, action='create', relitems=True, batch_size=None):
+    """
+    Index many groups batch_size at a time with a single commit at the end. Their parents, children and partners
+    are linked back in a second pass, when the whole batch can be found.
+
+    :return: list of (id, message) in the order of forms
+    """
+    results = []
+    deferred = []
+    with _bulk_buffer('group', batch_size) as buffer:
+        for form in forms:
+            try:
+                results.append(group2solr(form, action, relitems=relitems, commit=False, buffer=buffer,
+                                          deferred=deferred))
+            except (AttributeError, TypeError) as e:
+                logger.error('bulk indexing %s: %s' % (form.data.get('id'), str(e)))
+                results.append((form.data.get('id'), _not_indexed(form.data.get('id'))))
+        failed = _bulk_flush(buffer)
+    for relations in deferred:
+        if relations[0] not in failed:
+            _group_relations(*relations)
+    return [(id, _not_indexed(id)) if id in failed else (id, message) for id, message in results]
+
+
+# relation maintenance jobs, worked off by bin/relation_worker.py (or a thread of the process without Redis)
+
+
+def _flush_jobs(buffer):
+    """
+    Write the rest of the docs of a job handler. A batch rejected by Solr fails the jobs, so that the queue runs
+    them again and finally counts them as failed.
+    """
+    buffer.flush()
+    if buffer.stats.get('errors'):
+        raise SolrError('%s of %s batches to core %s failed' % (buffer.stats.get('errors'),
+                                                                 buffer.stats.get('batches'), buffer.core))
+
+
+@relation_jobs.handler('link')
+def _link_works(jobs):
+    """
+    Add the inverse links of a work to the records it is related to. jobs: {record id: [[relation, id], ...]}
+    """
+    works_buffer = SolrWriteBuffer(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                   application=secrets.SOLR_APP, core='hb2')
+    works = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                 core='hb2').get(list(jobs))
+    for work in works:
+        try:
+            thedata = stored_fields.load(work)
+            form = Record.work(thedata)
+            for relation, related_id in jobs.get(work.get('id')):
+                exists = False
+                for entry in form.data.get(relation) or []:
+                    if entry.get(relation) == related_id:
+                        exists = True
+                        break
+                if not exists:
+                    getattr(form, relation).append_entry({relation: related_id})
+            form.changed.data = timestamp()
+            record2solr(form, action='update', relitems=False, commit=False, buffer=works_buffer, force=True)
+        except (AttributeError, TypeError) as e:
+            logger.error('linking %s: %s' % (work.get('id'), str(e)))
+    _flush_jobs(works_buffer)
+    if len(works) < len(jobs):
+        logger.warning('linking: records gone: %s' % (set(jobs) - set(work.get('id') for work in works)))
+
+
+@relation_jobs.handler('related')
+def _reindex_related(jobs):
+    """
+    Queue the re-indexing of all works or persons referring to an organisation or group.
+    jobs: {'<core>:<field>:<id>': [origin, ...]}
+    """
+    for target in jobs:
+        core, field, value = target.split(':', 2)
+        related_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                            core=core, query='%s:%s' % (field, _phrase(value)), facet='false')
+        ids = [doc.get('id') for doc in related_solr.iter_export(fields=['id'])]
+        for origin in jobs.get(target):
+            relation_jobs.enqueue_many('work' if core == 'hb2' else 'person', ids, origin=origin)
+
+
+@relation_jobs.handler('denorm')
+def _propagate(jobs):
+    """
+    Update the fields copying data of changed records with atomic updates. jobs: {'<core>:<id>': [op, ...]}, the
+    ops of organisations and groups are their pref_labels before renaming them
+    """
+    for target in jobs:
+        core, record_id = target.split(':', 1)
+        old_labels = [op for op in jobs.get(target) if op and core in ('organisation', 'group')]
+        updated = denormalisation.propagate(core, record_id, old_labels=old_labels, host=secrets.SOLR_HOST,
+                                            port=secrets.SOLR_PORT, application=secrets.SOLR_APP)
+        logger.info('propagated %s %s to %s records' % (core, record_id, updated))
+
+
+@relation_jobs.handler('work')
+def _reindex_works(jobs):
+    works_buffer = SolrWriteBuffer(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                   application=secrets.SOLR_APP, core='hb2')
+    for work in Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                     core='hb2').get(list(jobs)):
+        try:
+            thedata = stored_fields.load(work)
+            form = Record.work(thedata)
+            form.changed.data = timestamp()
+            record2solr(form, action='update', relitems=False, commit=False, buffer=works_buffer, force=True)
+        except (AttributeError, TypeError) as e:
+            logger.error('re-indexing %s: %s' % (work.get('id'), str(e)))
+    _flush_jobs(works_buffer)
+
+
+@relation_jobs.handler('person')
+def _reindex_persons(jobs):
+    persons_buffer = SolrWriteBuffer(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
+                                     application=secrets.SOLR_APP, core='person')
+    for person in Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                       core='person').get(list(jobs)):
+        try:
+            thedata = stored_fields.load(person)
+            form = Record(PersonAdminForm, thedata)
+            form.changed.data = timestamp()
+            person2solr(form, action='update', commit=False, buffer=persons_buffer, force=True)
+        except (AttributeError, TypeError) as e:
+            logger.error('re-indexing %s: %s' % (person.get('id'), str(e)))
+    _flush_jobs(persons_buffer)
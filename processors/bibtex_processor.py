@@ -23,16 +23,9 @@
 import logging
 
 import bibtexparser
-import simplejson as json
 from bibtexparser.bibdatabase import BibDatabase
 
-from utils.solr_handler import Solr
-
-try:
-    import app_secrets
-    import local_app_secrets as secrets
-except ImportError:
-    import app_secrets
+from processors.host_resolver import HostResolver
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s %(levelname)-4s %(message)s',
@@ -61,13 +54,16 @@ BIBTEX_PUBTYPES = {
 }
 
 
-def wtf_bibtex(wtf_records=None):
+def wtf_bibtex(wtf_records=None, resolver=None):
 
     # logging.info('wtf_records: %s' % wtf_records)
     if wtf_records is None:
         wtf_records = []
 
     if len(wtf_records) > 0:
+        if resolver is None:
+            resolver = HostResolver()
+        resolver.prefetch(wtf_records)
 
         db = BibDatabase()
         db.entries = []
@@ -118,12 +114,8 @@ def wtf_bibtex(wtf_records=None):
             for host in hosts:
                 if host.get('is_part_of') != '':
                     try:
-                        ipo_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, query='id:%s' % host.get('is_part_of'),
-                                        facet='false', fields=['wtf_json'])
-                        ipo_solr.request()
-                        if len(ipo_solr.results) > 0:
-                            myjson = json.loads(ipo_solr.results[0].get('wtf_json'))
+                        myjson = resolver.get(host.get('is_part_of'))
+                        if myjson:
                             title = myjson.get('title')
                             if myjson.get('subtitle'):
                                 title += ': %s' % myjson.get('subtitle')
@@ -0,0 +1,150 @@
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import logging
+import urllib.parse
+
+import simplejson as json
+
+from utils import stored_fields
+from utils.solr_handler import Solr, query_cache
+
+try:
+    import local_p_secrets as secrets
+except ImportError:
+    import p_secrets as secrets
+
+BATCH_SIZE = getattr(secrets, 'RESOLVE_BATCH_SIZE', 500)
+
+
+class HostResolver(object):
+    """
+    The wtf_json of the hosts (is_part_of) of works, for wtf_csl(), wtf_openurl(), wtf_bibtex() and wtf_orcid().
+
+    prefetch() resolves the hosts of a batch of records with one {!terms f=id} query per BATCH_SIZE ids, get()
+    looks up hosts not prefetched one by one. Hosts (and hosts not found) are kept for the lifetime of the
+    resolver, so create one per request and pass it to all processors called for it:
+
+        resolver = HostResolver(records, cache=True)
+        csl = wtf_csl.wtf_csl(records, resolver=resolver)
+        coins = [openurl_processor.wtf_openurl(record, resolver=resolver) for record in records]
+
+    With cache=True hosts are also kept across requests in utils.solr_handler.query_cache, i.e. for its TTL and
+    until the next write to hb2.
+    """
+    def __init__(self, records=None, cache=False):
+        self.cache = cache
+        self.stats = {'hosts': 0, 'queries': 0, 'cached': 0}
+        self._hosts = {}
+        if records:
+            self.prefetch(records)
+
+    @staticmethod
+    def host_ids(records):
+        ids = []
+        for record in records:
+            for host in record.get('is_part_of') or []:
+                if isinstance(host, dict):
+                    host = host.get('is_part_of')
+                if host and host.strip() and host.strip() not in ids:
+                    ids.append(host.strip())
+        return ids
+
+    @staticmethod
+    def _cache_key(host_id):
+        return query_cache.key('hosts', 'id=%s' % host_id)
+
+    def add(self, record):
+        """
+        Remember a host loaded elsewhere, e.g. by record2solr().
+        """
+        if record and record.get('id'):
+            self._hosts[record.get('id')] = record
+
+    def prefetch(self, records):
+        """
+        Resolve the hosts of records which are not known yet.
+        """
+        ids = [host_id for host_id in self.host_ids(records) if host_id not in self._hosts]
+        if self.cache:
+            missing = []
+            for host_id in ids:
+                body = query_cache.get('hb2', self._cache_key(host_id))
+                if body is not None:
+                    self._hosts[host_id] = json.loads(body)
+                    self.stats['cached'] += 1
+                else:
+                    missing.append(host_id)
+            ids = missing
+        batch = []
+        for host_id in ids:
+            if any(char in host_id for char in ',\'"\\'):
+                # cannot be passed in a terms list
+                self._fetch('id:"%s"' % host_id.replace('\\', '\\\\').replace('"', '\\"'), [host_id])
+            else:
+                batch.append(host_id)
+        for start in range(0, len(batch), BATCH_SIZE):
+            ids = batch[start:start + BATCH_SIZE]
+            self._fetch('{!terms f=id}%s' % ','.join(ids), ids)
+
+    def _fetch(self, query, ids):
+        host_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application=secrets.SOLR_APP,
+                         query=urllib.parse.quote(query, safe=''), rows=len(ids), facet='false',
+                         fields=['id', 'wtf_json'])
+        host_solr.request()
+        self.stats['queries'] += 1
+        for doc in host_solr.results:
+            try:
+                record = stored_fields.load(doc)
+            except TypeError as e:
+                logging.error('HostResolver: %s: %s' % (doc.get('id'), e))
+                continue
+            self._hosts[doc.get('id')] = record
+            self.stats['hosts'] += 1
+            if self.cache:
+                query_cache.set('hb2', self._cache_key(doc.get('id')), json.dumps(record))
+        for host_id in ids:
+            self._hosts.setdefault(host_id, None)
+
+    def decode_lists(self, chunks):
+        """
+        Decode the wtf_json of the results of chunks of queries (see utils.solr_handler.solr_gather_chunks()) and
+        yield them list by list, query by query, resolving the hosts of each chunk together. Only one chunk is
+        decoded at a time.
+        """
+        for chunk in chunks:
+            lists = [[stored_fields.load(doc) for doc in query.results] for query in chunk]
+            del chunk
+            self.prefetch([record for records in lists for record in records])
+            for records in lists:
+                yield records
+
+    def get(self, host_id):
+        """
+        :return: the wtf_json of a host or None if there is no work with that id
+        """
+        if not host_id or not host_id.strip():
+            return None
+        host_id = host_id.strip()
+        if host_id not in self._hosts:
+            self.prefetch([{'is_part_of': [host_id]}])
+        return self._hosts.get(host_id)
@@ -26,14 +26,7 @@
 import logging
 from urllib import parse
 
-import simplejson as json
-
-from utils.solr_handler import Solr
-
-try:
-    import local_p_secrets as secrets
-except ImportError:
-    import p_secrets as secrets
+from processors.host_resolver import HostResolver
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s %(levelname)-4s %(message)s',
@@ -94,7 +87,7 @@ OPENURL_GENRE = {
 }
 
 
-def wtf_openurl(record=None):
+def wtf_openurl(record=None, resolver=None):
 
     open_url = 'ctx_ver=Z39.88-2004'
 
@@ -122,15 +115,14 @@ def wtf_openurl(record=None):
             open_url += '&rft.au=%s' % parse.quote(person.get('name'), 'utf8')
 
         if record.get('is_part_of') and record.get('is_part_of')[0] and record.get('is_part_of')[0].get('is_part_of'):
+            if resolver is None:
+                resolver = HostResolver()
+            resolver.prefetch([record])
             for host in record.get('is_part_of'):
                 if host.get('is_part_of'):
                     try:
-                        ipo_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, query='id:%s' % host.get('is_part_of'),
-                                        facet='false', fields=['wtf_json'])
-                        ipo_solr.request()
-                        if len(ipo_solr.results) > 0:
-                            myjson = json.loads(ipo_solr.results[0].get('wtf_json'))
+                        myjson = resolver.get(host.get('is_part_of'))
+                        if myjson:
                             if myjson.get('pubtype') == 'journal':
                                 open_url += '&rft.jtitle=%s' % parse.quote(myjson.get('title'), 'utf-8')
                                 open_url += '&rft.issn=%s' % parse.quote(myjson.get('ISSN')[0], 'utf-8')
@@ -23,14 +23,7 @@
 import logging
 import uuid
 
-import simplejson as json
-
-from utils.solr_handler import Solr
-
-try:
-    import local_p_secrets as secrets
-except ImportError:
-    import p_secrets as secrets
+from processors.host_resolver import HostResolver
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s %(levelname)-4s %(message)s',
@@ -87,7 +80,7 @@ WTF_PUBTYPES = {
 }
 
 
-def wtf_csl(wtf_records=None):
+def wtf_csl(wtf_records=None, resolver=None):
     csl_records = []
 
     # logging.info('wtf_records: %s' % wtf_records)
@@ -95,6 +88,9 @@ def wtf_csl(wtf_records=None):
         wtf_records = []
 
     if len(wtf_records) > 0:
+        if resolver is None:
+            resolver = HostResolver(cache=True)
+        resolver.prefetch(wtf_records)
         for record in wtf_records:
             # logging.info('record: %s' % record)
             hosts = []
@@ -161,12 +157,8 @@ def wtf_csl(wtf_records=None):
                 # container
                 if host.get('is_part_of') != '':
                     try:
-                        ipo_solr = Solr(host=secrets.SOLR_HOST, port=secrets.SOLR_PORT,
-                                        application=secrets.SOLR_APP, query='id:%s' % host.get('is_part_of'),
-                                        facet='false', fields=['wtf_json'])
-                        ipo_solr.request()
-                        if len(ipo_solr.results) > 0:
-                            myjson = json.loads(ipo_solr.results[0].get('wtf_json'))
+                        myjson = resolver.get(host.get('is_part_of'))
+                        if myjson:
                             if myjson.get('pubtype') != 'Series':
                                 title = myjson.get('title')
                                 if myjson.get('subtitle'):
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Fields of works and persons which copy data of other records (see persistence.record2solr/person2solr) and the
+atomic updates keeping them in line when only that data changes, instead of re-indexing every referring record.
+"""
+
+import logging
+
+import simplejson as json
+
+from utils import stored_fields
+from utils.solr_handler import Solr, SolrError, SolrWriteBuffer
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+
+def _replace_entries(doc, field, old_entries, entry):
+    # 'id#label' entries of a record
+    values = doc.get(field) or []
+    new = [entry if value in old_entries else value for value in values]
+    return new if new != values else None
+
+
+def _orga_entries(fields):
+    # only the entries with an old label of the record: corporations of works are 'gnd#name', and the gnd may be
+    # the id of the record
+    def rewrite(doc, record, old_labels):
+        changes = {}
+        entry = '%s#%s' % (record.get('id'), record.get('pref_label'))
+        old_entries = ['%s#%s' % (record.get('id'), label) for label in old_labels]
+        for field in fields:
+            new = _replace_entries(doc, field, old_entries, entry)
+            if new is not None:
+                changes[field] = new
+        return changes
+    return rewrite
+
+
+def _person_labels(relation, id_field, fields):
+    # wtf_json of a person keeps the label of its organisations and groups, the label fields are built from it
+    def rewrite(doc, record, old_labels):
+        data = stored_fields.load(doc)
+        label = record.get('pref_label').strip()
+        replaced = set()
+        for entry in data.get(relation) or []:
+            if entry.get(id_field) == record.get('id') and entry.get('pref_label') != label:
+                replaced.add(entry.get('pref_label'))
+                entry['pref_label'] = label
+        if not replaced:
+            return {}
+        changes = {'wtf_json': json.dumps(data)}
+        for field in fields:
+            changes[field] = [label if value in replaced else value for value in doc.get(field) or []]
+        return changes
+    return rewrite
+
+
+def _snippets(field, build):
+    # JSON snippets of related works, e.g. is_part_of: '{"pubtype": ..., "id": ..., "title": ..., "volume": ...}'
+    def rewrite(doc, record, old_labels):
+        values = doc.get(field) or []
+        new = []
+        for value in values:
+            snippet = json.loads(value)
+            if snippet.get('id') == record.get('id'):
+                snippet = build(snippet, doc, record)
+                if snippet is None:
+                    continue
+                value = json.dumps(snippet)
+            new.append(value)
+        if new == values:
+            return {}
+        changes = {field: new}
+        if len(new) < len(values):
+            changes['%s_id' % field] = [json.loads(value).get('id') for value in new]
+        return changes
+    return rewrite
+
+
+def _host_snippet(snippet, doc, record):
+    title = record.get('title')
+    if record.get('subseries'):
+        title = '%s / %s' % (title, record.get('subseries'))
+    snippet.update({'pubtype': record.get('pubtype'), 'title': title, 'issn': record.get('issn'),
+                    'isbn': record.get('isbn')})
+    return snippet
+
+
+def _part_snippet(snippet, doc, record):
+    for host in record.get('is_part_of') or []:
+        if host.get('is_part_of') == doc.get('id'):
+            snippet.update({'pubtype': record.get('pubtype'), 'title': record.get('title'),
+                            'page_first': host.get('page_first', ''), 'page_last': host.get('page_last', ''),
+                            'volume': host.get('volume', ''), 'issue': host.get('issue', '')})
+            return snippet
+    # the part is no longer linked to this host
+    return None
+
+
+def _version_snippet(snippet, doc, record):
+    snippet.update({'pubtype': record.get('pubtype'), 'title': record.get('title')})
+    return snippet
+
+
+# core of the changed record -> (core of the copies, field referring to the record, fields copied, rewrite), the
+# rewrite gets the doc with the copied fields, the wtf_json of the record and the labels the record had before and
+# returns the fields to set
+DENORMALISED = {
+    'organisation': [
+        ('hb2', 'affiliation_id', ['fakultaet', 'frubi_orga', 'ftudo_orga'],
+         _orga_entries(['fakultaet', 'frubi_orga', 'ftudo_orga'])),
+        ('person', 'affiliation_id', ['wtf_json', 'affiliation', 'faffiliation'],
+         _person_labels('affiliation', 'organisation_id', ['affiliation', 'faffiliation'])),
+    ],
+    'group': [
+        ('hb2', 'group_id', ['group', 'frubi_orga', 'ftudo_orga'],
+         _orga_entries(['group', 'frubi_orga', 'ftudo_orga'])),
+        # persons refer to their groups by affiliation_id, too
+        ('person', 'affiliation_id', ['wtf_json', 'group', 'fgroup'],
+         _person_labels('group', 'group_id', ['group', 'fgroup'])),
+    ],
+    'hb2': [
+        ('hb2', 'is_part_of_id', ['is_part_of', 'is_part_of_id'], _snippets('is_part_of', _host_snippet)),
+        ('hb2', 'has_part_id', ['has_part', 'has_part_id'], _snippets('has_part', _part_snippet)),
+        ('hb2', 'other_version_id', ['other_version', 'other_version_id'],
+         _snippets('other_version', _version_snippet)),
+    ],
+}
+
+# fields of the wtf_json of a record which are copied by others, and those which need a full re-index of the others
+# because more than the copied fields depend on them (the rubi/tudo flags of works)
+COPIED = {
+    'organisation': ('pref_label',),
+    'group': ('pref_label',),
+}
+REINDEX = {
+    'organisation': ('catalog',),
+    'group': ('catalog',),
+}
+
+
+def cascade(core, previous, record_id, data):
+    """
+    What saving a record means for the records copying its data: None (nothing copied has changed), 'update'
+    (propagate() the copied fields) or 'reindex' (new or renamed record, changes beyond the copied fields).
+
+    :param previous: the Solr doc of the record before saving it
+    :param data: the form data saved
+    """
+    if previous is None or previous.get('id') != record_id:
+        return 'reindex'
+    old = stored_fields.load(previous)
+    if any(old.get(field) != data.get(field) for field in REINDEX.get(core, ())):
+        return 'reindex'
+    if any(old.get(field) != data.get(field) for field in COPIED.get(core, ())):
+        return 'update'
+    return None
+
+
+def propagate(core, record_id, old_labels=(), host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application='solr'):
+    """
+    Set the copied fields of all docs referring to a record to the current data of the record with atomic updates,
+    sent in batches. Docs already in line are not written.
+
+    Atomic updates need all copyField destinations of the target cores to be stored="false", see the schemas of
+    hb2 and person.
+
+    :param old_labels: the pref_labels of an organisation or group before it was renamed
+    :return: number of docs updated
+    :raises SolrError: if Solr rejected a batch of updates
+    """
+    docs = Solr(host=host, port=port, application=application, core=core).get(record_id)
+    if not docs:
+        logging.warning('propagate: %s %s not found' % (core, record_id))
+        return 0
+    record = stored_fields.load(docs[0])
+    updated = 0
+    for target_core, field, fields, rewrite in DENORMALISED.get(core, []):
+        refs = Solr(host=host, port=port, application=application, core=target_core,
+                    query='%s:"%s"' % (field, record_id.replace('\\', '\\\\').replace('"', '\\"')), facet='false')
+        with SolrWriteBuffer(host=host, port=port, application=application, core=target_core) as buffer:
+            for doc in refs.iter_export(fields=['id'] + fields):
+                if doc.get('id') == record_id:
+                    continue
+                changes = rewrite(doc, record, old_labels)
+                if changes:
+                    buffer.set_fields(doc.get('id'), **changes)
+                    updated += 1
+        if buffer.stats.get('errors'):
+            raise SolrError('propagate: %s of %s batches to core %s failed for %s %s' % (
+                buffer.stats.get('errors'), buffer.stats.get('batches'), target_core, core, record_id))
+    return updated
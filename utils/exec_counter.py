@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+
+import atexit
+import logging
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+
+class ExecCounter(object):
+    """
+    How often functions like persistence.record2solr() ran, in total and per record: one hash per function with the
+    fields 'total' and '<id>'.
+
+    Increments are summed up in the process and written with one pipeline of HINCRBY when flush_size increments are
+    pending or the oldest is older than flush_interval seconds, and at exit. All threads share one connection pool.
+    Without a Redis URL the counters are kept in memory of the process.
+    """
+    def __init__(self, redis_url='', flush_size=500, flush_interval=10.0):
+        self.redis_url = redis_url
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._redis = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._since = None
+        self._memory = {}
+        atexit.register(self.flush)
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.StrictRedis(connection_pool=redis.ConnectionPool.from_url(self.redis_url))
+        return self._redis
+
+    def count(self, name, *keys):
+        """
+        Count a call of name, for the total and for each of keys (e.g. the id of the record).
+        """
+        with self._lock:
+            counters = self._pending.setdefault(name, {})
+            for key in ('total',) + tuple(str(key) for key in keys if key):
+                counters[key] = counters.get(key, 0) + 1
+            if self._since is None:
+                self._since = time.time()
+            due = (sum(len(counters) for counters in self._pending.values()) >= self.flush_size or
+                   time.time() - self._since >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending increments.
+
+        :return: number of counters written
+        """
+        with self._lock:
+            pending, self._pending, self._since = self._pending, {}, None
+        if not pending:
+            return 0
+        written = sum(len(counters) for counters in pending.values())
+        if self.redis is None:
+            with self._lock:
+                for name, counters in pending.items():
+                    totals = self._memory.setdefault(name, {})
+                    for key, value in counters.items():
+                        totals[key] = totals.get(key, 0) + value
+            return written
+        pipe = self.redis.pipeline(transaction=False)
+        for name, counters in pending.items():
+            for key, value in counters.items():
+                pipe.hincrby(name, key, value)
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            # counters are statistics: the increments are dropped rather than piling up while Redis is down
+            logging.error('ExecCounter: %s increments lost: %s' % (written, e))
+            return 0
+        return written
+
+    def read(self, limit=100, batch_size=1000):
+        """
+        The counters of up to limit functions, walking the keys with SCAN instead of KEYS.
+
+        :return: dict name -> [(key, count), ...] by count descending
+        """
+        self.flush()
+        if self.redis is None:
+            with self._lock:
+                counters = dict((name, dict(values)) for name, values in list(self._memory.items())[:limit])
+        else:
+            counters = {}
+            try:
+                for name in self.redis.scan_iter(count=batch_size):
+                    if len(counters) >= limit:
+                        break
+                    if self.redis.type(name) != b'hash':
+                        continue
+                    counters[name.decode('utf-8')] = dict(
+                        (key.decode('utf-8'), int(value))
+                        for key, value in self.redis.hscan_iter(name, count=batch_size))
+            except redis.RedisError as e:
+                logging.error('ExecCounter: %s' % e)
+        return dict((name, sorted(values.items(), key=lambda item: item[1], reverse=True))
+                    for name, values in counters.items())
+
+
+exec_counters = ExecCounter(redis_url=getattr(secrets, 'REDIS_EXEC_COUNTER_URL', ''),
+                            flush_size=getattr(secrets, 'EXEC_COUNTER_FLUSH_SIZE', 500),
+                            flush_interval=getattr(secrets, 'EXEC_COUNTER_FLUSH_INTERVAL', 10.0))
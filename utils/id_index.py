@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import logging
+import urllib.parse
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+# identifier fields per core in the order persistence.get_work() etc. try them
+FIELDS = {
+    'hb2': ('id', 'same_as', 'doi', 'pmid', 'isi_id', 'e_id', 'orcid_put_code'),
+    'person': ('gnd', 'id', 'dwid', 'orcid', 'same_as'),
+    'organisation': ('id', 'account', 'same_as'),
+    'group': ('id', 'same_as'),
+}
+
+# replace the keys owned by a doc: keys it no longer has are dropped unless another doc has claimed them meanwhile
+_UPDATE = """
+local old = redis.call('SMEMBERS', KEYS[2])
+for _, key in ipairs(old) do
+    if redis.call('HGET', KEYS[1], key) == ARGV[1] then
+        redis.call('HDEL', KEYS[1], key)
+    end
+end
+redis.call('DEL', KEYS[2])
+for i = 2, #ARGV do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[1])
+    redis.call('SADD', KEYS[2], ARGV[i])
+end
+return #ARGV - 1
+"""
+
+
+class IdIndex(object):
+    """
+    Maps the alternate identifiers of works, persons, organisations and groups (GND, DWD account, ORCID, same_as,
+    DOI, PMID, WOS UID, Scopus EID, ORCID put-code) to the id of their Solr doc.
+
+    Per core there is one hash '<prefix>:<core>' with fields '<field>:<value>' and the canonical id as value, and
+    per doc a set '<prefix>:<core>:doc:<id>' of the hash fields it owns. update() and remove() run as one Lua script,
+    so readers never see a half updated doc. Without a Redis URL or with Redis unavailable all methods return None
+    and the callers fall back to Solr.
+    """
+    def __init__(self, redis_url='', prefix='id_index'):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._redis = None
+        self._update = None
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.StrictRedis.from_url(self.redis_url)
+            self._update = self._redis.register_script(_UPDATE)
+        return self._redis
+
+    def _hash(self, core):
+        return '%s:%s' % (self.prefix, core)
+
+    def _doc(self, core, record_id):
+        return '%s:%s:doc:%s' % (self.prefix, core, record_id)
+
+    @staticmethod
+    def keys(core, doc):
+        """
+        The hash fields of a Solr doc (or of the dict sent to Solr).
+        """
+        keys = []
+        for field in FIELDS.get(core, ()):
+            values = doc.get(field)
+            if not values:
+                continue
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                value = str(value).strip()
+                if value and '%s:%s' % (field, value) not in keys:
+                    keys.append('%s:%s' % (field, value))
+        return keys
+
+    def update(self, core, doc):
+        """
+        Replace the identifiers of a doc by the ones in doc.
+        """
+        if self.redis is None or not doc.get('id'):
+            return None
+        try:
+            return self._update(keys=[self._hash(core), self._doc(core, doc.get('id'))],
+                                args=[doc.get('id')] + self.keys(core, doc))
+        except redis.RedisError as e:
+            logging.error('IdIndex: %s' % e)
+            return None
+
+    def remove(self, core, record_id):
+        """
+        Drop all identifiers of a doc, e.g. after deleting it or changing its id.
+        """
+        if self.redis is None or not record_id:
+            return None
+        try:
+            return self._update(keys=[self._hash(core), self._doc(core, record_id)], args=[record_id])
+        except redis.RedisError as e:
+            logging.error('IdIndex: %s' % e)
+            return None
+
+    @staticmethod
+    def _candidates(core, value):
+        candidates = []
+        for field in FIELDS.get(core, ()):
+            if field == 'doi':
+                candidates.append('%s:%s' % (field, urllib.parse.unquote_plus(value)))
+            else:
+                candidates.append('%s:%s' % (field, value))
+        return candidates
+
+    @staticmethod
+    def _first(candidates, ids):
+        for key, record_id in zip(candidates, ids):
+            if record_id is not None:
+                return record_id.decode('utf-8'), key.split(':', 1)[0]
+        return None, None
+
+    def resolve(self, core, value):
+        """
+        :return: (canonical id, matched field) or (None, None); None if the index is not available
+        """
+        if self.redis is None:
+            return None
+        candidates = self._candidates(core, value)
+        try:
+            return self._first(candidates, self.redis.hmget(self._hash(core), candidates))
+        except redis.RedisError as e:
+            logging.error('IdIndex: %s' % e)
+            return None
+
+    def resolve_many(self, core, values):
+        """
+        Map any number of identifiers in a single round trip.
+
+        :return: dict identifier -> canonical id of all identifiers found; None if the index is not available
+        """
+        if self.redis is None:
+            return None
+        values = [value for value in values if value]
+        pipe = self.redis.pipeline(transaction=False)
+        candidates = [self._candidates(core, value) for value in values]
+        for keys in candidates:
+            pipe.hmget(self._hash(core), keys)
+        try:
+            found = pipe.execute()
+        except redis.RedisError as e:
+            logging.error('IdIndex: %s' % e)
+            return None
+        resolved = {}
+        for value, keys, ids in zip(values, candidates, found):
+            record_id, field = self._first(keys, ids)
+            if record_id is not None:
+                resolved[value] = record_id
+        return resolved
+
+    def rebuild(self, core, docs, batch_size=1000):
+        """
+        Fill the index of a core from an iterable of Solr docs (e.g. Solr.iter_export()). The hash is built under a
+        temporary name and swapped in at the end; doc sets of ids missing in docs are dropped afterwards.
+
+        :return: number of docs indexed
+        """
+        if self.redis is None:
+            return None
+        building = '%s:rebuild' % self._hash(core)
+        seen = set()
+        self.redis.delete(building)
+        pipe = self.redis.pipeline(transaction=False)
+        for doc in docs:
+            keys = self.keys(core, doc)
+            seen.add(doc.get('id'))
+            pipe.delete(self._doc(core, doc.get('id')))
+            if keys:
+                pipe.hmset(building, dict((key, doc.get('id')) for key in keys))
+                pipe.sadd(self._doc(core, doc.get('id')), *keys)
+            if len(pipe) >= batch_size:
+                pipe.execute()
+        pipe.execute()
+
+        if self.redis.exists(building):
+            self.redis.rename(building, self._hash(core))
+        else:
+            self.redis.delete(self._hash(core))
+
+        stale = []
+        for doc_key in self.redis.scan_iter(match=self._doc(core, '*'), count=batch_size):
+            if doc_key.decode('utf-8').split(':doc:', 1)[1] not in seen:
+                stale.append(doc_key)
+                if len(stale) >= batch_size:
+                    self.redis.delete(*stale)
+                    stale = []
+        if stale:
+            self.redis.delete(*stale)
+        return len(seen)
+
+    def stats(self):
+        if self.redis is None:
+            return {'enabled': False}
+        try:
+            return {'enabled': True,
+                    'cores': dict((core, self.redis.hlen(self._hash(core))) for core in sorted(FIELDS))}
+        except redis.RedisError as e:
+            logging.error('IdIndex: %s' % e)
+            return {'enabled': True, 'error': str(e)}
+
+
+id_index = IdIndex(redis_url=getattr(secrets, 'REDIS_ID_INDEX_URL', ''))
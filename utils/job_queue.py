@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import logging
+import os
+import threading
+import time
+
+import simplejson as json
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+# add an operation to the job of a target; the job is queued only if it is not pending already
+_ENQUEUE = """
+redis.call('SADD', KEYS[3], ARGV[2])
+if ARGV[3] ~= '' and redis.call('SADD', KEYS[4], ARGV[3]) == 1 then
+    redis.call('HINCRBY', KEYS[5], ARGV[3] .. ':total', 1)
+    redis.call('ZADD', KEYS[6], 'NX', ARGV[4], ARGV[3])
+end
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# move up to n jobs with their operations, origins and attempts from the queue to the processing list, where they
+# stay until the worker acks them
+_CLAIM = """
+local jobs = {}
+for i = 1, tonumber(ARGV[2]) do
+    local key = redis.call('LPOP', KEYS[2])
+    if not key then
+        break
+    end
+    redis.call('SREM', KEYS[1], key)
+    local job = cjson.encode({key = key,
+                              ops = redis.call('SMEMBERS', ARGV[1] .. ':ops:' .. key),
+                              origins = redis.call('SMEMBERS', ARGV[1] .. ':origins:' .. key),
+                              attempts = tonumber(redis.call('HGET', KEYS[4], key)) or 0,
+                              claimed = tonumber(ARGV[3])})
+    redis.call('DEL', ARGV[1] .. ':ops:' .. key, ARGV[1] .. ':origins:' .. key)
+    redis.call('HDEL', KEYS[4], key)
+    redis.call('RPUSH', KEYS[3], job)
+    table.insert(jobs, job)
+end
+return jobs
+"""
+
+# queue a claimed job again, merged with a job for the same target queued meanwhile; its origins are counted already
+_RETRY = """
+for _, op in ipairs(cjson.decode(ARGV[2])) do
+    redis.call('SADD', KEYS[3], op)
+end
+for _, origin in ipairs(cjson.decode(ARGV[3])) do
+    redis.call('SADD', KEYS[4], origin)
+end
+redis.call('HSET', KEYS[5], ARGV[1], math.max(tonumber(ARGV[4]), tonumber(redis.call('HGET', KEYS[5], ARGV[1])) or 0))
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+"""
+
+
+class RedisBackend(object):
+    """
+    Queue state shared by all processes:
+
+        <prefix>:queue          list of job keys '<kind>|<target>' in order of arrival
+        <prefix>:pending        set of the queued job keys (dedupe)
+        <prefix>:ops:<key>      set of the operations of a job
+        <prefix>:origins:<key>  set of the origins (e.g. 'organisation:<id>') a job was queued for
+        <prefix>:attempts       hash of the failed attempts of queued jobs by key
+        <prefix>:processing     list of the claimed jobs (JSON) until their worker acks them
+        <prefix>:progress       hash of counters: '<origin>:total', '<origin>:done', 'processed', 'retried', 'failed'
+        <prefix>:origins        sorted set of origins by the time they were first seen
+    """
+    def __init__(self, redis_url, prefix):
+        self.prefix = prefix
+        self.redis = redis.StrictRedis.from_url(redis_url)
+        self._enqueue = self.redis.register_script(_ENQUEUE)
+        self._claim = self.redis.register_script(_CLAIM)
+        self._retry = self.redis.register_script(_RETRY)
+
+    def _keys(self, key):
+        return ['%s:pending' % self.prefix, '%s:queue' % self.prefix, '%s:ops:%s' % (self.prefix, key),
+                '%s:origins:%s' % (self.prefix, key), '%s:progress' % self.prefix, '%s:origins' % self.prefix]
+
+    def enqueue(self, jobs, origin):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, op in jobs:
+            self._enqueue(keys=self._keys(key), args=[key, op, origin or '', time.time()], client=pipe)
+        return sum(pipe.execute())
+
+    @staticmethod
+    def _job(handle):
+        job = json.loads(handle)
+        # cjson encodes empty sets as {}
+        return (job.get('key'), list(job.get('ops') or []), list(job.get('origins') or []), job.get('attempts', 0),
+                handle)
+
+    def claim(self, size):
+        """
+        :return: list of (key, ops, origins, attempts, handle), the handle is passed to finish() or retry()
+        """
+        jobs = self._claim(keys=['%s:pending' % self.prefix, '%s:queue' % self.prefix,
+                                 '%s:processing' % self.prefix, '%s:attempts' % self.prefix],
+                           args=[self.prefix, size, time.time()])
+        return [self._job(job.decode('utf-8')) for job in jobs]
+
+    def finish(self, handle, origins, failed=False):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem('%s:processing' % self.prefix, 1, handle)
+        for origin in origins:
+            pipe.hincrby('%s:progress' % self.prefix, '%s:done' % origin, 1)
+        pipe.hincrby('%s:progress' % self.prefix, 'failed' if failed else 'processed', 1)
+        pipe.execute()
+
+    def retry(self, handle, key, ops, origins, attempts):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem('%s:processing' % self.prefix, 1, handle)
+        self._retry(keys=self._keys(key)[:4] + ['%s:attempts' % self.prefix],
+                    args=[key, json.dumps(ops), json.dumps(origins), attempts], client=pipe)
+        pipe.hincrby('%s:progress' % self.prefix, 'retried', 1)
+        pipe.execute()
+
+    def stale(self, timeout):
+        """
+        Claimed jobs not acked within timeout seconds, i.e. of a worker which died; each is returned to one caller
+        only.
+        """
+        jobs = []
+        for handle in self.redis.lrange('%s:processing' % self.prefix, 0, -1):
+            handle = handle.decode('utf-8')
+            job = self._job(handle)
+            if json.loads(handle).get('claimed', 0) < time.time() - timeout and \
+                    self.redis.lrem('%s:processing' % self.prefix, 1, handle):
+                jobs.append(job)
+        return jobs
+
+    def status(self, limit):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen('%s:queue' % self.prefix)
+        pipe.llen('%s:processing' % self.prefix)
+        pipe.hgetall('%s:progress' % self.prefix)
+        pipe.zrevrange('%s:origins' % self.prefix, 0, limit - 1, withscores=True)
+        depth, processing, progress, origins = pipe.execute()
+        progress = dict((key.decode('utf-8'), int(value)) for key, value in progress.items())
+        return depth, processing, progress, [(origin.decode('utf-8'), score) for origin, score in origins]
+
+    def trim(self, keep):
+        # drop the counters of all but the most recent origins
+        key = '%s:origins' % self.prefix
+        old = self.redis.zrange(key, 0, -keep - 1)
+        if old:
+            pipe = self.redis.pipeline(transaction=False)
+            for origin in old:
+                pipe.hdel('%s:progress' % self.prefix, '%s:total' % origin.decode('utf-8'),
+                          '%s:done' % origin.decode('utf-8'))
+            pipe.zrem(key, *old)
+            pipe.execute()
+
+
+class MemoryBackend(object):
+    """
+    Per process stand-in for RedisBackend, used when no Redis URL is configured (development, tests).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = []
+        self._ops = {}
+        self._origins = {}
+        self._attempts = {}
+        self._processing = {}
+        self._claims = 0
+        self._progress = {}
+        self._started = {}
+
+    def enqueue(self, jobs, origin):
+        queued = 0
+        with self._lock:
+            for key, op in jobs:
+                if key not in self._ops:
+                    self._ops[key] = set()
+                    self._origins[key] = set()
+                    self._queue.append(key)
+                    queued += 1
+                self._ops[key].add(op)
+                if origin and origin not in self._origins[key]:
+                    self._origins[key].add(origin)
+                    self._progress['%s:total' % origin] = self._progress.get('%s:total' % origin, 0) + 1
+                    self._started.setdefault(origin, time.time())
+        return queued
+
+    def claim(self, size):
+        with self._lock:
+            keys, self._queue = self._queue[:size], self._queue[size:]
+            jobs = []
+            for key in keys:
+                self._claims += 1
+                job = (key, list(self._ops.pop(key)), list(self._origins.pop(key)), self._attempts.pop(key, 0),
+                       self._claims)
+                self._processing[self._claims] = (job, time.time())
+                jobs.append(job)
+            return jobs
+
+    def finish(self, handle, origins, failed=False):
+        with self._lock:
+            self._processing.pop(handle, None)
+            for name in ['%s:done' % origin for origin in origins] + ['failed' if failed else 'processed']:
+                self._progress[name] = self._progress.get(name, 0) + 1
+
+    def retry(self, handle, key, ops, origins, attempts):
+        with self._lock:
+            self._processing.pop(handle, None)
+            if key not in self._ops:
+                self._ops[key] = set()
+                self._origins[key] = set()
+                self._queue.append(key)
+            self._ops[key].update(ops)
+            self._origins[key].update(origins)
+            self._attempts[key] = max(attempts, self._attempts.get(key, 0))
+            self._progress['retried'] = self._progress.get('retried', 0) + 1
+
+    def stale(self, timeout):
+        with self._lock:
+            handles = [handle for handle, (job, claimed) in self._processing.items()
+                       if claimed < time.time() - timeout]
+            return [self._processing.pop(handle)[0] for handle in handles]
+
+    def status(self, limit):
+        with self._lock:
+            origins = sorted(self._started.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return len(self._queue), len(self._processing), dict(self._progress), origins
+
+    def trim(self, keep):
+        with self._lock:
+            for origin, started in sorted(self._started.items(), key=lambda item: item[1], reverse=True)[keep:]:
+                self._progress.pop('%s:total' % origin, None)
+                self._progress.pop('%s:done' % origin, None)
+                del self._started[origin]
+
+
+class JobQueue(object):
+    """
+    Queue of jobs on targets (e.g. the id of a work to re-index). Jobs for the same kind and target are merged
+    while they wait, their operations are handed over to the handler of the kind together, and workers take
+    jobs in batches, so handlers can load and write their targets in bulk:
+
+        @relation_jobs.handler('link')
+        def link(jobs):
+            # jobs: {target: [op, ...]}
+            ...
+
+        relation_jobs.enqueue('link', 'some-id', op=['is_part_of', 'other-id'], origin='work:other-id')
+
+    Operations must be JSON serializable. With a Redis URL the queue is shared by all processes and is worked off
+    by bin/relation_worker.py; without, jobs are kept in memory and worked off by a thread of the process. The
+    progress of everything queued for an origin is reported by status().
+
+    Claimed jobs are kept until their handler returns. If it raises, the jobs of the batch are queued again, up to
+    max_attempts times; jobs of a worker which died are queued again after claim_timeout seconds.
+    """
+    def __init__(self, name, redis_url='', batch_size=100, keep_origins=100, max_attempts=3, claim_timeout=600,
+                 maintenance_interval=60):
+        self.name = name
+        self.redis_url = redis_url
+        self.batch_size = batch_size
+        self.keep_origins = keep_origins
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+        self.maintenance_interval = maintenance_interval
+        self.handlers = {}
+        self._backend = None
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if self.redis_url and redis is not None:
+                self._backend = RedisBackend(self.redis_url, 'jobs:%s' % self.name)
+            else:
+                self._backend = MemoryBackend()
+        return self._backend
+
+    @property
+    def shared(self):
+        return isinstance(self.backend, RedisBackend)
+
+    def handler(self, kind):
+        def register(func):
+            self.handlers[kind] = func
+            return func
+        return register
+
+    def enqueue(self, kind, target, op=None, origin=None):
+        return self.enqueue_many(kind, [target], op=op, origin=origin)
+
+    def enqueue_many(self, kind, targets, op=None, origin=None):
+        """
+        Queue the same operation for many targets in one round trip.
+
+        :return: number of jobs queued; targets with a pending job only get the operation added
+        """
+        jobs = [('%s|%s' % (kind, target), json.dumps(op)) for target in targets if target]
+        if not jobs:
+            return 0
+        queued = self.backend.enqueue(jobs, origin)
+        if not self.shared:
+            self._start_thread()
+        return queued
+
+    def run_once(self, size=None):
+        """
+        Claim a batch of jobs and run their handlers, one call per kind.
+
+        :return: number of jobs processed
+        """
+        claimed = self.backend.claim(size or self.batch_size)
+        by_kind = {}
+        for job in claimed:
+            by_kind.setdefault(job[0].split('|', 1)[0], []).append(job)
+
+        for kind, jobs in by_kind.items():
+            handler = self.handlers.get(kind)
+            try:
+                if handler is None:
+                    raise KeyError('no handler for %s jobs' % kind)
+                handler(dict((key.split('|', 1)[1], [json.loads(op) for op in ops]) for key, ops, origins, attempts,
+                             handle in jobs))
+            except Exception as e:
+                logging.exception('JobQueue %s: %s jobs failed: %s' % (self.name, kind, e))
+                for job in jobs:
+                    self._failed(*job)
+                continue
+            for key, ops, origins, attempts, handle in jobs:
+                self.backend.finish(handle, origins)
+        return len(claimed)
+
+    def _failed(self, key, ops, origins, attempts, handle):
+        if attempts + 1 < self.max_attempts:
+            self.backend.retry(handle, key, ops, origins, attempts + 1)
+        else:
+            logging.error('JobQueue %s: giving up %s after %s attempts' % (self.name, key, attempts + 1))
+            self.backend.finish(handle, origins, failed=True)
+
+    def maintain(self):
+        """
+        Queue the jobs of dead workers again and drop the progress of old origins.
+        """
+        stale = self.backend.stale(self.claim_timeout)
+        for job in stale:
+            self._failed(*job)
+        if stale:
+            logging.warning('JobQueue %s: %s jobs of dead workers queued again' % (self.name, len(stale)))
+        self.backend.trim(self.keep_origins)
+
+    def work(self, interval=1.0):
+        """
+        Work off the queue until the process is stopped.
+        """
+        logging.info('JobQueue %s: worker started in %s' % (self.name, os.getpid()))
+        maintained = 0
+        while True:
+            if time.time() - maintained >= self.maintenance_interval:
+                self.maintain()
+                maintained = time.time()
+            if self.run_once() == 0:
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+
+    def _start_thread(self):
+        # in-process fallback: one daemon worker per process, woken up by new jobs
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.work, name='jobs-%s' % self.name)
+            self._thread.daemon = True
+            self._thread.start()
+        self._wakeup.set()
+
+    def status(self, limit=20):
+        """
+        Queue depth, jobs in progress, processed, retried and failed jobs and the progress of the most recent origins.
+        """
+        depth, processing, progress, origins = self.backend.status(limit)
+        cascades = []
+        for origin, started in origins:
+            total = progress.get('%s:total' % origin, 0)
+            done = progress.get('%s:done' % origin, 0)
+            cascades.append({'origin': origin, 'started': time.strftime('%Y-%m-%d %H:%M:%S',
+                                                                         time.localtime(started)),
+                             'total': total, 'done': done, 'finished': done >= total})
+        return {'queue': self.name, 'shared': self.shared, 'depth': depth, 'processing': processing,
+                'processed': progress.get('processed', 0), 'retried': progress.get('retried', 0),
+                'failed': progress.get('failed', 0), 'origins': cascades}
+
+
+relation_jobs = JobQueue('relations', redis_url=getattr(secrets, 'REDIS_JOB_QUEUE_URL', ''),
+                         batch_size=getattr(secrets, 'JOB_QUEUE_BATCH_SIZE', 100),
+                         max_attempts=getattr(secrets, 'JOB_QUEUE_MAX_ATTEMPTS', 3),
+                         claim_timeout=getattr(secrets, 'JOB_QUEUE_CLAIM_TIMEOUT', 600))
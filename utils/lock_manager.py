@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+
+import logging
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+# take the lock if it is free or held by the same owner; returns the owner holding the lock afterwards
+_ACQUIRE = """
+local owner = redis.call('GET', KEYS[1])
+if not owner or owner == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return ARGV[1]
+end
+return owner
+"""
+
+# extend the lock, but only for its owner
+_HEARTBEAT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LockManager(object):
+    """
+    Edit locks of works, persons, organisations and groups. A lock is a key '<prefix>:<core>:<id>' holding the owner
+    (the id of the user editing) which expires after ttl seconds unless the edit form sends heartbeats, so a crashed
+    or abandoned edit does not keep the record locked.
+
+    Locks are advisory: they tell others a record is being edited, saves are guarded by the _version_ of the record
+    (see solr_handler.VersionConflict). Without a Redis URL locks are kept in memory of the process; with Redis
+    unavailable records count as unlocked.
+    """
+    def __init__(self, redis_url='', prefix='locks', ttl=900):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = None
+        self._scripts = {}
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.StrictRedis.from_url(self.redis_url)
+            self._scripts = {'acquire': self._redis.register_script(_ACQUIRE),
+                             'heartbeat': self._redis.register_script(_HEARTBEAT),
+                             'release': self._redis.register_script(_RELEASE)}
+        return self._redis
+
+    def _key(self, core, record_id):
+        return '%s:%s:%s' % (self.prefix, core, record_id)
+
+    def _held(self, key):
+        # memory fallback: owner of a lock which has not expired yet
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] <= time.time():
+            del self._memory[key]
+            entry = None
+        return entry[0] if entry else None
+
+    def acquire(self, core, record_id, owner, ttl=None):
+        """
+        Lock a record for owner; owner may acquire a lock it already holds again, which extends it.
+
+        :return: the owner of the lock, i.e. owner if the lock was acquired or somebody else if not
+        """
+        ttl = ttl or self.ttl
+        key = self._key(core, record_id)
+        if self.redis is not None:
+            try:
+                return self._scripts['acquire'](keys=[key], args=[owner, ttl]).decode('utf-8')
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return owner
+        with self._lock:
+            holder = self._held(key)
+            if holder is None or holder == owner:
+                self._memory[key] = (owner, time.time() + ttl)
+                return owner
+            return holder
+
+    def heartbeat(self, core, record_id, owner, ttl=None):
+        """
+        Extend a lock held by owner.
+
+        :return: False if owner does not hold the lock (anymore)
+        """
+        ttl = ttl or self.ttl
+        key = self._key(core, record_id)
+        if self.redis is not None:
+            try:
+                return bool(self._scripts['heartbeat'](keys=[key], args=[owner, ttl]))
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return False
+        with self._lock:
+            if self._held(key) != owner:
+                return False
+            self._memory[key] = (owner, time.time() + ttl)
+            return True
+
+    def release(self, core, record_id, owner=None):
+        """
+        Release a lock held by owner; without owner the lock is released whoever holds it.
+
+        :return: True if a lock was released
+        """
+        key = self._key(core, record_id)
+        if self.redis is not None:
+            try:
+                if owner is None:
+                    return bool(self.redis.delete(key))
+                return bool(self._scripts['release'](keys=[key], args=[owner]))
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return False
+        with self._lock:
+            holder = self._held(key)
+            if holder is None or (owner is not None and holder != owner):
+                return False
+            del self._memory[key]
+            return True
+
+    def owner(self, core, record_id):
+        """
+        :return: the owner of the lock of a record or None if it is not locked
+        """
+        key = self._key(core, record_id)
+        if self.redis is not None:
+            try:
+                owner = self.redis.get(key)
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return None
+            return owner.decode('utf-8') if owner is not None else None
+        with self._lock:
+            return self._held(key)
+
+    def is_locked(self, core, record_id):
+        return self.owner(core, record_id) is not None
+
+    def owners(self, core, record_ids):
+        """
+        The owners of the locked records among record_ids in a single round trip.
+
+        :return: dict id -> owner
+        """
+        record_ids = [record_id for record_id in record_ids if record_id]
+        if not record_ids:
+            return {}
+        keys = [self._key(core, record_id) for record_id in record_ids]
+        if self.redis is not None:
+            try:
+                owners = self.redis.mget(keys)
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return {}
+            return dict((record_id, owner.decode('utf-8')) for record_id, owner in zip(record_ids, owners)
+                        if owner is not None)
+        with self._lock:
+            return dict((record_id, self._held(key)) for record_id, key in zip(record_ids, keys)
+                        if self._held(key) is not None)
+
+    def mark(self, core, docs):
+        """
+        Set 'locked' of Solr docs (e.g. search results) to the current lock state.
+        """
+        owners = self.owners(core, [doc.get('id') for doc in docs])
+        for doc in docs:
+            doc['locked'] = doc.get('id') in owners
+        return docs
+
+    def locks(self, core):
+        """
+        All current locks of a core, the ones expiring first (i.e. without recent heartbeat) first.
+
+        :return: list of dicts with id, owner and expires (seconds)
+        """
+        locks = []
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(match=self._key(core, '*'), count=1000))
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.get(key)
+                    pipe.ttl(key)
+                values = pipe.execute()
+            except redis.RedisError as e:
+                logging.error('LockManager: %s' % e)
+                return []
+            for key, owner, expires in zip(keys, values[::2], values[1::2]):
+                if owner is not None:
+                    locks.append({'id': key.decode('utf-8')[len(self._key(core, '')):],
+                                  'owner': owner.decode('utf-8'), 'expires': expires})
+        else:
+            with self._lock:
+                for key in list(self._memory):
+                    owner = self._held(key)
+                    if owner is not None and key.startswith(self._key(core, '')):
+                        locks.append({'id': key[len(self._key(core, '')):], 'owner': owner,
+                                      'expires': int(self._memory[key][1] - time.time())})
+        return sorted(locks, key=lambda lock: lock.get('expires'))
+
+
+record_locks = LockManager(redis_url=getattr(secrets, 'REDIS_LOCK_URL', ''), ttl=getattr(secrets, 'LOCK_TTL', 900))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+
+import bisect
+import collections
+import functools
+import logging
+import threading
+import time
+import timeit
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+# upper bounds of the histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        # upper bound of the bucket the quantile falls into; the maximum for the overflow bucket
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        labels = ['<=%s' % bound for bound in self.buckets] + ['>%s' % self.buckets[-1]]
+        return {'count': self.count, 'sum': self.sum, 'avg': self.sum / self.count if self.count else 0.0,
+                'max': self.max, 'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'buckets': collections.OrderedDict((label, count) for label, count in zip(labels, self.counts)
+                                                   if count)}
+
+
+class Span(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.start = timeit.default_timer()
+        self.last = self.start
+        self.phases = []
+        self.tags = {}
+
+
+class PhaseTimer(object):
+    """
+    Timing of the phases of saves (persistence.record2solr() etc.). A function decorated with timed() runs in a span;
+    lap() within it ends the current phase, i.e. times everything since the start of the span or the previous lap:
+
+        @phase_timer.timed('record2solr')
+        def record2solr(form, ...):
+            phase_timer.tag(id=id)
+            ...
+            phase_timer.lap('fields')
+
+    Per function and phase there is a histogram of the durations, plus one of the total of all saves which have not
+    been skipped (tag(skipped=True)). The spans of the last keep_slow saves slower than slow seconds are kept with
+    their tags. Spans are per thread, nested calls get spans of their own; the statistics are kept per process.
+    """
+    def __init__(self, slow=getattr(secrets, 'PHASE_TIMING_SLOW', 1.0),
+                 keep_slow=getattr(secrets, 'PHASE_TIMING_KEEP_SLOW', 50)):
+        self.slow = slow
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.functions = {}
+        self.slow_saves = collections.deque(maxlen=keep_slow)
+
+    def _spans(self):
+        if not hasattr(self._local, 'spans'):
+            self._local.spans = []
+        return self._local.spans
+
+    def timed(self, name):
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                self._spans().append(Span(name))
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._finish(self._spans().pop())
+            return wrapper
+        return decorate
+
+    def lap(self, phase):
+        """
+        End a phase of the current span.
+
+        :return: duration of the phase in seconds (0.0 outside of a span)
+        """
+        spans = self._spans()
+        if not spans:
+            return 0.0
+        span = spans[-1]
+        now = timeit.default_timer()
+        duration = now - span.last
+        span.last = now
+        span.phases.append((phase, duration))
+        logging.debug('Profiling: %s %s - %s' % (span.name, phase, duration))
+        return duration
+
+    def tag(self, **tags):
+        spans = self._spans()
+        if spans:
+            spans[-1].tags.update(tags)
+
+    def _finish(self, span):
+        total = timeit.default_timer() - span.start
+        skipped = span.tags.get('skipped', False)
+        with self._lock:
+            stats = self.functions.setdefault(span.name, {'calls': 0, 'skipped': 0, 'total': Histogram(),
+                                                          'phases': collections.OrderedDict()})
+            stats['calls'] += 1
+            for phase, duration in span.phases:
+                stats.get('phases').setdefault(phase, Histogram()).add(duration)
+            if skipped:
+                stats['skipped'] += 1
+            else:
+                stats.get('total').add(total)
+                if total > self.slow:
+                    self.slow_saves.append({
+                        'function': span.name, 'total': total,
+                        'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(span.started)),
+                        'phases': collections.OrderedDict(span.phases), 'tags': span.tags})
+
+    def stats(self, function=None):
+        """
+        The histograms per function and phase with the share of each phase in the time of all saves, and the slow
+        saves sampled, slowest first.
+        """
+        with self._lock:
+            functions = {}
+            for name, stats in self.functions.items():
+                if function and name != function:
+                    continue
+                phases = collections.OrderedDict((phase, histogram.as_dict())
+                                                 for phase, histogram in stats.get('phases').items())
+                timed = sum(phase.get('sum') for phase in phases.values()) or 1.0
+                for phase in phases.values():
+                    phase['share'] = phase.get('sum') / timed
+                functions[name] = {'calls': stats.get('calls'), 'skipped': stats.get('skipped'),
+                                   'total': stats.get('total').as_dict(), 'phases': phases}
+            slow_saves = sorted((save for save in self.slow_saves
+                                 if not function or save.get('function') == function),
+                                key=lambda save: save.get('total'), reverse=True)
+        return {'slow': self.slow, 'functions': functions, 'slow_saves': slow_saves}
+
+    def reset(self):
+        with self._lock:
+            self.functions = {}
+            self.slow_saves.clear()
+
+
+phase_timer = PhaseTimer()
@@ -23,13 +23,38 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import ast
+import asyncio
+import hashlib
+import itertools
 import logging
+import os
+import re
+import threading
+import time
 import urllib
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import simplejson as json
+from requests.adapters import HTTPAdapter
 from werkzeug import iri_to_uri
 
+from utils import stored_fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
 try:
     import local_app_secrets as secrets
 except ImportError:
@@ -40,17 +65,899 @@ logging.basicConfig(level=logging.ERROR,
                     datefmt='%a, %d %b %Y %H:%M:%S')
 
 
+class SolrTransport(object):
+    """
+    Connection-pooled HTTP transport shared by all Solr requests of a process.
+
+    The underlying requests session is created lazily and re-created after a fork, so pre-forking servers (uWSGI)
+    never share sockets between workers. urllib3's connection pools are thread-safe, so the same transport can be
+    used from threaded and eventlet/socketio workers.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=20, pool_block=False, connect_timeout=5,
+                 read_timeout=300, keep_alive=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+        self._pid = None
+        self.cluster = None
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                          pool_block=self.pool_block)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    if not self.keep_alive:
+                        session.headers['Connection'] = 'close'
+                    self._adapter = adapter
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        if self.cluster is not None and self.cluster.routes(url):
+            return self.cluster.request(self.session, method, url, **kwargs)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """
+        Pool hits and misses per host. A miss is a request for which a new TCP connection had to be opened.
+        """
+        stats = {'hits': 0, 'misses': 0, 'hosts': {}}
+        if self._adapter is None:
+            return stats
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            misses = pool.num_connections
+            hits = max(pool.num_requests - pool.num_connections, 0)
+            stats['hits'] += hits
+            stats['misses'] += misses
+            stats['hosts']['%s:%s' % (pool.host, pool.port)] = {'hits': hits, 'misses': misses,
+                                                                'idle': pool.pool.qsize() if pool.pool else 0}
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+
+class SolrCluster(object):
+    """
+    Routes the requests for the Solr address of the secrets (SOLR_HOST:SOLR_PORT) or any of SOLR_NODES to the nodes
+    of a replicated setup. Updates and real-time gets (/get, which must see the latest writes and _version_ values)
+    always go to the leader; other reads are balanced over the healthy nodes, either round-robin or to the node with
+    the lowest (exponentially weighted) latency, and fail over to the next node on connection errors, timeouts and
+    503s. Failed nodes are ejected and probed in the background until they answer again.
+    """
+    def __init__(self, nodes, leader='', strategy='round_robin', probe_interval=30, address='', application='solr'):
+        self.nodes = list(nodes)
+        self.leader = leader or self.nodes[0]
+        if self.leader not in self.nodes:
+            self.nodes.insert(0, self.leader)
+        self.strategy = strategy
+        self.probe_interval = probe_interval
+        self.address = address
+        self.application = application
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._probe = None
+        self._probe_pid = None
+        self._nodes = dict((node, {'requests': 0, 'failures': 0, 'latency': None, 'healthy': True,
+                                   'ejected_at': None, 'last_error': ''}) for node in self.nodes)
+
+    def routes(self, url):
+        netloc = urllib.parse.urlsplit(url).netloc
+        return netloc == self.address or netloc in self._nodes
+
+    def _candidates(self, leader_only):
+        if leader_only:
+            return [self.leader]
+        with self._lock:
+            healthy = [node for node in self.nodes if self._nodes.get(node).get('healthy')]
+            if self.strategy == 'least_latency':
+                # nodes without a measurement yet come first, so every node gets its share
+                healthy.sort(key=lambda node: self._nodes.get(node).get('latency') or 0.0)
+            else:
+                self._counter += 1
+                if healthy:
+                    offset = self._counter % len(healthy)
+                    healthy = healthy[offset:] + healthy[:offset]
+        # all nodes ejected: try them anyway instead of failing without a request
+        return healthy or list(self.nodes)
+
+    def request(self, session, method, url, **kwargs):
+        parts = urllib.parse.urlsplit(url)
+        leader_only = '/update' in parts.path or parts.path.rstrip('/').endswith('/get')
+        error = None
+        for node in self._candidates(leader_only):
+            started = time.time()
+            try:
+                resp = session.request(method, urllib.parse.urlunsplit(parts._replace(netloc=node)), **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._failed(node, e)
+                error = e
+                if leader_only:
+                    break
+                continue
+            if resp.status_code == 503 and not leader_only:
+                self._failed(node, 'HTTP 503')
+                error = requests.exceptions.HTTPError('503 from %s' % node, response=resp)
+                continue
+            self._succeeded(node, time.time() - started)
+            return resp
+        raise error
+
+    def _succeeded(self, node, latency):
+        with self._lock:
+            stats = self._nodes.get(node)
+            stats['requests'] += 1
+            if stats.get('latency') is None:
+                stats['latency'] = latency
+            else:
+                stats['latency'] = 0.7 * stats.get('latency') + 0.3 * latency
+            stats['healthy'] = True
+            stats['ejected_at'] = None
+
+    def _failed(self, node, error):
+        logging.error('SolrCluster: ejecting %s: %s' % (node, error))
+        with self._lock:
+            stats = self._nodes.get(node)
+            stats['requests'] += 1
+            stats['failures'] += 1
+            stats['healthy'] = False
+            stats['ejected_at'] = stats.get('ejected_at') or time.time()
+            stats['last_error'] = str(error)
+        self._start_probe()
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probe is not None and self._probe.is_alive() and self._probe_pid == os.getpid():
+                return
+            self._probe = threading.Thread(target=self._run_probe, name='solr-cluster-probe')
+            self._probe.daemon = True
+            self._probe_pid = os.getpid()
+            self._probe.start()
+
+    def _run_probe(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                ejected = [node for node in self.nodes if not self._nodes.get(node).get('healthy')]
+            if not ejected:
+                return
+            for node in ejected:
+                started = time.time()
+                try:
+                    resp = transport.session.get('http://%s/%s/admin/info/system?wt=json' % (node, self.application),
+                                                 timeout=(transport.connect_timeout, 10))
+                    if resp.status_code == 200:
+                        logging.warning('SolrCluster: %s is back' % node)
+                        self._succeeded(node, time.time() - started)
+                except requests.exceptions.RequestException:
+                    pass
+
+    def health(self):
+        """
+        Role, state, number of requests and failures and average latency (ms) of every node.
+        """
+        nodes = []
+        with self._lock:
+            for node in self.nodes:
+                stats = self._nodes.get(node)
+                nodes.append({
+                    'node': node,
+                    'role': 'leader' if node == self.leader else 'replica',
+                    'status': 'ok' if stats.get('healthy') else 'ejected',
+                    'requests': stats.get('requests'),
+                    'failures': stats.get('failures'),
+                    'latency_ms': round(stats.get('latency') * 1000, 1) if stats.get('latency') is not None else None,
+                    'ejected_since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats.get('ejected_at')))
+                    if stats.get('ejected_at') else None,
+                    'last_error': stats.get('last_error'),
+                })
+        if not [node for node in nodes if node.get('status') == 'ok']:
+            for node in nodes:
+                node['status'] = 'failed'
+        return {'strategy': self.strategy, 'leader': self.leader, 'nodes': nodes}
+
+
+transport = SolrTransport(pool_connections=getattr(secrets, 'SOLR_POOL_CONNECTIONS', 10),
+                          pool_maxsize=getattr(secrets, 'SOLR_POOL_MAXSIZE', 20),
+                          pool_block=getattr(secrets, 'SOLR_POOL_BLOCK', False),
+                          connect_timeout=getattr(secrets, 'SOLR_CONNECT_TIMEOUT', 5),
+                          read_timeout=getattr(secrets, 'SOLR_READ_TIMEOUT', 300),
+                          keep_alive=getattr(secrets, 'SOLR_KEEP_ALIVE', True))
+
+if getattr(secrets, 'SOLR_NODES', []):
+    transport.cluster = SolrCluster(secrets.SOLR_NODES, leader=getattr(secrets, 'SOLR_LEADER', ''),
+                                    strategy=getattr(secrets, 'SOLR_BALANCE', 'round_robin'),
+                                    probe_interval=getattr(secrets, 'SOLR_PROBE_INTERVAL', 30),
+                                    address='%s:%s' % (secrets.SOLR_HOST, secrets.SOLR_PORT),
+                                    application=getattr(secrets, 'SOLR_APP', 'solr'))
+
+
+def cluster_health():
+    """
+    Health of the Solr nodes as dependencies for the _health endpoints; empty without SOLR_NODES. Ejected replicas
+    are reported as 'ejected', only a cluster without any healthy node as 'failed'.
+    """
+    if transport.cluster is None:
+        return []
+    health = transport.cluster.health()
+    dependencies = []
+    for node in health.get('nodes'):
+        dependencies.append({
+            'service': 'Solr Node "%s"' % node.get('node'),
+            'status': node.get('status'),
+            'description': 'Solr %s (%s)' % (node.get('role'), health.get('strategy')),
+            'external': False,
+            'details': node,
+        })
+    return dependencies
+
+
+class SolrCache(object):
+    """
+    LRU cache with TTL for raw Solr response bodies, keyed by core and the normalised query parameters.
+
+    Every core has a generation which is bumped by each write to the core (Solr.update(), Solr.delete(),
+    SolrWriteBuffer); entries cached under an older generation are never returned again. With a Redis URL the
+    entries and generations are shared by all processes, so a write in one of the Flask apps invalidates the
+    cached queries of the others. Without Redis the cache is per process and writes of other processes only
+    become visible after the TTL. SOLR_CACHE_SIZE = 0 disables the cache.
+    """
+    PREFIX = 'solr_cache'
+
+    def __init__(self, size=1000, ttl=300, redis_url=''):
+        self.size = size
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._cores = set()
+        self._due = {}
+        self._redis = None
+        self._stats = {}
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self.ttl > 0
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.StrictRedis.from_url(self.redis_url)
+        return self._redis
+
+    def key(self, url, params):
+        # the order of parameters and formatting options do not change the result
+        parts = sorted(part for part in params.split('&') if part and not part.startswith('indent='))
+        return hashlib.sha1(('%s?%s' % (url, '&'.join(parts))).encode('utf-8')).hexdigest()
+
+    def _count(self, core, name):
+        self._stats.setdefault(core, {'hits': 0, 'misses': 0, 'invalidations': 0})[name] += 1
+
+    def generation(self, core):
+        if self.redis is not None:
+            try:
+                return int(self.redis.get('%s:gen:%s' % (self.PREFIX, core)) or 0)
+            except redis.RedisError as e:
+                logging.error('SolrCache: %s' % e)
+        return self._generations.get(core, 0)
+
+    def get(self, core, key):
+        if not self.enabled:
+            return None
+        entry_key = '%s:%s:%s' % (core, self.generation(core), key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(entry_key)
+                    self._count(core, 'hits')
+                    return entry[1]
+                del self._entries[entry_key]
+        if self.redis is not None:
+            try:
+                body = self.redis.get('%s:%s' % (self.PREFIX, entry_key))
+            except redis.RedisError as e:
+                logging.error('SolrCache: %s' % e)
+                body = None
+            if body is not None:
+                self._store(entry_key, body)
+                with self._lock:
+                    self._count(core, 'hits')
+                return body
+        with self._lock:
+            self._count(core, 'misses')
+        return None
+
+    def _store(self, entry_key, body):
+        with self._lock:
+            self._entries[entry_key] = (time.time() + self.ttl, body)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def set(self, core, key, body):
+        if not self.enabled:
+            return
+        entry_key = '%s:%s:%s' % (core, self.generation(core), key)
+        with self._lock:
+            self._cores.add(core)
+        self._store(entry_key, body)
+        if self.redis is not None:
+            try:
+                self.redis.setex('%s:%s' % (self.PREFIX, entry_key), self.ttl, body)
+            except redis.RedisError as e:
+                logging.error('SolrCache: %s' % e)
+
+    def invalidate(self, core, commit_within=0):
+        """
+        Drop the cached queries of a core by bumping its generation; the old entries are left to the LRU. Writes
+        sent with commitWithin only become visible later, so the core is invalidated again once commit_within (ms)
+        has passed. There is at most one deferred invalidation per core: writes while it is pending only move it
+        back, so a bulk import costs one bump per commit_within instead of a bump and a timer per batch.
+        """
+        if not self.enabled:
+            return
+        if self.redis is None and core not in self._cores:
+            # nothing cached for the core in this process, and no other process shares the cache
+            return
+        if commit_within:
+            with self._lock:
+                pending = core in self._due
+                self._due[core] = max(self._due.get(core, 0), time.time() + commit_within / 1000.0)
+            if pending:
+                return
+            self._defer(core, commit_within / 1000.0)
+        self._bump(core)
+
+    def _defer(self, core, delay):
+        timer = threading.Timer(delay, self._deferred, args=(core,))
+        timer.daemon = True
+        timer.start()
+
+    def _deferred(self, core):
+        self._bump(core)
+        with self._lock:
+            remaining = self._due.get(core, 0) - time.time()
+            if remaining <= 0:
+                self._due.pop(core, None)
+                return
+        self._defer(core, remaining)
+
+    def _bump(self, core):
+        with self._lock:
+            self._generations[core] = self._generations.get(core, 0) + 1
+            self._count(core, 'invalidations')
+        if self.redis is not None:
+            try:
+                self.redis.incr('%s:gen:%s' % (self.PREFIX, core))
+            except redis.RedisError as e:
+                logging.error('SolrCache: %s' % e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cores.clear()
+
+    def stats(self):
+        with self._lock:
+            cores = dict((core, dict(self._stats.get(core))) for core in self._stats)
+            size = len(self._entries)
+        hits = sum(core.get('hits') for core in cores.values())
+        misses = sum(core.get('misses') for core in cores.values())
+        return {'hits': hits, 'misses': misses, 'hit_ratio': float(hits) / (hits + misses) if hits + misses else 0.0,
+                'size': size, 'max_size': self.size, 'ttl': self.ttl, 'shared': self.redis is not None,
+                'cores': cores}
+
+
+query_cache = SolrCache(size=getattr(secrets, 'SOLR_CACHE_SIZE', 1000),
+                        ttl=getattr(secrets, 'SOLR_CACHE_TTL', 300),
+                        redis_url=getattr(secrets, 'SOLR_CACHE_REDIS_URL', ''))
+
+
+COMPRESS_MIN_ROWS = getattr(secrets, 'SOLR_COMPRESS_MIN_ROWS', 500)
+COMPRESS_FIELDS = ('wtf_json', 'csl_json')
+
+
+def accept_encoding(compress):
+    """
+    Accept-Encoding header for a Solr request. Small responses are asked for uncompressed: compressing them costs
+    Solr more CPU than it saves on the wire. Solr only compresses if Jetty's gzip module is enabled.
+    """
+    if compress:
+        return {'Accept-Encoding': 'gzip, deflate'}
+    return {'Accept-Encoding': 'identity'}
+
+
+_listeners = []
+
+
+def add_listener(listener):
+    """
+    Register a callable which is called with a dict for every Solr call of this process:
+    core, handler, time (wall time in s), qtime (Solr's QTime in s or None) and size (number of docs or None).
+    See utils.solr_trace for the per-request trace of the Flask apps.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify(core, handler, started, response=None, size=None):
+    if not _listeners:
+        return
+    qtime = None
+    if isinstance(response, dict):
+        try:
+            qtime = float(response.get('responseHeader').get('QTime')) / 1000
+        except (AttributeError, TypeError, ValueError):
+            pass
+        if size is None:
+            try:
+                size = len(response.get('response').get('docs'))
+            except (AttributeError, TypeError):
+                pass
+    call = {'core': core, 'handler': handler, 'time': time.time() - started, 'qtime': qtime, 'size': size}
+    for listener in _listeners:
+        try:
+            listener(call)
+        except Exception as e:
+            logging.error('Solr listener %s failed: %s' % (listener, e))
+
+
+_json_decoder = json.JSONDecoder()
+_RESPONSE_RE = re.compile(r'"response"\s*:\s*\{')
+_DOCS_RE = re.compile(r'"docs"\s*:\s*\[')
+
+
+def decode_json(body):
+    """
+    Decode a Solr JSON response body with the fastest available C parser (orjson, falling back to simplejson).
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return json.loads(body)
+
+
+def decode_response(body, writer):
+    """
+    Decode a response body according to the writer ('wt') it was requested with. Unknown writers (e.g. 'csv')
+    are returned as text.
+    """
+    if writer == 'json':
+        return decode_json(body)
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    if writer == 'python':
+        # legacy writer; never eval() data coming over the wire
+        return ast.literal_eval(body)
+    return body
+
+
+def _iter_array(text, pos):
+    """
+    Decode the elements of the JSON array starting right after the '[' at position pos one at a time.
+    Yields (element, start) tuples.
+    """
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char in ' \t\r\n,':
+            pos += 1
+            continue
+        if char == ']':
+            return
+        element, end = _json_decoder.raw_decode(text, pos)
+        yield element, pos
+        pos = end
+
+
+class LazyDocs(object):
+    """
+    Sequence of result docs which are decoded on access from the raw response text instead of being materialised
+    up front. Iterating decodes one doc at a time and does not keep the decoded docs. Index access remembers
+    the offsets of the docs seen so far.
+    """
+    def __init__(self, text, pos, length):
+        self._text = text
+        self._pos = pos
+        self._length = length
+        self._offsets = []
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __iter__(self):
+        for doc, start in _iter_array(self._text, self._pos):
+            yield doc
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._length))]
+        if idx < 0:
+            idx += self._length
+        if idx < 0 or idx >= self._length:
+            raise IndexError('LazyDocs index out of range')
+        if idx >= len(self._offsets):
+            pos = self._pos if not self._offsets else _json_decoder.raw_decode(self._text, self._offsets[-1])[1]
+            for doc, start in _iter_array(self._text, pos):
+                self._offsets.append(start)
+                if idx < len(self._offsets):
+                    return doc
+            raise IndexError('LazyDocs index out of range')
+        return _json_decoder.raw_decode(self._text, self._offsets[idx])[0]
+
+
+def decode_lazy(text, rows):
+    """
+    Decode only the header of a plain (non-faceted, non-grouped) JSON search response and wrap the docs in a
+    LazyDocs sequence. Falls back to a full decode if the docs array cannot be located.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    match = _RESPONSE_RE.search(text)
+    if match:
+        match = _DOCS_RE.search(text, match.end())
+    if not match:
+        return decode_json(text)
+    head = json.loads('%s]}}' % text[:match.end()])
+    numfound = int(head.get('response').get('numFound'))
+    start = int(head.get('response').get('start', 0))
+    length = max(0, min(numfound - start, int(rows)))
+    head['response']['docs'] = LazyDocs(text, match.end(), length)
+    return head
+
+
+class SolrError(Exception):
+    pass
+
+
+class VersionConflict(SolrError):
+    """
+    A conditional write (a doc carrying the _version_ it was read with) lost against another write of the same doc
+    in between (HTTP 409). Read the doc again, reapply the change and retry.
+    """
+    pass
+
+
+def iter_stream_docs(chunks):
+    """
+    Incrementally parse the docs (tuples) of a streamed JSON response such as those of the /export and /stream
+    handlers. Each doc is yielded as soon as it has been read completely.
+    :param chunks: iterable of text chunks
+    """
+    buf = ''
+    pos = None
+    for chunk in chunks:
+        buf += chunk
+        if pos is None:
+            match = _DOCS_RE.search(buf)
+            if not match:
+                continue
+            pos = match.end()
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == ']':
+                return
+            try:
+                doc, end = _json_decoder.raw_decode(buf, pos)
+            except ValueError:
+                # the doc is not complete yet
+                break
+            yield doc
+            pos = end
+        buf = buf[pos:]
+        pos = 0
+    if pos is None:
+        raise SolrError('Not a stream of docs: %s' % buf[:500])
+
+
+_schemas = {}
+
+
+def schema_fields(core):
+    """
+    Read the field definitions of a core from its schema in init/solr_config (or SOLR_SCHEMA_DIR).
+    Returns a dict of field name -> {'docValues': bool, 'multiValued': bool}.
+    """
+    if core not in _schemas:
+        schema_dir = getattr(secrets, 'SOLR_SCHEMA_DIR',
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          'init', 'solr_config'))
+        root = ElementTree.parse(os.path.join(schema_dir, core, 'conf', 'schema.xml')).getroot()
+        types = {}
+        # the schemas use both spellings
+        for tag in ('fieldType', 'fieldtype'):
+            for field_type in root.iter(tag):
+                types[field_type.get('name')] = field_type
+        fields = {}
+        for field in root.iter('field'):
+            field_type = types.get(field.get('type'))
+
+            def attribute(name):
+                value = field.get(name)
+                if value is None and field_type is not None:
+                    value = field_type.get(name)
+                return value == 'true'
+
+            fields[field.get('name')] = {'docValues': attribute('docValues'),
+                                         'multiValued': attribute('multiValued')}
+        _schemas[core] = fields
+    return _schemas.get(core)
+
+
+def validate_export(core, fields, sort):
+    """
+    Check that the field list and sort of an /export request only use docValues fields of the core's schema
+    and that the sort fields are single-valued. Raises a ValueError otherwise.
+    """
+    schema = schema_fields(core)
+    if not fields:
+        raise ValueError('/export needs a field list')
+    if not sort:
+        raise ValueError('/export needs a sort')
+    for field in fields:
+        if field not in schema:
+            raise ValueError('Unknown field "%s" in core "%s"' % (field, core))
+        if not schema.get(field).get('docValues'):
+            raise ValueError('Field "%s" in core "%s" has no docValues' % (field, core))
+    for clause in sort.split(','):
+        parts = clause.split()
+        if len(parts) != 2 or parts[1] not in ('asc', 'desc'):
+            raise ValueError('Invalid sort clause "%s"' % clause)
+        field = parts[0]
+        if field not in schema or not schema.get(field).get('docValues'):
+            raise ValueError('Sort field "%s" in core "%s" has no docValues' % (field, core))
+        if schema.get(field).get('multiValued'):
+            raise ValueError('Sort field "%s" in core "%s" is multiValued' % (field, core))
+
+
+def search_expression(core, query, fields, sort, qt='/export'):
+    """
+    Build a validated search() streaming expression over the /export handler of a core.
+    """
+    validate_export(core, fields, sort)
+    return 'search(%s, q="%s", fl="%s", sort="%s", qt="%s")' % (core, query.replace('"', '\\"'),
+                                                              ','.join(fields), sort, qt)
+
+
+COMMIT_WITHIN = getattr(secrets, 'SOLR_COMMIT_WITHIN', 10000)
+
+
+class SolrWriteBuffer(object):
+    """
+    Collects documents, atomic updates and deletes for one core and sends them in batches with commitWithin
+    instead of one hard commit per write. A batch is flushed when batch_size writes are pending or the oldest
+    pending write is older than max_age seconds. Callers that need to read their writes use flush(wait=True),
+    which ends with a soft commit and waits for the new searcher. flush() raises SolrError if Solr rejected a batch
+    since the last flush(); the writes of rejected batches are collected in failed. Writes which could not be sent
+    because of a connection error stay pending for the next flush.
+
+        with SolrWriteBuffer(core='hb2') as buffer:
+            buffer.add(doc)
+            buffer.set_fields('some-id', locked=False)
+    """
+    def __init__(self, host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application='solr', core=secrets.SOLR_CORE,
+                 batch_size=getattr(secrets, 'SOLR_WRITE_BATCH_SIZE', 500),
+                 max_age=getattr(secrets, 'SOLR_WRITE_MAX_AGE', 5.0), commit_within=COMMIT_WITHIN,
+                 background=False):
+        self.host = host
+        self.port = port
+        self.application = application
+        self.core = core
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.commit_within = commit_within
+        self.background = background
+        self._lock = threading.RLock()
+        self._pending = []
+        self._oldest = None
+        self._timer = None
+        self._unreported = 0
+        self.failed = []
+        self.stats = {'writes': 0, 'batches': 0, 'flushes': 0, 'errors': 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        self.close()
+
+    def add(self, doc, written=None):
+        """
+        Queue a document; written() is called once Solr has accepted the batch containing it.
+        """
+        self._append(('add', stored_fields.encode(self.core, doc), written))
+
+    def set_fields(self, doc_id, **fields):
+        """
+        Queue an atomic update which sets the given fields of an existing document.
+        """
+        doc = {'id': doc_id}
+        for field in fields:
+            doc[field] = {'set': fields.get(field)}
+        self._append(('add', doc, None))
+
+    def atomic(self, doc):
+        """
+        Queue a prepared atomic update, e.g. {'id': ..., 'field': {'add': value}}.
+        """
+        self._append(('add', doc, None))
+
+    def delete(self, doc_id):
+        self._append(('delete', doc_id, None))
+
+    def _append(self, op):
+        with self._lock:
+            self._pending.append(op)
+            self.stats['writes'] += 1
+            if self._oldest is None:
+                self._oldest = time.time()
+                if self.background and self.max_age:
+                    self._start_timer()
+            if len(self._pending) >= self.batch_size or \
+                    (self.max_age and time.time() - self._oldest >= self.max_age):
+                self._flush()
+
+    def _start_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Timer(self.max_age, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        try:
+            self.flush()
+        except (requests.exceptions.RequestException, SolrError) as e:
+            logging.error('SolrWriteBuffer: background flush failed: %s' % e)
+
+    def _post(self, payload, params):
+        url = 'http://%s:%s/%s/%s/update?%s' % (self.host, self.port, self.application, self.core, params)
+        started = time.time()
+        resp = transport.post(url, headers={'Content-type': 'application/json'}, data=json.dumps(payload))
+        query_cache.invalidate(self.core, commit_within=self.commit_within)
+        _notify(self.core, 'update', started, size=len(payload) if isinstance(payload, list) else None)
+        self.stats['batches'] += 1
+        if resp.status_code != 200:
+            self.stats['errors'] += 1
+            self._unreported += 1
+            logging.error('SolrWriteBuffer: update of core %s failed: %s' % (self.core, resp.text))
+        return resp
+
+    def _flush(self, wait=False):
+        ops = self._pending
+        self._pending = []
+        self._oldest = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.commit_within:
+            params = 'commitWithin=%s' % self.commit_within
+        else:
+            params = 'commit=true'
+        # keep the order of adds and deletes: send runs of the same kind as one batch
+        start = 0
+        try:
+            while start < len(ops):
+                kind = ops[start][0]
+                end = start
+                while end < len(ops) and ops[end][0] == kind:
+                    end += 1
+                items = [op[1] for op in ops[start:end]]
+                if kind == 'add':
+                    resp = self._post(items, params)
+                else:
+                    resp = self._post({'delete': items}, params)
+                if resp.status_code != 200:
+                    self.failed.extend(ops[start:end])
+                else:
+                    for op in ops[start:end]:
+                        if op[2] is not None:
+                            op[2]()
+                start = end
+        except Exception:
+            # nothing of the current batch is known to be written: keep it and the rest for the next flush
+            self._pending = ops[start:] + self._pending
+            if self._pending:
+                self._oldest = time.time()
+            raise
+        if wait:
+            self._post({'commit': {'softCommit': True, 'waitSearcher': True}}, 'wt=json')
+        if ops or wait:
+            self.stats['flushes'] += 1
+
+    def flush(self, wait=False):
+        """
+        Send all pending writes. With wait=True a soft commit is issued afterwards and the call returns only
+        when the writes are visible to searches.
+
+        :raises SolrError: if Solr rejected a batch since the last flush()
+        """
+        with self._lock:
+            self._flush(wait=wait)
+            if self._unreported:
+                errors = self._unreported
+                self._unreported = 0
+                raise SolrError('SolrWriteBuffer: %s update(s) of core %s failed, %s write(s) rejected' % (
+                    errors, self.core, len(self.failed)))
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def write_json_array(docs, fp, indent=None):
+    """
+    Write an iterable of docs to a file as one JSON array without holding all of them in memory.
+    """
+    fp.write('[')
+    first = True
+    for doc in docs:
+        if not first:
+            fp.write(',')
+        fp.write('\n')
+        fp.write(json.dumps(doc, indent=indent))
+        first = False
+    fp.write('\n]')
+
+
 class Solr(object):
     def __init__(self, host=secrets.SOLR_HOST, port=secrets.SOLR_PORT, application='solr', handler='select',
-                 query='*:*', fquery=[], fields=[], writer='python', start='0', rows='10', facet='false',
+                 query='*:*', fquery=[], fields=[], writer='json', start='0', rows='10', facet='false',
                  facet_fields=secrets.SOLR_SEARCH_FACETS, facet_mincount=0, facet_limit=10, facet_offset=0, sort='score desc',
                  terms_fl='', terms_limit=10, terms_prefix='', terms_sort='count', mlt=False, mlt_fields=[],
                  omitHeader='false', query_field='', sort_facet_by_index={}, fuzzy='false',
-                 compress=False, facet_sort='count', facet_tree=(), spellcheck='false', spellcheck_collate='false',
+                 compress=None, facet_sort='count', facet_tree=(), spellcheck='false', spellcheck_collate='false',
                  spellcheck_count=5, suggest_query='', group=False, group_field='', group_limit=1,
                  group_sort='score desc', group_ngroups='true', coordinates='0,0', json_nl='arrmap',# cursor='',
                  boost_most_recent='false', csv_separator='\t', core=secrets.SOLR_CORE, stats='false', stats_fl=[],
-                 data='', del_id='', export_field='', json_facet={}):
+                 data='', del_id='', export_field='', json_facet={}, lazy=False,
+                 export_rows=getattr(secrets, 'SOLR_EXPORT_ROWS', 1000), commit_within=0, cache=False):
         self.host = host
         self.port = port
         self.application = application
@@ -103,11 +1010,28 @@ class Solr(object):
         self.data = data
         self.del_id = del_id
         self.export_field = export_field
+        self.export_rows = export_rows
+        self.commit_within = commit_within
         #self.export_dir = export_dir
         self.json_facet = json_facet
+        self.lazy = lazy
+        self.cache = cache
 
     def request(self):
+        started = time.time()
+        url, params = self._build_request()
+        if self.mlt is True:
+            self._handle_mlt(transport.get('%s%s' % (url, self._mlt_params)).content)
+        self.response = self._fetch(url, params)
+        self._handle_response()
+        _notify(self.core, self.handler, started, self.response)
+
+    def _build_request(self):
+        """
+        Build the base url and the form encoded parameters of a query. Shared by Solr and AsyncSolr.
+        """
         params = ''
+        self._mlt_params = ''
         url = 'http://%s:%s/%s/' % (self.host, self.port, self.application)
         if self.core != '':
             url += '%s/%s/' % (self.core, self.handler)
@@ -170,20 +1094,18 @@ class Solr(object):
         if len(self.fields) > 0:
             if self.application == 'elevate':
                 self.fields.append('[elevated]')
-            params += '&fl=%s' % '+'.join(self.fields)
+            params += '&fl=%s' % '+'.join(stored_fields.fields(self.fields))
         if self.mlt is True:
             self.facet = 'false'
             mparams = 'q=%s&mlt=true&mlt.fl=%s&mlt.count=10&fl=%s&wt=%s&defType=%s' % (
-                self.query, '+'.join(self.mlt_fields), '+'.join(self.fields),
+                self.query, '+'.join(self.mlt_fields), '+'.join(stored_fields.fields(self.fields)),
                 self.writer, self.defType)
             # if self.boost_most_recent == 'true':
             #     params += '&boost=recip(ms(NOW/YEAR,year_boost),3.16e-11,1,1)'
             # self.response = eval(urllib.request.urlopen('%s%s' % (url, mparams)).read())
             # logging.info(url)
             # logging.info(mparams)
-            self.response = eval(requests.get('%s%s' % (url, mparams)).text)
-            for mlt in self.response.get('moreLikeThis'):
-                self.mlt_results = self.response.get('moreLikeThis').get(mlt).get('docs')
+            self._mlt_params = mparams
         if self.spellcheck == 'true':
             params += '&spellcheck=true&spellcheck.collate=%s&spellcheck.count=%s' % (
                 self.spellcheck_collate, self.spellcheck_count)
@@ -201,49 +1123,72 @@ class Solr(object):
             params += '&stats=true&stats.field=' + '&stats.field='.join(self.stats_fl)
         if self.handler != 'query':
             params += '&q.op=AND'
+        if self.writer == 'json':
+            params += '&indent=false'
 
         self.request_url = '%s%s' % (url, params)
         # logging.fatal(iri_to_uri(self.request_url))
         # logging.info('REQUEST: %s' % self.request_url)
         # print('REQUEST: %s' % self.request_url)
-        if self.compress:
-            import urllib2
-            import StringIO
-            import gzip
+        return url, params
 
-            # logging.debug('Blubb')
+    def _handle_mlt(self, body):
+        self.response = decode_response(body, self.writer)
+        for mlt in self.response.get('moreLikeThis'):
+            self.mlt_results = self.response.get('moreLikeThis').get(mlt).get('docs')
 
-            request = urllib2.Request(iri_to_uri(self.request_url))
-            request.add_header('Accept-encoding', 'gzip')
-            opener = urllib2.build_opener()
-            compresseddata = opener.open(request).read()
-            compressedstream = StringIO.StringIO(compresseddata)
-            gzipper = gzip.GzipFile(fileobj=compressedstream)
+    def _fetch(self, url, params):
+        """
+        Send a query built by _build_request() and return the decoded response. Does not touch any other state,
+        so AsyncSolr can run it in a worker thread.
+        """
+        # logging.error(self.request_url)
+        # logging.debug('Bla')
+        try:
+            # logging.debug('REQUEST: %s' % url)
+            # logging.debug('REQUEST PARAM: %s' %params)
+            formData = params.encode(encoding='utf_8', errors='strict')
+            # logging.debug('ENCODED: %s' % formData)
+            # logging.debug('IRI: %s' % self.request_url)
+            # logging.debug('URL: %s' % iri_to_uri(self.request_url))
+            # logging.debug('URLPARAM: %s' % iri_to_uri(params))
+            body = None
+            if self.cache:
+                cache_key = query_cache.key(url, params)
+                body = query_cache.get(self.core, cache_key)
+            if body is None:
+                headers = {'Content-type': 'application/x-www-form-urlencoded'}
+                headers.update(accept_encoding(self._compress()))
+                resp = transport.post(url, data=formData, headers=headers)
+                # gzip/deflate bodies are decompressed chunk by chunk by urllib3 while they are read
+                body = resp.content
+                if self.cache and resp.status_code == 200:
+                    query_cache.set(self.core, cache_key, body)
+            if self._lazy_docs():
+                return decode_lazy(body.decode('utf-8'), self.rows)
+            else:
+                return decode_response(body, self.writer)
+            # logging.debug('RESPONSE: %s' % self.response)
 
-            self.response = eval(gzipper.read())
-        else:
-            # logging.error(self.request_url)
-            # logging.debug('Bla')
-            try:
-                # logging.debug('REQUEST: %s' % url)
-                # logging.debug('REQUEST PARAM: %s' %params)
-                formData = params.encode(encoding='utf_8', errors='strict')
-                # logging.debug('ENCODED: %s' % formData)
-                # logging.debug('IRI: %s' % self.request_url)
-                # logging.debug('URL: %s' % iri_to_uri(self.request_url))
-                # logging.debug('URLPARAM: %s' % iri_to_uri(params))
-                request = urllib.request.Request(url, formData)
-                self.response = eval(urllib.request.urlopen(request).read())
-                # logging.debug('RESPONSE: %s' % self.response)
-
-                #self.response = eval(requests.get(iri_to_uri(self.request_url)).text)
-            except NameError:
-                # self.response = urllib.request.urlopen(iri_to_uri(self.request_url)).read()
-                self.response = requests.get(iri_to_uri(self.request_url)).text
-            except SyntaxError:
-                # self.response = urllib.request.urlopen(iri_to_uri(self.request_url)).read()
-                self.response = requests.get(iri_to_uri(self.request_url)).text
-            # self.response = eval(urllib.request.urlopen(self.request_url).read())
+            #self.response = eval(requests.get(iri_to_uri(self.request_url)).text)
+        except (ValueError, SyntaxError):
+            # self.response = urllib.request.urlopen(iri_to_uri(self.request_url)).read()
+            return transport.get(iri_to_uri(self.request_url)).text
+        # self.response = eval(urllib.request.urlopen(self.request_url).read())
+
+    def _compress(self):
+        # compress=True/False wins; by default only responses expected to be large are compressed
+        if self.compress is not None:
+            return self.compress
+        try:
+            rows = int(self.rows)
+        except (TypeError, ValueError):
+            rows = 0
+        if rows == 0:
+            return False
+        return rows >= COMPRESS_MIN_ROWS or any(field in COMPRESS_FIELDS for field in self.fields)
+
+    def _handle_response(self):
         # logging.error(self.response)
         # print(self.response)
         try:
@@ -273,6 +1218,12 @@ class Solr(object):
             self.qtime = float(self.response.get('responseHeader').get('QTime')) / 1000
             # logging.error(self.qtime)
 
+    def _lazy_docs(self):
+        # only plain doc lists can be decoded lazily; facets, stats etc. follow the docs in the response
+        return self.lazy and self.writer == 'json' and self.facet != 'true' and not self.facet_tree \
+            and not self.json_facet and self.stats != 'true' and self.spellcheck != 'true' \
+            and not self.group[0] and not self.handler.endswith('suggest')
+
     def suggest(self):
         url = 'http://%s:%s/%s/' % (self.host, self.port, self.application)
         if self.core != '':
@@ -282,9 +1233,11 @@ class Solr(object):
                                                                                self.suggest_query),
                                                                            self.writer, self.json_nl, self.omitHeader)
         self.request_url = '%s%s' % (url, params)
+        started = time.time()
         # self.response = eval(urllib.request.urlopen(iri_to_uri(self.request_url)).read())
-        self.response = eval(requests.get(iri_to_uri(self.request_url)).text)
+        self.response = decode_response(transport.get(iri_to_uri(self.request_url)).content, self.writer)
         self.suggestions = self.response.get('spellcheck').get('suggestions')
+        _notify(self.core, self.handler, started, self.response)
 
     def terms(self):
         url = 'http://%s:%s/%s/' % (self.host, self.port, self.application)
@@ -296,9 +1249,11 @@ class Solr(object):
         if self.terms_prefix:
             params += '&terms.prefix=%s' % self.terms_prefix
         self.request_url = '%s%s' % (url, params)
+        started = time.time()
         #self.response = eval(urllib.request.urlopen(self.request_url).read())
-        self.response = eval(requests.get(self.request_url).text)
+        self.response = decode_response(transport.get(self.request_url).content, self.writer)
         self.results = self.response.get('terms').get(self.terms_fl)
+        _notify(self.core, self.handler, started, self.response, size=len(self.results or []))
 
     def count(self):
         if self._count is None:
@@ -309,51 +1264,161 @@ class Solr(object):
                 #logging.error(self._count)
         return self._count
 
+    def get(self, ids, fields=None):
+        """
+        Fetch docs by their unique key through Solr's real-time get handler (/get). No query parsing or scoring is
+        involved and writes that are not committed yet are already visible; with SOLR_NODES the request goes to the
+        leader, since replicas only see what they have replicated. Sets and returns results, the docs found in the
+        order of ids.
+
+        :param ids: one id or a list of ids
+        :param fields: field list, defaults to fields
+        """
+        if isinstance(ids, str):
+            ids = [ids]
+        if fields is None:
+            fields = self.fields
+        started = time.time()
+        url = 'http://%s:%s/%s/%s/get' % (self.host, self.port, self.application, self.core)
+        params = {'ids': ','.join(ids), 'wt': 'json'}
+        if len(fields) > 0:
+            params['fl'] = ','.join(stored_fields.fields(fields))
+        self.request_url = url
+        self.response = decode_json(transport.post(url, data=params).content)
+        self.results = self.response.get('response').get('docs')
+        self._count = len(self.results)
+        _notify(self.core, 'get', started, self.response)
+        return self.results
+
+    def _commit_param(self):
+        # commit_within=0 keeps the old behaviour of a hard commit per call
+        if self.commit_within:
+            return 'commitWithin=%s' % self.commit_within
+        return 'commit=true'
+
     def update(self):
-        url = 'http://%s:%s/%s/%s/update/?commit=true&versions=true' % (self.host, self.port, self.application,
-                                                                        self.core)
-        resp = requests.post(url, headers={'Content-type': 'application/json'}, data=json.dumps(self.data))
+        url = 'http://%s:%s/%s/%s/update/?%s&versions=true' % (self.host, self.port, self.application,
+                                                               self.core, self._commit_param())
+        started = time.time()
+        data = self.data
+        if isinstance(data, list):
+            data = [stored_fields.encode(self.core, doc) for doc in data]
+        resp = transport.post(url, headers={'Content-type': 'application/json'}, data=json.dumps(data))
+        query_cache.invalidate(self.core, commit_within=self.commit_within)
+        _notify(self.core, 'update', started, size=len(self.data))
+        if resp.status_code == 409:
+            raise VersionConflict('update of core %s failed: %s' % (self.core, resp.text[:500]))
         return resp
 
     def delete(self):
-        url = 'http://%s:%s/%s/%s/update?commit=true' % (self.host, self.port, self.application, self.core)
-        resp = requests.post(url, headers={'Content-type': 'application/json'},
-                             data=json.dumps({'delete': {'id': self.del_id}}))
+        url = 'http://%s:%s/%s/%s/update?%s' % (self.host, self.port, self.application, self.core,
+                                                self._commit_param())
+        started = time.time()
+        resp = transport.post(url, headers={'Content-type': 'application/json'},
+                              data=json.dumps({'delete': {'id': self.del_id}}))
+        query_cache.invalidate(self.core, commit_within=self.commit_within)
+        _notify(self.core, 'delete', started, size=1)
         return resp.status_code
 
-    def export(self):
-        done = False
-        cm = '*'
-        export_docs = []
-        while not done:
-            if self.export_field == '':
-                resp = requests.get('http://%s:%s/%s/%s/query?q=%s&sort=id asc&cursorMark=%s' %
-                                    (self.host, self.port, self.application, self.core, self.query, cm)).json()
-                for doc in resp.get('response').get('docs'):
-                    try:
-                        export_docs.append(doc)
-                    except TypeError as e:
-                        logging.error(e)
-                        logging.error(doc.get('id'))
+    def iter_export(self, rows=None, fields=None, fquery=None):
+        """
+        Walk all docs matching the query with cursorMark paging and yield them as they arrive, so that exports
+        run with constant memory. If export_field is set, the decoded JSON of that field is yielded instead of
+        the doc.
+        :param rows: page size, defaults to export_rows
+        :param fields: field list, defaults to fields (or export_field and id)
+        :param fquery: filter queries, defaults to fquery
+        """
+        if rows is None:
+            rows = self.export_rows
+        if fquery is None:
+            fquery = self.fquery
+        if fields is None:
+            if self.export_field != '':
+                fields = [self.export_field, 'id']
             else:
-                resp = requests.get('http://%s:%s/%s/%s/query?q=%s&sort=id asc&fl=%s&cursorMark=%s' %
-                                    (self.host, self.port, self.application, self.core, self.query,
-                                     '%s, %s' % (self.export_field, 'id'), cm)).json()
-                for doc in resp.get('response').get('docs'):
+                fields = self.fields
+        url = 'http://%s:%s/%s/%s/query' % (self.host, self.port, self.application, self.core)
+        params = {'q': self.query, 'sort': 'id asc', 'rows': rows, 'wt': 'json', 'indent': 'false'}
+        if len(fields) > 0:
+            params['fl'] = ','.join(stored_fields.fields(fields))
+        if len(fquery) > 0:
+            params['fq'] = fquery
+
+        cm = '*'
+        while True:
+            params['cursorMark'] = cm
+            started = time.time()
+            resp = decode_json(transport.post(url, data=params, headers=accept_encoding(
+                int(rows) >= COMPRESS_MIN_ROWS or any(field in COMPRESS_FIELDS for field in fields))).content)
+            _notify(self.core, 'query', started, resp)
+            for doc in resp.get('response').get('docs'):
+                if self.export_field == '':
+                    yield doc
+                else:
                     try:
-                        export_docs.append(json.loads(doc.get(self.export_field)))
+                        yield stored_fields.load(doc, self.export_field)
                     except TypeError as e:
                         logging.error(e)
                         logging.error(doc.get('id'))
             if cm == resp.get('nextCursorMark'):
-                done = True
+                break
             cm = resp.get('nextCursorMark')
 
-        #with open('%s/%s_%s.json' % (self.export_dir, self.core, int(time.time())), 'w') as dumpfile:
-            #json.dump(export_docs, dumpfile, indent=4)
+    def export(self):
+        return list(self.iter_export())
+
+    def export_stream(self, fields, sort='id asc', fquery=None, chunk_size=65536):
+        """
+        Dump the docValues fields of all docs matching the query through Solr's /export handler. The sorted
+        tuple stream is parsed incrementally, so arbitrarily large result sets run with constant memory.
+        """
+        validate_export(self.core, fields, sort)
+        if fquery is None:
+            fquery = self.fquery
+        url = 'http://%s:%s/%s/%s/export' % (self.host, self.port, self.application, self.core)
+        params = {'q': self.query, 'fl': ','.join(fields), 'sort': sort, 'wt': 'json'}
+        if len(fquery) > 0:
+            params['fq'] = fquery
+        started = time.time()
+        size = 0
+        resp = transport.post(url, data=params, headers=accept_encoding(True), stream=True)
+        try:
+            if resp.status_code != 200:
+                raise SolrError('/export failed with status %s: %s' % (resp.status_code, resp.text[:500]))
+            resp.encoding = 'utf-8'
+            for doc in iter_stream_docs(resp.iter_content(chunk_size=chunk_size, decode_unicode=True)):
+                if 'EXCEPTION' in doc:
+                    raise SolrError(doc.get('EXCEPTION'))
+                size += 1
+                yield doc
+        finally:
+            resp.close()
+            _notify(self.core, 'export', started, size=size)
 
-        #return '%s/%s_%s.json' % (self.export_dir, self.core, int(time.time()))
-        return export_docs
+    def stream(self, expression, chunk_size=65536):
+        """
+        Run a streaming expression (see search_expression()) against the /stream handler of the core and yield
+        its tuples until the EOF tuple. Streaming expressions need Solr to run in SolrCloud mode.
+        """
+        url = 'http://%s:%s/%s/%s/stream' % (self.host, self.port, self.application, self.core)
+        started = time.time()
+        size = 0
+        resp = transport.post(url, data={'expr': expression}, headers=accept_encoding(True), stream=True)
+        try:
+            if resp.status_code != 200:
+                raise SolrError('/stream failed with status %s: %s' % (resp.status_code, resp.text[:500]))
+            resp.encoding = 'utf-8'
+            for doc in iter_stream_docs(resp.iter_content(chunk_size=chunk_size, decode_unicode=True)):
+                if 'EXCEPTION' in doc:
+                    raise SolrError(doc.get('EXCEPTION'))
+                if doc.get('EOF'):
+                    break
+                size += 1
+                yield doc
+        finally:
+            resp.close()
+            _notify(self.core, 'stream', started, size=size)
 
     def __len__(self):
         return len(self.results)
@@ -367,3 +1432,100 @@ class Solr(object):
             pretty_result.pformat(self.response)
             myrepr += 'RESPONSE: %s' % pretty_result
         return myrepr
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_host_limits = {}
+
+
+def _get_executor():
+    # worker threads do not survive a fork: create the pool lazily in each process
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=getattr(secrets, 'SOLR_ASYNC_WORKERS', 8))
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def _host_limit(host, port):
+    key = '%s:%s' % (host, port)
+    with _executor_lock:
+        if key not in _host_limits:
+            _host_limits[key] = threading.BoundedSemaphore(getattr(secrets, 'SOLR_HOST_CONCURRENCY', 4))
+    return _host_limits.get(key)
+
+
+def _limited(func, host, port, *args):
+    with _host_limit(host, port):
+        return func(*args)
+
+
+class AsyncSolr(Solr):
+    """
+    Solr query whose request() is a coroutine. Query building and response handling are the ones of Solr; only
+    the HTTP round trip runs in a worker thread on the shared transport. At most SOLR_HOST_CONCURRENCY queries per
+    host are in flight at the same time, no matter how many are awaited.
+    """
+    async def request(self):
+        return await _request_async(self)
+
+
+async def _request_async(query):
+    # only the round trip runs in a worker thread; building, handling and tracing stay in the caller's thread
+    loop = asyncio.get_event_loop()
+    started = time.time()
+    url, params = query._build_request()
+    if query.mlt is True:
+        resp = await loop.run_in_executor(_get_executor(), _limited, transport.get, query.host, query.port,
+                                          '%s%s' % (url, query._mlt_params))
+        query._handle_mlt(resp.content)
+    query.response = await loop.run_in_executor(_get_executor(), _limited, query._fetch, query.host, query.port,
+                                                url, params)
+    query._handle_response()
+    _notify(query.core, query.handler, started, query.response)
+    return query
+
+
+def solr_gather(*queries):
+    """
+    Run several independent queries concurrently and return them when all are done. Takes AsyncSolr as well as
+    Solr instances, so it can be used from the (synchronous) Flask views:
+
+        orcid_solr, works_solr = solr_gather(AsyncSolr(core='person', ...), AsyncSolr(core='hb2', ...))
+    """
+    if not queries:
+        return []
+    if len(queries) == 1 and not isinstance(queries[0], AsyncSolr):
+        queries[0].request()
+        return list(queries)
+
+    async def run_all():
+        await asyncio.gather(*[_request_async(query) for query in queries])
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_all())
+    finally:
+        loop.close()
+    return list(queries)
+
+
+def solr_gather_chunks(queries, size=getattr(secrets, 'SOLR_GATHER_CHUNK', 4)):
+    """
+    Run queries concurrently, size at a time, and yield them chunk by chunk in their order. Unlike solr_gather()
+    only the responses of one chunk are held at a time, as long as queries is an iterator and the caller drops
+    each chunk before asking for the next one:
+
+        for chunk in solr_gather_chunks(AsyncSolr(fquery=['pubtype:%s' % pubtype], ...) for pubtype in pubtypes):
+            ...
+    """
+    queries = iter(queries)
+    while True:
+        chunk = list(itertools.islice(queries, size))
+        if not chunk:
+            return
+        yield solr_gather(*chunk)
+        del chunk
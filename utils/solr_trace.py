@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import threading
+
+from flask import current_app, g, has_request_context, request
+
+from utils import solr_handler
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+
+class SolrTrace(object):
+    """
+    Records every Solr call of a Flask request (core, handler, wall time, QTime, number of docs) in g.solr_calls
+    and keeps per-endpoint totals, so views firing hundreds of queries (N+1 lookups) show up:
+
+        solr_trace = SolrTrace(app)
+        ...
+        solr_trace.worst(by='calls')
+
+    A warning is logged for every request with more than warn_calls Solr calls or more than warn_time seconds spent
+    in Solr. The totals are kept per process.
+    """
+    def __init__(self, app=None, warn_calls=getattr(secrets, 'SOLR_TRACE_WARN_CALLS', 50),
+                 warn_time=getattr(secrets, 'SOLR_TRACE_WARN_TIME', 2.0)):
+        self.warn_calls = warn_calls
+        self.warn_time = warn_time
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['solr_trace'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        solr_handler.add_listener(self._record)
+
+    def _before_request(self):
+        g.solr_calls = []
+
+    def _record(self, call):
+        # calls outside of a request (scripts, timers) and of other apps in the same process are not traced
+        if has_request_context() and current_app.extensions.get('solr_trace') is self:
+            calls = g.get('solr_calls')
+            if calls is not None:
+                calls.append(call)
+
+    def _after_request(self, response):
+        calls = g.get('solr_calls') or []
+        endpoint = request.endpoint or request.path
+        total = sum(call.get('time') for call in calls)
+        qtime = sum(call.get('qtime') or 0.0 for call in calls)
+
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {'requests': 0, 'calls': 0, 'time': 0.0, 'qtime': 0.0,
+                                                         'max_calls': 0, 'max_time': 0.0, 'warnings': 0})
+            stats['requests'] += 1
+            stats['calls'] += len(calls)
+            stats['time'] += total
+            stats['qtime'] += qtime
+            stats['max_calls'] = max(stats.get('max_calls'), len(calls))
+            stats['max_time'] = max(stats.get('max_time'), total)
+
+            if len(calls) > self.warn_calls or total > self.warn_time:
+                stats['warnings'] += 1
+                warn = True
+            else:
+                warn = False
+
+        if warn:
+            current_app.logger.warning('Solr: %s %s made %s calls in %.3fs (QTime %.3fs): %s' % (
+                request.method, request.full_path, len(calls), total, qtime, self.summary(calls)))
+
+        return response
+
+    @staticmethod
+    def summary(calls, limit=5):
+        """
+        The most frequent core/handler pairs of a list of calls, e.g. 'person/select x 120 (1.234s)'.
+        """
+        pairs = {}
+        for call in calls:
+            pair = pairs.setdefault('%s/%s' % (call.get('core'), call.get('handler')), [0, 0.0])
+            pair[0] += 1
+            pair[1] += call.get('time')
+        ranked = sorted(pairs.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return ', '.join('%s x %s (%.3fs)' % (pair, count, time) for pair, (count, time) in ranked)
+
+    def worst(self, by='calls', limit=20):
+        """
+        Endpoints ranked by the total number of Solr calls ('calls') or the total time spent in Solr ('time'),
+        with the averages per request.
+        """
+        with self._lock:
+            endpoints = [dict(self.endpoints.get(endpoint), endpoint=endpoint) for endpoint in self.endpoints]
+        for stats in endpoints:
+            stats['avg_calls'] = float(stats.get('calls')) / stats.get('requests')
+            stats['avg_time'] = stats.get('time') / stats.get('requests')
+        return sorted(endpoints, key=lambda stats: stats.get(by), reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
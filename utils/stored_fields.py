@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+#  Copyright 2015-2017 University Library Bochum <bibliogaphie-ub@rub.de> and UB Dortmund <api.ub@tu-dortmund.de>.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Stored-only fields of the hb2 docs (wtf_json, csl_json, bibliographicCitation) either as JSON strings or, with
+STORED_FIELD_ENCODING = 'msgpack', as compressed msgpack in binary fields next to them (wtf_bin, csl_bin,
+citation_bin). Readers use load() and get the same value for both, so the encoding can be switched and the index
+re-indexed at any time. See bin/bench_stored_fields.py for sizes and decode times.
+"""
+
+import base64
+import zlib
+
+import simplejson as json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import local_app_secrets as secrets
+except ImportError:
+    import app_secrets as secrets
+
+ENCODING = getattr(secrets, 'STORED_FIELD_ENCODING', 'json')
+COMPRESS_LEVEL = getattr(secrets, 'STORED_FIELD_COMPRESS_LEVEL', 6)
+
+# cores with binary fields in their schema
+CORES = ('hb2',)
+
+# stored field -> binary field
+BINARY = {
+    'wtf_json': 'wtf_bin',
+    'csl_json': 'csl_bin',
+    'bibliographicCitation': 'citation_bin',
+}
+
+# stored fields holding JSON strings, the others hold plain strings
+JSON_FIELDS = ('wtf_json', 'csl_json')
+
+# the first byte of a binary value tells how the compressed payload is serialised; without msgpack installed,
+# values are written as compressed JSON
+_MSGPACK = b'M'
+_JSON = b'J'
+
+
+def pack(value):
+    """
+    Base64 text of the compressed value, as Solr takes and returns binary fields in JSON.
+    """
+    if msgpack is not None:
+        payload = _MSGPACK + zlib.compress(msgpack.packb(value, use_bin_type=True), COMPRESS_LEVEL)
+    else:
+        payload = _JSON + zlib.compress(json.dumps(value).encode('utf-8'), COMPRESS_LEVEL)
+    return base64.b64encode(payload).decode('ascii')
+
+
+def unpack(text):
+    payload = base64.b64decode(text)
+    data = zlib.decompress(payload[1:])
+    if payload[:1] == _MSGPACK:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode('utf-8'))
+
+
+def load(doc, field='wtf_json'):
+    """
+    The value of a stored field of a Solr doc: the decoded JSON of wtf_json and csl_json, the string of the others.
+    Like json.loads(doc.get(field)), raises TypeError if the doc has neither the field nor its binary field.
+    """
+    binary = doc.get(BINARY.get(field, ''))
+    if binary:
+        return unpack(binary)
+    if field in JSON_FIELDS:
+        return json.loads(doc.get(field))
+    return doc.get(field)
+
+
+def encode(core, doc):
+    """
+    The doc to send to Solr for a doc about to be written: with the encoding 'msgpack' a copy with the stored
+    fields moved into their binary fields, else the doc itself. Atomic updates ({'set': ...}) are left alone.
+    """
+    if ENCODING != 'msgpack' or core not in CORES or not isinstance(doc, dict):
+        return doc
+    if not any(isinstance(doc.get(field), str) for field in BINARY):
+        return doc
+    doc = dict(doc)
+    for field, binary in BINARY.items():
+        if isinstance(doc.get(field), str):
+            value = doc.pop(field)
+            if field in JSON_FIELDS:
+                value = json.loads(value)
+            doc[binary] = pack(value)
+    return doc
+
+
+def fields(field_list):
+    """
+    A Solr field list with the binary fields of the stored fields in it added, so that docs written in either
+    encoding can be read.
+    """
+    binaries = [BINARY.get(field) for field in field_list if field in BINARY and BINARY.get(field) not in field_list]
+    if not binaries:
+        return field_list
+    return list(field_list) + binaries